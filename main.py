@@ -3,26 +3,66 @@
 import sys
 import os
 import json
-from datetime import datetime, date
+import argparse
+import functools
 
 # Ajouter le répertoire 'scripts' au PYTHONPATH pour importer les modules
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
 
+# Modules légers uniquement. Les piles lourdes sont importées par l'étape qui les utilise,
+# à sa première exécution : process_video (MoviePy, NumPy, imageio) dans render_stage,
+# upload_youtube (googleapiclient) dans get_youtube_service / le planificateur d'uploads.
 import get_top_clips
 import download_clip
-import process_video
 import generate_metadata
-import upload_youtube
+import upload_scheduler
+import pipeline
+import publish_history
+import clip_checkpoint
+import run_metrics
+import daemon
+import profiles
+import source_stats
+import job_queue
+import stage_profiler
+import thumbnail_hash
 
 
 # --- Chemins et configuration ---
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-os.makedirs(DATA_DIR, exist_ok=True)
 
-PUBLISHED_HISTORY_FILE = os.path.join(DATA_DIR, 'published_shorts_history.json')
-# Fichiers temporaires pour le clip
-RAW_CLIP_PATH = os.path.join(DATA_DIR, 'temp_raw_clip.mp4')
-PROCESSED_CLIP_PATH = os.path.join(DATA_DIR, 'temp_processed_short.mp4')
+PUBLISHED_HISTORY_DB = os.path.join(DATA_DIR, 'published_shorts_history.sqlite3')
+# Ancien historique JSON, migré automatiquement vers SQLite au premier lancement
+LEGACY_PUBLISHED_HISTORY_FILE = os.path.join(DATA_DIR, 'published_shorts_history.json')
+# Registre local du quota YouTube et file des uploads différés faute de quota
+YOUTUBE_QUOTA_LEDGER_FILE = os.path.join(DATA_DIR, 'youtube_quota_ledger.json')
+DEFERRED_UPLOADS_FILE = os.path.join(DATA_DIR, 'deferred_uploads.json')
+# Statistiques de rendement par source Twitch (budget adaptatif de la collecte)
+SOURCE_STATS_FILE = os.path.join(DATA_DIR, 'source_stats.json')
+# Mode --profiles : sources interrogées sans filtre de langue quand plusieurs langues les suivent,
+# leurs statistiques sont donc tenues à part de celles du mode à une seule chaîne.
+PROFILES_SOURCE_STATS_FILE = os.path.join(DATA_DIR, 'profiles', 'source_stats.json')
+# Empreintes perceptuelles des miniatures des candidats, par ID de clip (doublons visuels écartés
+# avant téléchargement). THUMBNAIL_DEDUP=0 désactive le filtre.
+THUMBNAIL_HASHES_FILE = os.path.join(DATA_DIR, 'thumbnail_hashes.json')
+THUMBNAIL_DEDUP = os.getenv("THUMBNAIL_DEDUP", "1") == "1"
+# Fichiers temporaires pour le clip.
+# Les étapes du pipeline travaillant sur plusieurs clips à la fois, chaque clip a ses propres fichiers
+# (un fichier ne doit pas être écrasé par le clip suivant pendant son rendu ou son upload).
+RAW_CLIP_PATH_TEMPLATE = os.path.join(DATA_DIR, 'temp_raw_clip_{clip_id}.mp4')
+PROCESSED_CLIP_PATH_TEMPLATE = os.path.join(DATA_DIR, 'temp_processed_short_{clip_id}.mp4')
+# Mode flux (--stream-download ou STREAM_DOWNLOAD=1) : le rendu lit directement l'URL du média
+# pendant son transfert, sans fichier brut ; retour au téléchargement dans un fichier en cas d'échec.
+STREAM_DOWNLOAD = os.getenv("STREAM_DOWNLOAD", "0") == "1"
+# Rendu proxy (PROXY_RENDER=1) : aperçus basse résolution et rapides de la même mise en page, pour la
+# vérification visuelle et les tests d'intégration du pipeline (avec un faux YouTube) ; à ne pas publier.
+PROXY_RENDER = os.getenv("PROXY_RENDER", "0") == "1"
+# Points de reprise par clip (data/clip_state_<id>.json), à côté des fichiers vidéo du clip
+checkpoints = clip_checkpoint.ClipCheckpoints(DATA_DIR)
+# Métriques par clip et par étape : JSON lines (historique des exécutions) et fichier texte Prometheus
+METRICS_DIR = os.path.join(DATA_DIR, 'metrics')
+RUN_METRICS_FILE = os.path.join(METRICS_DIR, 'run_metrics.jsonl')
+PROMETHEUS_METRICS_FILE = os.path.join(METRICS_DIR, 'twitch_shorts.prom')
 
 # --- CONSTANTE DE CONFIGURATION CLÉ ---
 # Nombre de clips que le script essaiera de publier lors d'UNE SEULE EXÉCUTION du workflow.
@@ -31,215 +71,846 @@ PROCESSED_CLIP_PATH = os.path.join(DATA_DIR, 'temp_processed_short.mp4')
 NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH = 3
 # ----------------------------------------
 
-# --- Fonctions utilitaires pour l'historique ---
-def load_published_history():
-    """Charge l'historique des clips publiés."""
-    if not os.path.exists(PUBLISHED_HISTORY_FILE):
-        return {}
-    try:
-        with open(PUBLISHED_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        print("⚠️ Fichier d'historique des publications corrompu. Création d'un nouveau.")
-        return {}
-    except Exception as e:
-        print(f"❌ Erreur inattendue lors du chargement de l'historique : {e}")
-        return {}
-
-def save_published_history(history_data):
-    """Sauvegarde l'historique des clips publiés."""
-    try:
-        with open(PUBLISHED_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history_data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"❌ Erreur inattendue lors de la sauvegarde de l'historique : {e}")
-
-
-def get_today_published_ids(history_data):
-    """Retourne les IDs des clips publiés aujourd'hui."""
-    today_str = date.today().isoformat()
-    # history_data est un dict { "YYYY-MM-DD": [ {clip_id: ..., youtube_id: ...}, ... ] }
-    # Retourne seulement les 'twitch_clip_id' pour la date d'aujourd'hui
-    return [item["twitch_clip_id"] for item in history_data.get(today_str, [])]
-
-def add_to_history(history_data, clip_id, youtube_id):
-    """Ajoute un clip à l'historique pour la date d'aujourd'hui."""
-    today_str = date.today().isoformat()
-    if today_str not in history_data:
-        history_data[today_str] = []
-        
-    # Vérifier si l'ID Twitch est déjà dans la liste d'aujourd'hui pour éviter les doublons accidentels
-    # (bien que la logique de sélection devrait déjà filtrer cela)
-    if not any(item["twitch_clip_id"] == clip_id for item in history_data[today_str]):
-        history_data[today_str].append({
-            "twitch_clip_id": clip_id, 
-            "youtube_short_id": youtube_id, 
-            "timestamp": datetime.now().isoformat()
-        })
-    
-    # OPTIONNEL: Nettoyer l'historique des anciennes entrées (ex: plus de 7 jours)
-    # C'est une bonne pratique pour éviter que le fichier ne devienne trop gros.
-    # Décommentez le bloc ci-dessous si vous voulez cette fonctionnalité.
-    # old_dates = []
-    # for d in history_data:
-    #     try:
-    #         if (datetime.now().date() - datetime.fromisoformat(d).date()).days > 7:
-    #             old_dates.append(d)
-    #     except ValueError: # Gérer les dates mal formatées si nécessaire
-    #         print(f"⚠️ Date mal formatée dans l'historique : {d}. Ignorée.")
-    # for d in old_dates:
-    #     del history_data[d]
-    # if old_dates:
-    #     print(f"Historique nettoyé. {len(old_dates)} anciennes entrées supprimées.")
+# --- Parallélisme du pipeline (nombre de workers par étape) ---
+DOWNLOAD_WORKERS = 2 # Téléchargements (I/O, threads)
+RENDER_WORKERS = 1   # Rendus MoviePy (CPU, processus ; ffmpeg utilise déjà plusieurs cœurs)
+METADATA_WORKERS = 1 # Génération des métadonnées (léger, thread)
+UPLOAD_WORKERS = upload_scheduler.MAX_CONCURRENT_UPLOADS # Uploads YouTube (I/O, threads)
+PIPELINE_QUEUE_SIZE = 1 # Clips en attente entre deux étapes (back-pressure)
+PIPELINE_LOOKAHEAD = 1  # Clips préparés en plus de l'objectif, pour remplacer un éventuel échec
+# ----------------------------------------
 
+# File de travaux partagée entre machines (--enqueue / --worker), à placer sur un stockage commun
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", os.path.join(DATA_DIR, 'job_queue.sqlite3'))
 
-def main():
-    print("🚀 Début du workflow de publication de Short YouTube...")
+# Nombre de candidats affichés par le mode --dry-run
+DRY_RUN_CANDIDATES_TO_SHOW = 10
 
-    # 1. Charger l'historique des clips publiés
-    history = load_published_history()
-    today_published_ids = get_today_published_ids(history)
-    print(f"Clips déjà publiés aujourd'hui (selon l'historique) : {len(today_published_ids)} IDs.")
+# --- Mode démon (--daemon) ---
+# Créneaux, avance de préparation et rafraîchissements : voir les paramètres de scripts/daemon.py.
+DAEMON_CONTROL_DIR = os.path.join(DATA_DIR, 'daemon') # Fichier de commande et status.json
+# Le jeton d'application Twitch est gardé en mémoire et renouvelé après ce délai.
+TWITCH_TOKEN_MAX_AGE_HOURS = 12
 
-    # Garder une trace des clips que nous avons ATTEMPTÉ de publier DANS CETTE EXÉCUTION
-    # pour éviter de retenter le même si la première tentative échoue et la boucle continue.
-    clips_attempted_in_this_run = []
+# --- Fonctions utilitaires pour les fichiers des clips ---
+def get_raw_clip_path(clip_id):
+    """Retourne le chemin du fichier brut téléchargé propre à un clip."""
+    return RAW_CLIP_PATH_TEMPLATE.format(clip_id=clip_id)
+
+def get_processed_clip_path(clip_id):
+    """Retourne le chemin du fichier traité propre à un clip."""
+    return PROCESSED_CLIP_PATH_TEMPLATE.format(clip_id=clip_id)
+
+def cleanup_stale_processed_files(keep_paths):
+    """Supprime les fichiers temporaires des exécutions précédentes qui ne sont plus en attente d'upload."""
+    prefixes = tuple(os.path.basename(t).split('{')[0] for t in (RAW_CLIP_PATH_TEMPLATE, PROCESSED_CLIP_PATH_TEMPLATE))
+    keep = {os.path.abspath(p) for p in keep_paths}
+    for name in os.listdir(DATA_DIR):
+        path = os.path.abspath(os.path.join(DATA_DIR, name))
+        if name.startswith(prefixes) and name.endswith('.mp4') and path not in keep:
+            os.remove(path)
+            print(f"  - Supprimé (exécution précédente): {path}")
+
+
+# --- Étapes du pipeline (un "job" est un dict qui suit le clip d'étape en étape) ---
+def download_stage(clip):
+    """
+    Étape 4 : télécharge le clip. Retourne le job, ou None en cas d'échec.
+    Un clip repris d'une exécution interrompue saute les étapes déjà terminées.
+    """
+    print(f"\n✨ Tentative de publication du clip : '{clip['title']}' par '{clip['broadcaster_name']}' (ID: {clip['id']})...")
+    job = {"clip": clip, "raw_path": None, "media_url": None, "video_path": None, "metadata": None}
+    record = checkpoints.load(clip['id'])
+    resume_stage = checkpoints.resume_stage(record) if record else "selected"
+    if resume_stage in ("rendered", "metadata"):
+        print(f"⏩ Clip '{clip['id']}' déjà téléchargé et traité lors d'une exécution précédente : reprise après le rendu.")
+        job["video_path"] = record["video_path"]
+        if resume_stage == "metadata":
+            job["metadata"] = record["metadata"]
+        run_metrics.note(resumed=1)
+        return job
+    if resume_stage == "downloaded":
+        print(f"⏩ Clip '{clip['id']}' déjà téléchargé lors d'une exécution précédente : reprise au rendu.")
+        job["raw_path"] = record["raw_path"]
+        run_metrics.note(resumed=1)
+        return job
+
+    checkpoints.save(clip['id'], "selected", clip=clip)
+    if STREAM_DOWNLOAD:
+        # Rien n'est écrit ici : le rendu lira le média pendant son transfert. L'URL signée expire,
+        # elle n'est donc pas enregistrée au point de reprise (une reprise la résout à nouveau).
+        job["media_url"] = download_clip.resolve_media_url(clip['url'])
+        if job["media_url"]:
+            run_metrics.note(streamed=1)
+            return job
+        print("↩️ Mode flux indisponible pour ce clip : téléchargement dans un fichier.")
+    raw_path = get_raw_clip_path(clip['id'])
+    downloaded_file = download_clip.download_twitch_clip(clip['url'], raw_path)
+    if not downloaded_file:
+        print(f"❌ Échec du téléchargement du clip '{clip['id']}'. Passage au suivant.")
+        # Nettoyage spécifique si le téléchargement a laissé des traces
+        if os.path.exists(raw_path): os.remove(raw_path)
+        checkpoints.remove(clip['id'])
+        return None
+    checkpoints.save(clip['id'], "downloaded", raw_path=downloaded_file)
+    run_metrics.note(bytes=os.path.getsize(downloaded_file))
+    job["raw_path"] = downloaded_file
+    return job
+
+def render_stage(job):
+    """
+    Étape 5 : traite/coupe la vidéo pour le format Short.
+    Exécutée dans un processus séparé : doit rester une fonction de niveau module.
+    """
+    clip = job["clip"]
+    if job["video_path"]:
+        run_metrics.note(resumed=1)
+        return job # Rendu déjà fait lors d'une exécution précédente (point de reprise)
 
+    import process_video # Import lourd (MoviePy), chargé seulement quand un rendu a lieu
+
+    raw_path = job["raw_path"]
+    print(f"🎬 Traitement de la vidéo du clip '{clip['id']}' pour le format Short (découpage si nécessaire)...")
+    current_processed_file = get_processed_clip_path(clip['id'])
+
+    def render(input_path):
+        # Pic de mémoire du rendu (ffmpeg inclus), pour dimensionner les machines et RENDER_WORKERS
+        with run_metrics.track_peak_rss() as memory:
+            returned = process_video.trim_video_for_short(
+                input_path=input_path,
+                output_path=current_processed_file,
+                max_duration_seconds=get_top_clips.MAX_VIDEO_DURATION_SECONDS,
+                clip_data=clip,
+                enable_webcam_crop=False,
+                proxy=PROXY_RENDER
+            )
+        print(f"📏 Pic de mémoire du rendu : {memory['peak_rss_mb']:.0f} Mo.")
+        return returned if returned and os.path.exists(returned) and os.path.getsize(returned) > 0 else None
+
+    processed_file_path_returned = render(job["media_url"] or raw_path)
+    if not processed_file_path_returned and job["media_url"]:
+        # Flux coupé ou URL expirée : le clip est téléchargé dans un fichier, puis rendu à nouveau
+        print(f"↩️ Échec du rendu en flux du clip '{clip['id']}' : téléchargement dans un fichier et nouvel essai.")
+        raw_path = download_clip.download_twitch_clip(clip['url'], get_raw_clip_path(clip['id']))
+        if raw_path:
+            run_metrics.note(bytes=os.path.getsize(raw_path))
+            processed_file_path_returned = render(raw_path)
+
+    # Vérifications après traitement
+    if not processed_file_path_returned:
+        print(f"❌ Échec du traitement vidéo pour le clip '{clip['id']}'. Le fichier traité est manquant ou vide.")
+        print("Tentative d'utiliser le fichier brut pour l'upload si possible (peut être trop long).")
+        if not raw_path or not os.path.exists(raw_path) or os.path.getsize(raw_path) == 0:
+            print(f"❌ Le fichier brut pour le clip '{clip['id']}' est aussi vide ou introuvable. Impossible de continuer pour ce clip.")
+            if os.path.exists(current_processed_file): os.remove(current_processed_file)
+            checkpoints.remove(clip['id'])
+            return None
+        # Le fichier brut prend la place du fichier traité (fallback)
+        os.replace(raw_path, current_processed_file)
+        print(f"Utilisation du fichier brut pour l'upload du clip '{clip['id']}'.")
+    else:
+        print(f"✅ Fichier traité trouvé et non vide : {processed_file_path_returned} (taille : {os.path.getsize(processed_file_path_returned)} octets).")
+
+    # Le rendu est enregistré avant la suppression du fichier brut : une interruption entre les deux
+    # ne fait jamais perdre les deux fichiers.
+    checkpoints.save(clip['id'], "rendered", video_path=current_processed_file, raw_path=None)
+    # Nettoyage du fichier brut : le fichier traité est laissé pour être collecté comme artefact par GitHub Actions.
+    if raw_path and os.path.exists(raw_path):
+        os.remove(raw_path)
+        print(f"  - Supprimé: {raw_path}")
+    job["video_path"] = current_processed_file
+    return job
+
+def metadata_stage(job):
+    """Étape 6 : génère les métadonnées YouTube (ou reprend celles enregistrées au point de reprise)."""
+    youtube_metadata = job["metadata"] or generate_metadata.generate_youtube_metadata(job["clip"])
+    print("\n--- Informations sur le Short (pour débogage) ---")
+    print(f"Titre: {youtube_metadata.get('title')}")
+    print(f"Description: {youtube_metadata.get('description')}")
+    print(f"Tags: {', '.join(youtube_metadata.get('tags', []))}")
+    print(f"Chemin de la vidéo finale pour upload: {job['video_path']}")
+    print("-------------------------------------------------\n")
+    job["metadata"] = youtube_metadata
+    checkpoints.save(job["clip"]["id"], "metadata", metadata=youtube_metadata)
+    return job
+
+def get_youtube_service(token_file=None, client_secrets_file=None):
+    """Authentifie le service YouTube (googleapiclient n'est importé qu'au premier upload)."""
+    import upload_youtube
+    return upload_youtube.get_authenticated_service(token_file or upload_youtube.TOKEN_FILE,
+                                                    client_secrets_file or upload_youtube.CLIENT_SECRETS_FILE)
+
+def open_thumbnail_filter():
+    """Filtre des doublons visuels (empreintes des miniatures), ou None s'il est désactivé."""
+    if not THUMBNAIL_DEDUP:
+        return None
+    return thumbnail_hash.ThumbnailDeduplicator(THUMBNAIL_HASHES_FILE)
+
+def collect_eligible_clips(history, stats=None):
+    """Étapes 2 et 3 : récupère le jeton Twitch puis tous les clips éligibles, triés par popularité."""
     # 2. Récupérer le jeton d'accès Twitch
     twitch_token = get_top_clips.get_twitch_access_token()
     if not twitch_token:
         print("❌ Impossible d'obtenir le jeton d'accès Twitch. Fin du script.")
-        return # Quitter la fonction main sans sys.exit(1) pour éviter un échec "fatal" du workflow.
+        return []
 
     # 3. Récupérer TOUS les clips éligibles et triés
-    # On passe les IDs déjà publiés AUJOURD'HUI pour qu'ils soient filtrés dès la source.
-    eligible_clips_list = get_top_clips.get_eligible_short_clips(
-        access_token=twitch_token,
-        num_clips_per_source=50, # Augmenter pour avoir plus de candidats
-        days_ago=1, # Chercher les clips du dernier jour
-        already_published_clip_ids=today_published_ids # Passer l'historique des clips publiés CE JOUR
+    # On passe l'historique des clips déjà publiés (toutes dates) pour qu'ils soient filtrés dès la source.
+    thumbnails = open_thumbnail_filter()
+    try:
+        eligible_clips_list = get_top_clips.get_eligible_short_clips(
+            access_token=twitch_token,
+            num_clips_per_source=50, # Augmenter pour avoir plus de candidats
+            days_ago=1, # Chercher les clips du dernier jour
+            already_published_clip_ids=history, # Recherche en temps constant, sans copie
+            source_stats=stats, # Demande dimensionnée par source d'après son rendement passé
+            thumbnail_filter=thumbnails # Doublons visuels écartés avant téléchargement
+        )
+    finally:
+        if thumbnails is not None:
+            thumbnails.save()
+    if not eligible_clips_list:
+        print("🤷‍♂️ Aucun nouveau clip adapté trouvé pour la publication aujourd'hui. Fin du script.")
+    return eligible_clips_list
+
+def cleanup_dropped_job(stage_name, item):
+    """
+    Nettoie les fichiers temporaires d'un clip abandonné ou annulé par le pipeline.
+    Les fichiers d'un clip qui a un point de reprise sont conservés : l'exécution suivante les réutilisera.
+    """
+    if isinstance(item, dict) and "raw_path" in item:
+        raw_path = item["raw_path"]
+        if checkpoints.load(item["clip"]["id"]) is not None:
+            return
+        if raw_path and os.path.exists(raw_path):
+            os.remove(raw_path)
+
+def load_resumable_clips(history, deferred_clip_ids):
+    """
+    Lit les points de reprise des exécutions précédentes. Retourne les clips à reprendre
+    (du plus ancien au plus récent) et les fichiers vidéo à conserver pour eux.
+    """
+    resumable_clips = []
+    keep_paths = []
+    for record in checkpoints.load_all():
+        clip_id = record["clip_id"]
+        if checkpoints.reached(record, "uploaded") and clip_id not in history:
+            # Interruption entre la fin de l'upload et l'écriture de l'historique : ne pas republier.
+            history.add(clip_id, record.get("youtube_video_id"))
+            print(f"✅ Clip '{clip_id}' publié lors d'une exécution interrompue (ID: {record.get('youtube_video_id')}) : ajouté à l'historique.")
+        if clip_id in history or clip_id in deferred_clip_ids or "clip" not in record:
+            # Déjà publié, ou déjà pris en charge par la file des uploads différés
+            if clip_id not in deferred_clip_ids:
+                checkpoints.remove(clip_id)
+            continue
+        print(f"♻️ Reprise du clip '{clip_id}' à l'étape '{checkpoints.resume_stage(record)}' (exécution précédente interrompue).")
+        resumable_clips.append(record["clip"])
+        keep_paths.extend(checkpoints.artifact_paths(record))
+    return resumable_clips, keep_paths
+
+def job_clip_id(item):
+    """Identifiant du clip d'un élément du pipeline (clip collecté ou job)."""
+    return item["clip"]["id"] if "clip" in item else item["id"]
+
+def profile_artifact_path(item):
+    """Profils d'un clip (--profile) : écrits à côté de son fichier traité."""
+    return get_processed_clip_path(job_clip_id(item))
+
+def profiled(stage_name, func):
+    """
+    Étape profilée si --profile / PROFILE_STAGES=1 (voir scripts/stage_profiler.py).
+    Sans profilage, func est retournée telle quelle : aucun surcoût.
+    """
+    if not stage_profiler.enabled():
+        return func
+    return functools.partial(stage_profiler.call, stage_name, func, profile_artifact_path)
+
+def open_upload_scheduler(history, published_ids, stats=None):
+    """
+    Crée le planificateur d'uploads : uploads en arrière-plan, bornés et tenant compte du quota YouTube.
+    Chaque publication réussie est enregistrée dans l'historique et ajoutée à published_ids.
+    """
+    def record_publication(clip_data, youtube_video_id):
+        # Appelé depuis un thread d'upload (sérialisé par le planificateur).
+        # Le point de reprise est marqué avant l'historique : une interruption entre les deux
+        # est rattrapée au lancement suivant, sans republier la vidéo.
+        checkpoints.save(clip_data['id'], "uploaded", youtube_video_id=youtube_video_id)
+        # Mettre à jour l'historique des publications seulement si l'upload YouTube réussit
+        history.add(clip_data['id'], youtube_video_id)
+        checkpoints.remove(clip_data['id'])
+        published_ids.append(clip_data['id'])
+        if stats is not None:
+            stats.record_published(clip_data.get('source'))
+        print(f"✅ Clip '{clip_data['id']}' ajouté à l'historique des publications.")
+
+    def record_unknown_outcome(clip_data):
+        # La vidéo a peut-être été créée : le clip entre dans l'historique (sans ID YouTube) pour ne
+        # jamais être republié, et son point de reprise ne ramène plus à l'upload.
+        checkpoints.save(clip_data['id'], "uploaded", youtube_video_id=None)
+        history.add(clip_data['id'], None)
+        checkpoints.remove(clip_data['id'])
+
+    scheduler = upload_scheduler.UploadScheduler(
+        service_factory=get_youtube_service,
+        ledger=upload_scheduler.QuotaLedger(YOUTUBE_QUOTA_LEDGER_FILE),
+        deferred_file=DEFERRED_UPLOADS_FILE,
+        max_workers=UPLOAD_WORKERS,
+        on_published=record_publication,
+        on_outcome_unknown=record_unknown_outcome
     )
+    print(f"📒 Quota YouTube restant aujourd'hui (heure du Pacifique) : {scheduler.ledger.remaining()} unités.")
+    return scheduler
+
+def recover_previous_runs(history, scheduler):
+    """
+    Reprend le travail des exécutions précédentes : clips interrompus (points de reprise),
+    nettoyage des fichiers orphelins, puis relance des uploads différés.
+    Retourne (clips à reprendre, IDs des uploads différés relancés).
+    """
+    # Clips interrompus lors d'une exécution précédente, repris à leur dernière étape terminée
+    deferred_entries = scheduler.load_deferred()
+    resumable_clips, resumable_paths = load_resumable_clips(history, {entry["clip"]["id"] for entry in deferred_entries})
+
+    # Nettoyer les fichiers des exécutions précédentes, sauf ceux en attente d'upload ou de reprise
+    cleanup_stale_processed_files([entry["video_path"] for entry in deferred_entries] + resumable_paths)
+
+    # Reprendre les uploads différés lors des exécutions précédentes (vidéos déjà prêtes)
+    resubmitted_ids = scheduler.resubmit_deferred(skip_clip_ids=history)
+    return resumable_clips, resubmitted_ids
+
+def record_background_uploads(metrics, scheduler, published_ids):
+    """Enregistre les mesures des uploads lancés hors pipeline (uploads différés relancés, mode démon)."""
+    for clip_id, upload_sample in list(scheduler.upload_samples.items()):
+        scheduler.pop_upload_sample(clip_id)
+        metrics.record("upload", clip_id, upload_sample, "ok" if clip_id in published_ids else "failed")
 
+
+def dry_run():
+    """
+    Mode --dry-run : affiche les candidats classés et les métadonnées prévues,
+    sans télécharger, rendre ni uploader (ni charger MoviePy ou googleapiclient).
+    """
+    print("🧪 Mode simulation (--dry-run) : aucune vidéo ne sera téléchargée, traitée ni publiée.")
+    os.makedirs(DATA_DIR, exist_ok=True)
+    history = publish_history.PublishHistory(PUBLISHED_HISTORY_DB, legacy_json_path=LEGACY_PUBLISHED_HISTORY_FILE)
+    try:
+        # Budget adaptatif appliqué comme en exécution réelle, mais les statistiques ne sont pas enregistrées
+        eligible_clips_list = collect_eligible_clips(history, source_stats.SourceStats(SOURCE_STATS_FILE))
+    finally:
+        history.close()
     if not eligible_clips_list:
-        print("🤷‍♂️ Aucun nouveau clip adapté trouvé pour la publication aujourd'hui. Fin du script.")
-        # Sortie normale si aucun clip à traiter
-        return 
-
-    # --- Boucle de traitement et d'upload pour le nombre de clips souhaité ---
-    clips_published_count = 0
-    for selected_clip in eligible_clips_list:
-        if clips_published_count >= NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH:
-            print(f"✅ Objectif de {NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH} clip(s) atteint pour cette exécution.")
-            break # Sortir de la boucle si on a publié le nombre désiré
-
-        # Vérifier si ce clip a déjà été tenté OU PUBLIÉ (par une exécution précédente) dans cette journée
-        if selected_clip['id'] in clips_attempted_in_this_run or selected_clip['id'] in today_published_ids:
-            print(f"ℹ️ Clip '{selected_clip['id']}' déjà tenté dans cette exécution ou déjà publié aujourd'hui. Passage au suivant.")
-            continue # Passe au prochain clip éligible
-
-        # Marquer le clip comme tenté pour cette exécution pour éviter les re-tentatives immédiates
-        clips_attempted_in_this_run.append(selected_clip['id'])
-        print(f"\n✨ Tentative de publication du clip : '{selected_clip['title']}' par '{selected_clip['broadcaster_name']}' (ID: {selected_clip['id']})...")
-
-        # 4. Télécharger le clip
-        downloaded_file = download_clip.download_twitch_clip(selected_clip['url'], RAW_CLIP_PATH)
-        if not downloaded_file:
-            print(f"❌ Échec du téléchargement du clip '{selected_clip['id']}'. Passage au suivant.")
-            # Nettoyage spécifique si le téléchargement a laissé des traces
-            if os.path.exists(RAW_CLIP_PATH): os.remove(RAW_CLIP_PATH)
-            continue # Passe au prochain clip éligible
-
-        # 5. Traiter/couper la vidéo
-        print("🎬 Traitement de la vidéo pour le format Short (découpage si nécessaire)...")
-        current_processed_file = PROCESSED_CLIP_PATH # Assurez-vous d'écraser le précédent pour l'artefact final
-
-        processed_file_path_returned = process_video.trim_video_for_short(
-            input_path=downloaded_file,
-            output_path=current_processed_file,
-            max_duration_seconds=get_top_clips.MAX_VIDEO_DURATION_SECONDS,
-            clip_data=selected_clip,
-            enable_webcam_crop=False
-        )
-        
-        # Vérifications après traitement
-        if not processed_file_path_returned or not os.path.exists(processed_file_path_returned) or os.path.getsize(processed_file_path_returned) == 0:
-            print(f"❌ Échec du traitement vidéo pour le clip '{selected_clip['id']}'. Le fichier traité est manquant ou vide.")
-            print("Tentative d'utiliser le fichier brut pour l'upload si possible (peut être trop long).")
-            final_video_for_upload = downloaded_file # Utilise le fichier brut comme fallback
-            if not os.path.exists(final_video_for_upload) or os.path.getsize(final_video_for_upload) == 0:
-                print(f"❌ Le fichier brut pour le clip '{selected_clip['id']}' est aussi vide ou introuvable. Impossible de continuer pour ce clip.")
-                # Nettoyage des temporaires avant de passer au suivant
-                if os.path.exists(RAW_CLIP_PATH): os.remove(RAW_CLIP_PATH)
-                if os.path.exists(current_processed_file): os.remove(current_processed_file) 
-                continue # Passe au prochain clip éligible
-            else:
-                print(f"Utilisation du fichier brut pour l'upload du clip '{selected_clip['id']}'.")
-        else:
-            print(f"✅ Fichier traité trouvé et non vide : {processed_file_path_returned} (taille : {os.path.getsize(processed_file_path_returned)} octets).")
-            final_video_for_upload = processed_file_path_returned # Utilise le fichier traité
-
-        # 6. Générer les métadonnées YouTube
-        youtube_metadata = generate_metadata.generate_youtube_metadata(selected_clip)
-        print("\n--- Informations sur le Short (pour débogage) ---")
+        return
+
+    print(f"\n--- Top {min(DRY_RUN_CANDIDATES_TO_SHOW, len(eligible_clips_list))} candidats (sur {len(eligible_clips_list)}) ---")
+    for rank, clip in enumerate(eligible_clips_list[:DRY_RUN_CANDIDATES_TO_SHOW], start=1):
+        print(f"  {rank:>2}. {clip['title']} par {clip['broadcaster_name']} "
+              f"({clip['viewer_count']} vues, {clip['duration']}s, {clip.get('game_name') or 'N/A'}) - {clip['url']}")
+
+    print(f"\n--- Métadonnées prévues pour les {NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH} premier(s) clip(s) ---")
+    for clip in eligible_clips_list[:NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH]:
+        youtube_metadata = generate_metadata.generate_youtube_metadata(clip)
+        print(f"\nClip {clip['id']}")
         print(f"Titre: {youtube_metadata.get('title')}")
         print(f"Description: {youtube_metadata.get('description')}")
         print(f"Tags: {', '.join(youtube_metadata.get('tags', []))}")
-        print(f"Chemin de la vidéo finale pour upload: {final_video_for_upload}")
-        print("-------------------------------------------------\n")
+    print("\n✅ Simulation terminée.")
+
+
+def main():
+    print("🚀 Début du workflow de publication de Short YouTube...")
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    metrics = run_metrics.RunMetrics()
+
+    # 1. Ouvrir l'historique des clips publiés (toutes dates confondues) et appliquer la rétention
+    history = publish_history.PublishHistory(PUBLISHED_HISTORY_DB, legacy_json_path=LEGACY_PUBLISHED_HISTORY_FILE)
+    history.compact()
+    print(f"Clips déjà publiés aujourd'hui (selon l'historique) : {len(history.published_on())} IDs.")
+    print(f"Clips dans l'historique (toutes dates, exclus de la sélection) : {len(history)} IDs.")
 
-        # 7. Authentifier et Uploader sur YouTube
-        youtube_service = None
+    # Garder une trace des clips que nous avons ATTEMPTÉ de publier DANS CETTE EXÉCUTION
+    # pour éviter de retenter le même si la première tentative échoue.
+    clips_attempted_in_this_run = []
+    # IDs des clips publiés avec succès dans cette exécution (alimenté par les threads d'upload)
+    clips_published_in_this_run = []
+    stats = source_stats.SourceStats(SOURCE_STATS_FILE)
+    scheduler = open_upload_scheduler(history, clips_published_in_this_run, stats)
+
+    # Reprendre d'abord le travail des exécutions précédentes. Les uploads différés relancés
+    # (vidéos déjà prêtes) comptent dans l'objectif de cette exécution.
+    resumable_clips, resubmitted_ids = recover_previous_runs(history, scheduler)
+    clips_attempted_in_this_run.extend(resubmitted_ids)
+    remaining_target = max(0, NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH - len(resubmitted_ids))
+
+    def candidate_source():
+        """
+        Étapes 2 et 3 (collecte) : produit d'abord les clips à reprendre, puis les clips éligibles,
+        du plus populaire au moins populaire. La collecte n'a lieu que si les reprises ne suffisent pas.
+        """
+        for resumed_clip in resumable_clips:
+            if resumed_clip['id'] not in clips_attempted_in_this_run:
+                clips_attempted_in_this_run.append(resumed_clip['id'])
+                yield resumed_clip
+        with metrics.stage("collect"):
+            eligible_clips_list = collect_eligible_clips(history, stats)
+        for selected_clip in eligible_clips_list:
+            # Vérifier si ce clip a déjà été tenté OU PUBLIÉ (par une exécution précédente, quel que soit le jour)
+            if selected_clip['id'] in clips_attempted_in_this_run or selected_clip['id'] in history:
+                print(f"ℹ️ Clip '{selected_clip['id']}' déjà tenté dans cette exécution ou déjà publié. Passage au suivant.")
+                continue
+            if thumbnail_hash.superseded(selected_clip, history):
+                # Repli d'un doublon visuel : inutile, le clip qu'il double a été publié
+                print(f"ℹ️ Clip '{selected_clip['id']}' : doublon visuel du clip publié '{selected_clip['duplicate_of']}'. Passage au suivant.")
+                continue
+            # Marquer le clip comme tenté pour cette exécution pour éviter les re-tentatives immédiates
+            clips_attempted_in_this_run.append(selected_clip['id'])
+            yield selected_clip
+
+    def upload_stage(job):
+        """Étape 7 : upload YouTube via le planificateur (ou report si le quota est épuisé)."""
+        print(f"📤 Démarrage de l'upload YouTube du clip '{job['clip']['id']}'...")
+        future = scheduler.submit(job["clip"], job["video_path"], job["metadata"])
+        if future is None:
+            # Upload différé faute de quota : la vidéo est prête et compte dans l'objectif.
+            job["deferred"] = True
+            return job
         try:
-            youtube_service = upload_youtube.get_authenticated_service()
-        except Exception as e:
-            print(f"❌ Erreur lors de l'authentification YouTube : {e}")
-            print("ℹ️ L'upload YouTube pour ce clip sera ignoré. Le script continuera pour le prochain clip/l'artefact.")
-
-        youtube_video_id = None
-        if youtube_service:
-            print("📤 Démarrage de l'upload YouTube...")
-            try:
-                youtube_video_id = upload_youtube.upload_youtube_short(youtube_service, final_video_for_upload, youtube_metadata)
-                
-                if youtube_video_id:
-                    print(f"🎉 Short YouTube publié avec succès ! ID: {youtube_video_id}")
-                    # 8. Mettre à jour l'historique des publications seulement si l'upload YouTube réussit
-                    try:
-                        add_to_history(history, selected_clip['id'], youtube_video_id)
-                        save_published_history(history)
-                        # Recharger today_published_ids pour que la prochaine itération de la boucle
-                        # ou une exécution future dans la même journée la voie comme publiée.
-                        today_published_ids = get_today_published_ids(history) 
-                        print(f"✅ Clip '{selected_clip['id']}' ajouté à l'historique des publications.")
-                        clips_published_count += 1 # Incrémente le compteur seulement si upload réussi
-                    except Exception as e:
-                        print(f"❌ Erreur lors de l'ajout/sauvegarde à l'historique après un upload réel: {e}")
-                else:
-                    print("❌ L'upload YouTube a échoué ou n'a pas retourné d'ID. Le Short n'a pas été publié sur YouTube.")
-                    print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
-            except Exception as e:
-                print(f"❌ Une erreur inattendue est survenue pendant l'upload YouTube : {e}")
-                print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
-        else:
-            print("❌ Service YouTube non authentifié. L'upload YouTube pour ce clip est ignoré.")
+            youtube_video_id = future.result()
+        except upload_scheduler.UploadOutcomeUnknown:
+            youtube_video_id = None # Enregistré dans l'historique par le planificateur : jamais retenté
+        # Mesures faites dans le thread d'upload (CPU, octets envoyés, requêtes API YouTube)
+        upload_sample = scheduler.pop_upload_sample(job["clip"]["id"])
+        upload_sample.pop("wall_seconds", None) # Le temps réel de l'étape inclut l'attente de l'upload
+        run_metrics.note(**upload_sample)
+        if not youtube_video_id:
             print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
+            return None
+        job["youtube_video_id"] = youtube_video_id
+        return job
 
-        # 9. Nettoyage des fichiers temporaires (uniquement le brut)
-        print("🧹 Nettoyage des fichiers temporaires pour ce clip...")
-        if os.path.exists(RAW_CLIP_PATH):
-            os.remove(RAW_CLIP_PATH)
-            print(f"  - Supprimé: {RAW_CLIP_PATH}")
-        # Le PROCESSED_CLIP_PATH est laissé pour être collecté comme artefact par GitHub Actions.
-        # Il sera écrasé lors de la prochaine itération ou du prochain run.
+    # --- Pipeline : collecte -> téléchargement -> rendu -> métadonnées -> upload ---
+    # Chaque étape a ses propres workers et des files bornées entre elles : le rendu du clip
+    # suivant avance pendant le téléchargement d'un autre et l'upload d'un troisième.
+    clip_pipeline = pipeline.Pipeline(
+        stages=[
+            pipeline.Stage("download", profiled("download", download_stage), workers=DOWNLOAD_WORKERS),
+            pipeline.Stage("render", profiled("render", render_stage), workers=RENDER_WORKERS, use_processes=True),
+            pipeline.Stage("metadata", profiled("metadata", metadata_stage), workers=METADATA_WORKERS),
+            pipeline.Stage("upload", profiled("upload", upload_stage), workers=UPLOAD_WORKERS),
+        ],
+        target_successes=remaining_target,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        lookahead=PIPELINE_LOOKAHEAD,
+        on_drop=cleanup_dropped_job,
+        metrics=metrics,
+        item_id=job_clip_id
+    )
+
+    try:
+        if remaining_target > 0:
+            clip_pipeline.run(candidate_source())
+    finally:
+        # 8. Attendre la fin des uploads encore en cours (uploads différés relancés)
+        if scheduler.in_flight():
+            print(f"⏳ Attente de la fin de {scheduler.in_flight()} upload(s) en cours...")
+        scheduler.shutdown()
+        history.close()
+        stats.save()
+        # Uploads différés relancés hors pipeline : enregistrés avec leurs propres mesures
+        record_background_uploads(metrics, scheduler, clips_published_in_this_run)
+        if remaining_target > 0:
+            clip_pipeline.print_summary()
+        metrics.export(RUN_METRICS_FILE, PROMETHEUS_METRICS_FILE)
 
     # Résumé de l'exécution
+    clips_published_count = len(clips_published_in_this_run)
+    if scheduler.deferred_in_this_run:
+        print(f"\n⏸️ {len(scheduler.deferred_in_this_run)} upload(s) différé(s) faute de quota YouTube. Ils seront repris lors de la prochaine exécution.")
     if clips_published_count == 0 and NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH > 0:
         print("\n🤷‍♂️ Aucune vidéo n'a pu être publiée avec succès lors de cette exécution.")
     elif clips_published_count > 0:
         print(f"\n🎉 {clips_published_count} Short(s) publié(s) avec succès lors de cette exécution.")
-    
+
     print("✅ Workflow terminé.")
 
+
+def open_profile_channel(profile, stats=None):
+    """
+    Ouvre l'historique, le registre de quota et le planificateur d'uploads propres à un profil
+    (dans data/profiles/<nom>/), avec les identifiants YouTube de sa chaîne.
+    Chaque publication crédite sa source dans stats (source_stats.SourceStats), si fourni.
+    """
+    os.makedirs(profile.data_dir, exist_ok=True)
+    history = publish_history.PublishHistory(os.path.join(profile.data_dir, 'published_shorts_history.sqlite3'))
+    history.compact()
+    published_ids = []
+
+    def record_publication(clip_data, youtube_video_id):
+        history.add(clip_data['id'], youtube_video_id)
+        published_ids.append(clip_data['id'])
+        if stats is not None:
+            stats.record_published(clip_data.get('source'))
+        print(f"✅ Clip '{clip_data['id']}' ajouté à l'historique du profil '{profile.name}'.")
+
+    scheduler = upload_scheduler.UploadScheduler(
+        service_factory=lambda: get_youtube_service(profile.youtube_token_file, profile.client_secrets_file),
+        ledger=upload_scheduler.QuotaLedger(os.path.join(profile.data_dir, 'youtube_quota_ledger.json')),
+        deferred_file=os.path.join(profile.data_dir, 'deferred_uploads.json'),
+        max_workers=UPLOAD_WORKERS,
+        on_published=record_publication,
+        on_outcome_unknown=lambda clip_data: history.add(clip_data['id'], None) # Jamais republié sur cette chaîne
+    )
+    print(f"📒 Profil '{profile.name}' : {len(history)} clip(s) dans l'historique, "
+          f"quota YouTube restant {scheduler.ledger.remaining()} unités.")
+    return {"profile": profile, "history": history, "scheduler": scheduler, "published_ids": published_ids}
+
+def run_profiles(profiles_path):
+    """
+    Mode --profiles : une seule collecte alimente plusieurs chaînes. Chaque profil a ses filtres,
+    son historique, son modèle de métadonnées et ses identifiants ; les sources communes ne sont
+    interrogées qu'une fois et un clip retenu par plusieurs profils n'est téléchargé et rendu qu'une fois.
+    """
+    print(f"🚀 Début du workflow multi-profils ({profiles_path})...")
+    os.makedirs(DATA_DIR, exist_ok=True)
+    channel_profiles = profiles.load_profiles(profiles_path, DATA_DIR)
+    metrics = run_metrics.RunMetrics()
+    stats = source_stats.SourceStats(PROFILES_SOURCE_STATS_FILE)
+    channels = {profile.name: open_profile_channel(profile, stats) for profile in channel_profiles}
+
+    # Uploads différés des exécutions précédentes (par chaîne) et fichiers encore utiles à une reprise
+    keep_paths = []
+    already_done = {}
+    for channel in channels.values():
+        keep_paths.extend(entry["video_path"] for entry in channel["scheduler"].load_deferred())
+    for record in checkpoints.load_all():
+        keep_paths.extend(checkpoints.artifact_paths(record))
+    cleanup_stale_processed_files(keep_paths)
+    for name, channel in channels.items():
+        already_done[name] = len(channel["scheduler"].resubmit_deferred(skip_clip_ids=channel["history"]))
+
+    clip_pipeline = None
+    try:
+        twitch_token = get_top_clips.get_twitch_access_token()
+        if not twitch_token:
+            print("❌ Impossible d'obtenir le jeton d'accès Twitch. Fin du script.")
+            return
+        thumbnails = open_thumbnail_filter()
+        with metrics.stage("collect"):
+            ranked = profiles.collect_for_profiles(
+                twitch_token, channel_profiles,
+                histories={name: channel["history"] for name, channel in channels.items()},
+                thumbnail_filter=thumbnails,
+                source_stats=stats # Demande dimensionnée par source d'après son rendement passé
+            )
+        if thumbnails is not None:
+            thumbnails.save()
+        assigner = profiles.FanOutAssigner(channel_profiles, ranked, already_done=already_done)
+        remaining_target = sum(max(0, assigner.quota[name] - assigner.reserved[name]) for name in channels)
+        if remaining_target == 0:
+            print("ℹ️ Les uploads différés relancés suffisent à l'objectif de chaque profil.")
+            return
+
+        def fan_out_download_stage(item):
+            """Téléchargement partagé : le job garde la liste des profils qui publieront le clip."""
+            job = download_stage(item["clip"])
+            if job is not None:
+                job["profiles"] = item["profiles"]
+            return job
+
+        def profile_metadata_stage(job):
+            """Métadonnées générées pour chaque profil, avec son propre modèle."""
+            job["profile_metadata"] = {}
+            for name in job["profiles"]:
+                youtube_metadata = generate_metadata.generate_youtube_metadata(
+                    job["clip"], channels[name]["profile"].metadata_template)
+                job["profile_metadata"][name] = youtube_metadata
+                print(f"[{name}] Titre: {youtube_metadata.get('title')}")
+            return job
+
+        def finish_clip(job, published_profiles):
+            assigner.finish(job["clip"]["id"], published_profiles)
+            if set(published_profiles) >= set(job["profiles"]):
+                checkpoints.remove(job["clip"]["id"])
+
+        def profile_upload_stage(job):
+            """Upload du même fichier vidéo sur chaque chaîne visée (les uploads des chaînes se chevauchent)."""
+            clip_id = job["clip"]["id"]
+            futures = {}
+            published_profiles = []
+            for name in job["profiles"]:
+                print(f"📤 Démarrage de l'upload du clip '{clip_id}' sur la chaîne du profil '{name}'...")
+                future = channels[name]["scheduler"].submit(job["clip"], job["video_path"], job["profile_metadata"][name])
+                if future is None:
+                    published_profiles.append(name) # Différé faute de quota : compte dans l'objectif du profil
+                else:
+                    futures[name] = future
+            for name, future in futures.items():
+                try:
+                    if future.result():
+                        published_profiles.append(name)
+                except upload_scheduler.UploadOutcomeUnknown:
+                    published_profiles.append(name) # Peut-être publié : jamais retenté sur cette chaîne
+                upload_sample = channels[name]["scheduler"].pop_upload_sample(clip_id)
+                upload_sample.pop("wall_seconds", None)
+                run_metrics.note(**upload_sample)
+            job["published_profiles"] = published_profiles
+            finish_clip(job, published_profiles)
+            return job if published_profiles else None
+
+        def drop_job(stage_name, item):
+            cleanup_dropped_job(stage_name, item)
+            if isinstance(item, dict) and "profiles" in item:
+                finish_clip(item, item.get("published_profiles", []))
+
+        clip_pipeline = pipeline.Pipeline(
+            stages=[
+                pipeline.Stage("download", profiled("download", fan_out_download_stage), workers=DOWNLOAD_WORKERS),
+                pipeline.Stage("render", profiled("render", render_stage), workers=RENDER_WORKERS, use_processes=True),
+                pipeline.Stage("metadata", profiled("metadata", profile_metadata_stage), workers=METADATA_WORKERS),
+                pipeline.Stage("upload", profiled("upload", profile_upload_stage), workers=UPLOAD_WORKERS),
+            ],
+            # La source s'arrête d'elle-même quand chaque profil est servi ; un clip partagé compte une fois.
+            target_successes=remaining_target,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            lookahead=0, # Les remplacements sont demandés par la source quand une publication échoue
+            on_drop=drop_job,
+            metrics=metrics,
+            item_id=job_clip_id
+        )
+        clip_pipeline.run(assigner.items(stopping=clip_pipeline.stopping))
+    finally:
+        for name, channel in channels.items():
+            channel["scheduler"].shutdown()
+            channel["history"].close()
+            record_background_uploads(metrics, channel["scheduler"], channel["published_ids"])
+        stats.save()
+        if clip_pipeline is not None:
+            clip_pipeline.print_summary()
+        metrics.export(RUN_METRICS_FILE, PROMETHEUS_METRICS_FILE)
+
+    for name, channel in channels.items():
+        deferred = len(channel["scheduler"].deferred_in_this_run)
+        print(f"📺 Profil '{name}' : {len(channel['published_ids'])} Short(s) publié(s)"
+              + (f", {deferred} upload(s) différé(s)." if deferred else "."))
+    print("✅ Workflow multi-profils terminé.")
+
+
+def run_daemon():
+    """
+    Mode --daemon : un processus permanent qui garde les imports, le jeton Twitch et les candidats
+    en mémoire, prépare les clips avant chaque créneau de publication et les publie à l'heure.
+    Arrêt propre sur SIGTERM, Ctrl+C ou `python main.py --daemon-command stop`.
+    """
+    import signal
+    from datetime import datetime, timedelta
+
+    print("🚀 Démarrage du bot en mode démon...")
+    os.makedirs(DATA_DIR, exist_ok=True)
+    history = publish_history.PublishHistory(PUBLISHED_HISTORY_DB, legacy_json_path=LEGACY_PUBLISHED_HISTORY_FILE)
+    history.compact()
+    published_ids = []
+    scheduler = open_upload_scheduler(history, published_ids)
+    resumable_clips, _ = recover_previous_runs(history, scheduler)
+    state = {"metrics": run_metrics.RunMetrics(), "token": None, "token_minted_at": None}
+    thumbnails = open_thumbnail_filter() # Empreintes gardées en mémoire d'un passage à l'autre
+
+    def collect(started_after):
+        # Le jeton d'application Twitch reste valide longtemps : inutile d'en demander un à chaque passage.
+        if state["token"] is None or datetime.now() - state["token_minted_at"] > timedelta(hours=TWITCH_TOKEN_MAX_AGE_HOURS):
+            state["token"] = get_top_clips.get_twitch_access_token()
+            state["token_minted_at"] = datetime.now()
+        if not state["token"]:
+            return []
+        with state["metrics"].stage("collect"):
+            clips = get_top_clips.get_eligible_short_clips(
+                access_token=state["token"],
+                num_clips_per_source=50,
+                already_published_clip_ids=history,
+                started_after=started_after,
+                thumbnail_filter=thumbnails
+            )
+        if thumbnails is not None:
+            thumbnails.save()
+        return clips
+
+    def make_prepare_pipeline(target):
+        # Le rendu tourne dans le processus du démon : MoviePy n'est importé qu'une fois
+        # et reste chaud d'un créneau à l'autre (rien d'autre n'y utilise le CPU).
+        return pipeline.Pipeline(
+            stages=[
+                pipeline.Stage("download", profiled("download", download_stage), workers=DOWNLOAD_WORKERS),
+                pipeline.Stage("render", profiled("render", render_stage), workers=RENDER_WORKERS),
+                pipeline.Stage("metadata", profiled("metadata", metadata_stage), workers=METADATA_WORKERS),
+            ],
+            target_successes=target,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            lookahead=0, # Les clips en trop seraient publiés plus tard avec des vues périmées
+            on_drop=cleanup_dropped_job,
+            metrics=state["metrics"],
+            item_id=job_clip_id
+        )
+
+    def publish(job):
+        scheduler.submit(job["clip"], job["video_path"], job["metadata"])
+
+    def export_metrics():
+        # Les uploads du créneau précédent sont terminés ou en cours : on exporte ceux qui sont finis.
+        metrics, state["metrics"] = state["metrics"], run_metrics.RunMetrics()
+        record_background_uploads(metrics, scheduler, published_ids)
+        metrics.export(RUN_METRICS_FILE, PROMETHEUS_METRICS_FILE)
+
+    shorts_daemon = daemon.ShortsDaemon(
+        collect=collect,
+        make_prepare_pipeline=make_prepare_pipeline,
+        publish=publish,
+        is_published=lambda clip_id: clip_id in history,
+        control_dir=DAEMON_CONTROL_DIR,
+        initial_clips=resumable_clips,
+        on_slot_published=export_metrics
+    )
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: shorts_daemon.stop())
+    try:
+        shorts_daemon.run()
+    finally:
+        if scheduler.in_flight():
+            print(f"⏳ Attente de la fin de {scheduler.in_flight()} upload(s) en cours...")
+        scheduler.shutdown()
+        history.close()
+        export_metrics()
+    print(f"✅ Démon terminé : {len(published_ids)} Short(s) publié(s) pendant son exécution.")
+
+def enqueue_jobs():
+    """
+    Mode --enqueue (coordinateur) : collecte les clips éligibles et dépose les meilleurs dans la file
+    partagée, jusqu'à NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH clips en attente ou en cours.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    queue_db = job_queue.JobQueue(JOB_QUEUE_DB)
+    counts = queue_db.counts()
+    open_jobs = sum(counts.get(state, 0) for state in ("queued", "leased", "publishing"))
+    wanted = NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH - open_jobs
+    if wanted <= 0:
+        print(f"ℹ️ {open_jobs} clip(s) déjà en attente ou en cours dans la file : rien à ajouter.")
+        return
+    # Historique partagé avec les workers (éventuellement sur d'autres machines) : sans WAL
+    history = publish_history.PublishHistory(PUBLISHED_HISTORY_DB, legacy_json_path=LEGACY_PUBLISHED_HISTORY_FILE,
+                                             shared=True)
+    stats = source_stats.SourceStats(SOURCE_STATS_FILE)
+    try:
+        eligible_clips_list = collect_eligible_clips(history, stats)
+    finally:
+        stats.save()
+    enqueued = []
+    try:
+        for clip in eligible_clips_list:
+            if len(enqueued) >= wanted:
+                break
+            # Repli d'un doublon visuel : pas déposé si le clip qu'il double est publié ou déposé maintenant
+            if thumbnail_hash.superseded(clip, history) or thumbnail_hash.superseded(clip, enqueued):
+                continue
+            # Un clip déjà passé par la file (publié, abandonné ou en cours) n'y est jamais redéposé.
+            if queue_db.enqueue(clip["id"], clip, priority=clip.get("viewer_count", 0)):
+                enqueued.append(clip["id"])
+                print(f"📥 Clip '{clip['id']}' ({clip.get('viewer_count', 0)} vues) déposé dans la file.")
+    finally:
+        history.close()
+    print(f"✅ {len(enqueued)} clip(s) déposé(s) dans {JOB_QUEUE_DB}.")
+
+def run_queue_worker(worker_id=None):
+    """
+    Mode --worker : prend des clips à bail dans la file partagée, les télécharge, les rend et les publie,
+    jusqu'à ce que la file soit vide. Plusieurs workers (sur une ou plusieurs machines partageant data/)
+    se répartissent les clips ; un clip n'est publié qu'une fois.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    queue_db = job_queue.JobQueue(JOB_QUEUE_DB)
+    # data/ est partagé par les workers : historique sans WAL, registre de quota relu sous verrou à chaque réservation
+    history = publish_history.PublishHistory(PUBLISHED_HISTORY_DB, legacy_json_path=LEGACY_PUBLISHED_HISTORY_FILE,
+                                             shared=True)
+    published_ids = []
+    stats = source_stats.SourceStats(SOURCE_STATS_FILE)
+    scheduler = open_upload_scheduler(history, published_ids, stats)
+
+    def prepare(clip):
+        job = profiled("download", download_stage)(clip)
+        job = job and profiled("render", render_stage)(job) # Rendu dans le processus du worker (un clip à la fois)
+        return job and profiled("metadata", metadata_stage)(job)
+
+    def publish(clip, job):
+        # Faute de quota, le clip est rendu à la file avec un délai (pas de fichier d'uploads différés propre
+        # à cette machine) ; une issue d'upload inconnue lève une exception : le clip reste en 'publishing'.
+        future = scheduler.submit(job["clip"], job["video_path"], job["metadata"], defer=False)
+        return job_queue.DEFERRED if future is None else future.result()
+
+    try:
+        job_queue.run_worker(queue_db, prepare, publish, worker_id=worker_id, can_publish=scheduler.can_afford_upload)
+    finally:
+        scheduler.shutdown()
+        history.close()
+        stats.save()
+
+def print_queue_status():
+    """Mode --queue-status : état de la file partagée et clips à vérifier à la main."""
+    queue_db = job_queue.JobQueue(JOB_QUEUE_DB)
+    print(f"📋 File {JOB_QUEUE_DB} : " + ", ".join(f"{state}={count}" for state, count in sorted(queue_db.counts().items())))
+    for job in queue_db.stale_publishing():
+        print(f"⚠️ Clip '{job['clip_id']}' : worker '{job['worker_id']}' mort pendant l'upload. "
+              f"Vérifiez la chaîne YouTube ; il ne sera pas republié automatiquement.")
+
+def send_daemon_command(command):
+    """Mode --daemon-command : envoie une commande au démon et affiche son dernier statut."""
+    daemon.send_command(DAEMON_CONTROL_DIR, command)
+    print(f"📨 Commande '{command}' déposée pour le démon.")
+    status = daemon.read_status(DAEMON_CONTROL_DIR)
+    if status is None:
+        print("ℹ️ Aucun statut publié : le démon n'a jamais tourné dans ce dossier.")
+    else:
+        print(json.dumps(status, indent=2, ensure_ascii=False))
+
 if __name__ == "__main__":
-    main()
-    print("DEBUG: Le script main.py s'est terminé sans erreur Python.")
+    parser = argparse.ArgumentParser(description="Publie des Shorts YouTube à partir des meilleurs clips Twitch.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Affiche les candidats classés et les métadonnées prévues, sans télécharger, rendre ni publier.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Reste actif et publie aux créneaux configurés (voir scripts/daemon.py).")
+    parser.add_argument("--profiles", metavar="FICHIER",
+                        help="Publie sur plusieurs chaînes à partir d'une seule collecte (voir profiles.example.json).")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Coordinateur : dépose les meilleurs clips éligibles dans la file partagée (JOB_QUEUE_DB).")
+    parser.add_argument("--worker", action="store_true",
+                        help="Worker : traite les clips de la file partagée jusqu'à ce qu'elle soit vide.")
+    parser.add_argument("--worker-id", help="Identifiant du worker (par défaut : machine-pid).")
+    parser.add_argument("--queue-status", action="store_true", help="Affiche l'état de la file partagée.")
+    parser.add_argument("--stream-download", action="store_true",
+                        help="Rend chaque clip pendant son téléchargement, sans fichier brut (voir STREAM_DOWNLOAD).")
+    parser.add_argument("--render-memory-mb", type=float, metavar="MO",
+                        help="Plafond de mémoire d'un rendu : au-delà de l'empreinte estimée, rendu en mode borné.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile chaque étape (cProfile et piles pour flamegraph, à côté des vidéos traitées).")
+    parser.add_argument("--daemon-command", choices=daemon.COMMANDS,
+                        help="Envoie une commande au démon en cours d'exécution et affiche son statut.")
+    args = parser.parse_args()
+    if args.stream_download:
+        STREAM_DOWNLOAD = True
+    if args.render_memory_mb:
+        os.environ["RENDER_MEMORY_CEILING_MB"] = str(args.render_memory_mb) # Lu par process_video (processus de rendu)
+    if args.profile:
+        stage_profiler.enable() # Variable d'environnement : héritée par les processus de rendu
+    if args.dry_run:
+        dry_run()
+    elif args.daemon_command:
+        send_daemon_command(args.daemon_command)
+    elif args.daemon:
+        run_daemon()
+    elif args.profiles:
+        run_profiles(args.profiles)
+    elif args.enqueue:
+        enqueue_jobs()
+    elif args.worker:
+        run_queue_worker(args.worker_id)
+    elif args.queue_status:
+        print_queue_status()
+    else:
+        main()
+        print("DEBUG: Le script main.py s'est terminé sans erreur Python.")
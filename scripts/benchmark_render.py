@@ -0,0 +1,222 @@
+# scripts/benchmark_render.py
+"""
+Benchmark du rendu des Shorts (process_video.trim_video_for_short) sur des vidéos synthétiques.
+
+Les vidéos d'entrée sont générées localement avec les sources de test de ffmpeg (mire + son),
+en paysage 720p30 et 1080p60, en portrait, et en version plus longue que MAX_VIDEO_DURATION_SECONDS
+(pour exercer le découpage). Le rendu utilise les vrais assets de 'assets/' (fond, polices, séquence de fin).
+
+Avec --proxy, les mêmes cas sont rendus en mode proxy (aperçu basse résolution, encodage le plus rapide),
+enregistrés et comparés sous leur propre nom ('<cas>_proxy').
+
+Chaque rendu s'exécute dans un processus neuf pour mesurer son pic de mémoire. Pour chaque cas :
+temps réel, images/s, pic de RSS (Python et ffmpeg) et taille du fichier produit. Avec --baseline,
+le benchmark échoue si un résultat régresse au-delà du seuil par rapport à la référence enregistrée.
+
+Exemples :
+    python scripts/benchmark_render.py --update-baseline
+    python scripts/benchmark_render.py --threshold 0.15
+    python scripts/benchmark_render.py --cases 720p30 portrait --repeat 3
+    python scripts/benchmark_render.py --proxy --cases 1080p60
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(SCRIPTS_DIR, '..'))
+sys.path.append(SCRIPTS_DIR)
+
+import get_top_clips
+
+DEFAULT_MEDIA_DIR = os.path.join(REPO_DIR, 'data', 'benchmark_media')
+DEFAULT_BASELINE_FILE = os.path.join(REPO_DIR, 'data', 'render_benchmark_baseline.json')
+# Régression tolérée par rapport à la référence (0.15 = 15 %)
+DEFAULT_REGRESSION_THRESHOLD = 0.15
+
+# Cas de test : (nom, largeur, hauteur, images/s, durée en secondes).
+# Le cas 'long' dépasse la durée maximale d'un Short pour exercer le découpage.
+BENCHMARK_CASES = [
+    ("720p30", 1280, 720, 30, 20),
+    ("1080p60", 1920, 1080, 60, 20),
+    ("portrait", 1080, 1920, 30, 20),
+    ("720p30_short", 1280, 720, 30, get_top_clips.MIN_VIDEO_DURATION_SECONDS),
+    ("720p30_long", 1280, 720, 30, get_top_clips.MAX_VIDEO_DURATION_SECONDS + 10),
+]
+
+# Mesures comparées à la référence, et sens d'une régression (+1 : plus grand est pire)
+REGRESSION_METRICS = {
+    "wall_seconds": +1,
+    "fps": -1,
+    "peak_rss_mb": +1,
+    "output_mb": +1,
+}
+
+
+def generate_input(path, width, height, fps, duration):
+    """Génère une vidéo de test (mire animée + sinusoïde) avec ffmpeg, si elle n'existe pas déjà."""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp.mp4"
+    command = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", tmp_path,
+    ]
+    subprocess.run(command, check=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def render_worker(input_path, output_path, max_duration_seconds, proxy=False):
+    """Exécuté dans un processus neuf : rend la vidéo et affiche les mesures en JSON sur la dernière ligne."""
+    import resource
+    import run_metrics
+    import process_video
+
+    clip_data = {"title": "Benchmark de rendu : un titre de clip assez long pour tenir sur deux lignes",
+                 "broadcaster_name": "benchmark"}
+    with run_metrics.measure() as sample:
+        result = process_video.trim_video_for_short(input_path, output_path,
+                                                    max_duration_seconds=max_duration_seconds,
+                                                    clip_data=clip_data, proxy=proxy)
+    # ru_maxrss est en Ko sous Linux
+    sample["ok"] = bool(result) and os.path.exists(output_path)
+    sample["python_peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    sample["ffmpeg_peak_rss_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(json.dumps(sample))
+
+
+def run_case(input_path, work_dir, max_duration_seconds, proxy=False):
+    output_path = os.path.join(work_dir, "output.mp4")
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    # Répertoire de travail dédié : MoviePy y écrit son fichier audio temporaire
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", input_path, output_path, str(max_duration_seconds),
+         "1" if proxy else "0"],
+        cwd=work_dir, capture_output=True, text=True
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        print(completed.stdout)
+        print(completed.stderr)
+        return {"ok": False}
+    sample = json.loads(lines[-1])
+    if not sample["ok"]:
+        print(completed.stdout)
+        return {"ok": False}
+    return {
+        "ok": True,
+        "wall_seconds": sample["wall_seconds"],
+        "cpu_seconds": sample["cpu_seconds"] + sample["children_cpu_seconds"],
+        "frames": sample.get("frames", 0),
+        "fps": sample.get("frames", 0) / sample["wall_seconds"],
+        # Les processus ffmpeg (lecture, écriture) tournent en même temps que Python : somme des pics
+        "peak_rss_mb": sample["python_peak_rss_mb"] + sample["ffmpeg_peak_rss_mb"],
+        "output_mb": os.path.getsize(output_path) / (1024 * 1024),
+    }
+
+
+def find_regressions(name, result, baseline, threshold):
+    regressions = []
+    reference = baseline.get(name)
+    if not reference or not result["ok"]:
+        return regressions
+    for metric, direction in REGRESSION_METRICS.items():
+        if metric not in reference or not reference[metric]:
+            continue
+        change = (result[metric] - reference[metric]) / reference[metric]
+        if change * direction > threshold:
+            regressions.append(f"{name}: {metric} {reference[metric]:.2f} -> {result[metric]:.2f} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results, baseline):
+    header = (f"{'Cas':<18} {'OK':>3} {'Temps (s)':>10} {'Réf. (s)':>9} {'img/s':>7} {'CPU (s)':>8} "
+              f"{'RSS (Mo)':>9} {'Sortie (Mo)':>12}")
+    print("\n" + header)
+    print("-" * len(header))
+    for name, r in results.items():
+        if not r["ok"]:
+            print(f"{name:<18} {'❌':>3}")
+            continue
+        reference = baseline.get(name, {}).get("wall_seconds")
+        reference_str = f"{reference:.2f}" if reference else "-"
+        print(f"{name:<18} {'✅':>3} {r['wall_seconds']:>10.2f} {reference_str:>9} {r['fps']:>7.1f} "
+              f"{r['cpu_seconds']:>8.1f} {r['peak_rss_mb']:>9.0f} {r['output_mb']:>12.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du rendu des Shorts sur des vidéos synthétiques.")
+    parser.add_argument("--cases", nargs="+", choices=[case[0] for case in BENCHMARK_CASES],
+                        help="Cas à exécuter (tous par défaut).")
+    parser.add_argument("--repeat", type=int, default=1, help="Rendus par cas (le rendu au temps médian est retenu).")
+    parser.add_argument("--max-duration", type=float, default=get_top_clips.MAX_VIDEO_DURATION_SECONDS,
+                        help="Durée maximale passée à trim_video_for_short.")
+    parser.add_argument("--media-dir", default=DEFAULT_MEDIA_DIR, help="Cache des vidéos de test générées.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE, help="Fichier JSON des résultats de référence.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Régression tolérée par rapport à la référence (0.15 = 15 %%).")
+    parser.add_argument("--proxy", action="store_true", help="Rend les cas en mode proxy (aperçu basse résolution).")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Enregistre les résultats comme nouvelle référence au lieu de les comparer.")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    selected = [case for case in BENCHMARK_CASES if not args.cases or case[0] in args.cases]
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for case_name, width, height, fps, duration in selected:
+            input_path = generate_input(os.path.join(args.media_dir, f"{case_name}_{duration}s.mp4"),
+                                        width, height, fps, duration)
+            name = f"{case_name}_proxy" if args.proxy else case_name
+            print(f"⏱️ Rendu du cas '{name}' ({width}x{height}, {fps} img/s, {duration}s)...")
+            runs = [run_case(input_path, work_dir, args.max_duration, args.proxy) for _ in range(args.repeat)]
+            successful = sorted((r for r in runs if r["ok"]), key=lambda r: r["wall_seconds"])
+            results[name] = successful[len(successful) // 2] if len(successful) == len(runs) else {"ok": False}
+            if results[name]["ok"] and args.repeat > 1:
+                results[name]["wall_seconds_runs"] = [r["wall_seconds"] for r in runs]
+                print(f"   temps médian {statistics.median(results[name]['wall_seconds_runs']):.2f}s "
+                      f"[min {successful[0]['wall_seconds']:.2f}s, max {successful[-1]['wall_seconds']:.2f}s]")
+
+    print_table(results, baseline)
+
+    ok = all(r["ok"] for r in results.values())
+    if args.update_baseline:
+        baseline.update({name: r for name, r in results.items() if r["ok"]})
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\n💾 Référence mise à jour : {args.baseline}")
+        return 0 if ok else 1
+
+    regressions = [line for name, r in results.items()
+                   for line in find_regressions(name, r, baseline, args.threshold)]
+    if regressions:
+        print(f"\n❌ Régressions au-delà de {args.threshold:.0%} par rapport à la référence :")
+        for line in regressions:
+            print(f"  - {line}")
+        ok = False
+    elif baseline:
+        print(f"\n✅ Aucune régression au-delà de {args.threshold:.0%}.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == "--worker":
+        render_worker(sys.argv[2], sys.argv[3], float(sys.argv[4]), sys.argv[5] == "1")
+    else:
+        sys.exit(main())
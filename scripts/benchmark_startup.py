@@ -0,0 +1,98 @@
+# scripts/benchmark_startup.py
+"""
+Benchmark du temps de démarrage : mesure le coût de `import main` dans un interpréteur neuf
+et vérifie qu'aucune pile lourde (MoviePy, NumPy, imageio, googleapiclient) n'est chargée au démarrage.
+
+Exemple :
+    python scripts/benchmark_startup.py --runs 5 --max-ms 400
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules qui ne doivent être importés que par l'étape qui les utilise
+HEAVY_MODULES = ["moviepy", "numpy", "imageio", "googleapiclient", "google_auth_oauthlib", "process_video", "upload_youtube"]
+
+IMPORT_PROBE = (
+    "import sys, json; sys.argv = ['main.py']; import main; "
+    f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+)
+
+
+def time_import(env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"`import main` a échoué :\n{result.stderr}")
+    return elapsed_ms, result.stdout.strip().splitlines()[-1]
+
+
+def baseline_interpreter_ms(env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], cwd=REPO_DIR, env=env, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def top_imports(env, limit):
+    """Retourne les modules les plus coûteux selon `python -X importtime` (temps cumulé, en ms)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # Format : "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du temps d'import de main.py.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Nombre de modules les plus coûteux à afficher.")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Échoue si le temps médian d'import (hors démarrage de l'interpréteur) dépasse ce seuil.")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+    time_import(env) # Préchauffage (compilation des .pyc)
+
+    interpreter_ms = statistics.median(baseline_interpreter_ms(env) for _ in range(args.runs))
+    samples = []
+    heavy_loaded = "[]"
+    for _ in range(args.runs):
+        elapsed_ms, heavy_loaded = time_import(env)
+        samples.append(elapsed_ms)
+    median_ms = statistics.median(samples)
+    import_ms = median_ms - interpreter_ms
+
+    print(f"⏱️ Interpréteur seul : {interpreter_ms:.0f} ms (médiane sur {args.runs})")
+    print(f"⏱️ `import main`     : {median_ms:.0f} ms (médiane), soit {import_ms:.0f} ms d'imports "
+          f"[min {min(samples):.0f} ms, max {max(samples):.0f} ms]")
+
+    print("\n--- Modules les plus coûteux (cumulé) ---")
+    for cumulative_ms, self_ms, name in top_imports(env, args.top):
+        print(f"  {cumulative_ms:>8.1f} ms  (propre {self_ms:>6.1f} ms)  {name}")
+
+    ok = True
+    if heavy_loaded != "[]":
+        print(f"\n❌ Modules lourds chargés au démarrage : {heavy_loaded}")
+        ok = False
+    else:
+        print("\n✅ Aucun module lourd chargé au démarrage.")
+    if args.max_ms is not None and import_ms > args.max_ms:
+        print(f"❌ Temps d'import ({import_ms:.0f} ms) au-delà du seuil de {args.max_ms:.0f} ms.")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# scripts/benchmark_upload.py
+"""
+Benchmark du chemin d'upload YouTube (upload_youtube.upload_youtube_short) contre le faux serveur local.
+
+Pour chaque taille de fichier et chaque taille de morceau, mesure le débit effectif (Mo/s),
+le nombre de requêtes renvoyées (retries) et le temps jusqu'à l'obtention de l'ID vidéo.
+
+Exemple :
+    python scripts/benchmark_upload.py --sizes-mb 5 20 50 --chunk-sizes-mb 1 8 -1 --bandwidth-mbps 20 --error-rate 0.05 --drop-rate 0.05
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import upload_youtube
+from fake_youtube_api import FakeYouTubeServer, build_fake_youtube_service
+
+MB = 1024 * 1024
+
+BENCHMARK_METADATA = {
+    "title": "Benchmark upload",
+    "description": "Upload de benchmark contre le faux serveur local.",
+    "tags": ["benchmark"],
+    "categoryId": "20",
+    "privacyStatus": "private",
+    "selfDeclaredMadeForKids": False,
+    "embeddable": True,
+    "license": "youtube",
+}
+
+
+def make_test_file(directory, size_bytes):
+    path = os.path.join(directory, f"bench_{size_bytes}.mp4")
+    with open(path, "wb") as f:
+        remaining = size_bytes
+        while remaining > 0:
+            block = os.urandom(min(MB, remaining))
+            f.write(block)
+            remaining -= len(block)
+    return path
+
+
+def expected_requests(size_bytes, chunk_bytes):
+    """Nombre minimal de requêtes sans panne : 1 POST d'initialisation + 1 PUT par morceau."""
+    if chunk_bytes <= 0:
+        return 2
+    return 1 + max(1, math.ceil(size_bytes / chunk_bytes))
+
+
+def run_case(fake, service, video_path, size_bytes, chunk_bytes, num_retries):
+    fake.reset_stats()
+    started = time.perf_counter()
+    try:
+        video_id = upload_youtube.upload_youtube_short(service, video_path, BENCHMARK_METADATA,
+                                                       chunksize=chunk_bytes, num_retries=num_retries)
+    except Exception as e: # Tentatives épuisées après l'ouverture de la session : issue inconnue
+        print(f"❌ Upload abandonné après l'ouverture de la session : {e}")
+        video_id = None
+    elapsed = time.perf_counter() - started
+    stats = dict(fake.stats)
+    return {
+        "size_mb": size_bytes / MB,
+        "chunk_mb": chunk_bytes / MB if chunk_bytes > 0 else -1,
+        "ok": bool(video_id),
+        "seconds": elapsed,
+        "mb_per_s": (size_bytes / MB) / elapsed if video_id and elapsed > 0 else 0.0,
+        "retries": max(0, stats["requests"] - expected_requests(size_bytes, chunk_bytes)),
+        "injected_errors": stats["injected_errors"],
+        "dropped_connections": stats["dropped_connections"],
+        "stalled_requests": stats["stalled_requests"],
+    }
+
+
+def print_table(results):
+    header = f"{'Taille':>8} {'Morceau':>8} {'OK':>3} {'Temps (s)':>10} {'Mo/s':>8} {'Retries':>8} {'5xx':>5} {'Coupures':>9} {'Bloquées':>9}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        chunk = "unique" if r["chunk_mb"] < 0 else f"{r['chunk_mb']:.2f}"
+        print(f"{r['size_mb']:>8.1f} {chunk:>8} {'✅' if r['ok'] else '❌':>3} {r['seconds']:>10.2f} "
+              f"{r['mb_per_s']:>8.2f} {r['retries']:>8} {r['injected_errors']:>5} {r['dropped_connections']:>9} {r['stalled_requests']:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de l'upload YouTube contre un faux serveur local.")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--chunk-sizes-mb", type=float, nargs="+", default=[1, 8, -1],
+                        help="Tailles de morceaux en Mo (arrondies à 256 Ko) ; -1 = envoi en une seule requête.")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="Débit montant maximal en Mo/s (0 = illimité).")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--retries", type=int, default=upload_youtube.UPLOAD_MAX_RETRIES)
+    parser.add_argument("--retry-base-delay", type=float, default=0.05,
+                        help="Délai de base du backoff après une coupure (réduit pour le benchmark).")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    upload_youtube.UPLOAD_RETRY_BASE_DELAY_SECONDS = args.retry_base_delay
+    quantum = 256 * 1024 # Les morceaux résumables doivent être des multiples de 256 Ko
+    chunk_sizes = [int(c * MB) // quantum * quantum or quantum if c > 0 else -1 for c in args.chunk_sizes_mb]
+
+    fake = FakeYouTubeServer(latency_seconds=args.latency_ms / 1000.0,
+                             bandwidth_bytes_per_second=args.bandwidth_mbps * MB or None,
+                             error_rate=args.error_rate, drop_rate=args.drop_rate, seed=args.seed)
+    results = []
+    with fake, tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"🧪 Faux serveur YouTube : {fake.api_endpoint}")
+        service = build_fake_youtube_service(fake.api_endpoint)
+        for size_mb in args.sizes_mb:
+            size_bytes = int(size_mb * MB)
+            video_path = make_test_file(tmp_dir, size_bytes)
+            for chunk_bytes in chunk_sizes:
+                print(f"\n⏱️ Upload de {size_mb} Mo, morceaux de {chunk_bytes if chunk_bytes > 0 else 'taille unique'} octets...")
+                results.append(run_case(fake, service, video_path, size_bytes, chunk_bytes, args.retries))
+            os.remove(video_path)
+
+    print_table(results)
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# scripts/candidate_table.py
+import sys
+from datetime import datetime, timezone
+
+# Capacité initiale des colonnes numériques (doublée à chaque dépassement).
+INITIAL_CAPACITY = 1024
+
+TWITCH_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# Formes canoniques des liens d'un clip Helix : non stockées, reconstruites depuis l'ID.
+CLIP_URL_TEMPLATE = "https://clips.twitch.tv/{clip_id}"
+EMBED_URL_TEMPLATE = "https://clips.twitch.tv/embed?clip={clip_id}"
+
+
+def _numpy():
+    import numpy # Chargé à la première collecte, pas au démarrage de main.py
+    return numpy
+
+
+class _NumericColumn:
+    """Colonne NumPy extensible (capacité doublée au besoin : ajout en O(1) amorti)."""
+
+    def __init__(self, dtype):
+        self._data = _numpy().empty(INITIAL_CAPACITY, dtype=dtype)
+        self._size = 0
+
+    def append(self, value):
+        if self._size == len(self._data):
+            grown = _numpy().empty(2 * len(self._data), dtype=self._data.dtype)
+            grown[:self._size] = self._data
+            self._data = grown
+        self._data[self._size] = value
+        self._size += 1
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+
+class _CategoryColumn:
+    """Colonne catégorielle : chaque valeur distincte est stockée une fois (internée), les lignes gardent un code."""
+
+    def __init__(self):
+        self.categories = []
+        self._codes_by_value = {}
+        self.codes = _NumericColumn("int32")
+
+    def code_for(self, value):
+        """Code d'une valeur, ou -1 si elle n'apparaît dans aucune ligne."""
+        return self._codes_by_value.get(value, -1)
+
+    def append(self, value):
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(sys.intern(value) if isinstance(value, str) else value)
+            self._codes_by_value[value] = code
+        self.codes.append(code)
+
+    def __getitem__(self, row):
+        return self.categories[self.codes.values[row]]
+
+
+class CandidateTable:
+    """
+    Table des clips candidats en colonnes, à la place d'un dict Python par clip.
+
+    - Streamer, jeu, langue, VOD et source : colonnes catégorielles (une chaîne par valeur distincte).
+    - Vues, durée, date de création et position dans la VOD : colonnes NumPy.
+    - Titre et miniature (propres à chaque clip) : listes de chaînes ; les liens du clip et de
+      l'intégration ne sont stockés que s'ils diffèrent de leur forme canonique (reconstruite depuis l'ID).
+
+    Filtres et tris se font sur les colonnes (masques et argsort NumPy) ; les dicts habituels d'un clip
+    ne sont construits qu'à la lecture d'une ligne (row()), par exemple quand le pipeline consomme un candidat.
+    """
+
+    def __init__(self):
+        np = _numpy()
+        self.ids = []
+        self.titles = []
+        self.thumbnail_urls = []
+        self._urls = {} # Ligne -> lien non canonique
+        self._embed_urls = {}
+        self.viewer_count = _NumericColumn(np.int64)
+        self.duration = _NumericColumn(np.float64)
+        self.created_at = _NumericColumn(np.float64) # Epoch UTC (NaN si inconnue)
+        self.vod_offset = _NumericColumn(np.float64) # NaN sans VOD
+        self.broadcaster_id = _CategoryColumn()
+        self.broadcaster_name = _CategoryColumn()
+        self.game_id = _CategoryColumn()
+        self.game_name = _CategoryColumn()
+        self.language = _CategoryColumn()
+        self.video_id = _CategoryColumn()
+        self.source = _CategoryColumn()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Ajout ---
+    def append_helix(self, clip, source=None):
+        """Ajoute un clip de la réponse Helix /clips. Retourne le numéro de sa ligne."""
+        row = len(self.ids)
+        clip_id = clip.get("id")
+        self.ids.append(clip_id)
+        self.titles.append(clip.get("title"))
+        self.thumbnail_urls.append(clip.get("thumbnail_url"))
+        if clip.get("url") != CLIP_URL_TEMPLATE.format(clip_id=clip_id):
+            self._urls[row] = clip.get("url")
+        if clip.get("embed_url") != EMBED_URL_TEMPLATE.format(clip_id=clip_id):
+            self._embed_urls[row] = clip.get("embed_url")
+        self.viewer_count.append(clip.get("view_count", 0))
+        self.duration.append(float(clip.get("duration", 0.0)))
+        self.created_at.append(self._parse_timestamp(clip.get("created_at")))
+        vod_offset = clip.get("vod_offset")
+        self.vod_offset.append(float("nan") if vod_offset is None else vod_offset)
+        self.broadcaster_id.append(clip.get("broadcaster_id"))
+        self.broadcaster_name.append(clip.get("broadcaster_name"))
+        self.game_id.append(clip.get("game_id"))
+        self.game_name.append(clip.get("game_name"))
+        self.language.append(clip.get("language"))
+        self.video_id.append(clip.get("video_id") or None)
+        self.source.append(source)
+        return row
+
+    @staticmethod
+    def _parse_timestamp(value):
+        try:
+            return datetime.strptime(value, TWITCH_TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+        except (TypeError, ValueError):
+            return float("nan")
+
+    # --- Requêtes en colonnes ---
+    def eligible_rows(self, rows, language, min_duration, max_duration):
+        """Lignes (parmi rows) qui respectent la langue et les bornes de durée, en liste d'entiers."""
+        np = _numpy()
+        rows = np.asarray(rows, dtype=np.int64)
+        duration = self.duration.values[rows]
+        mask = ((self.language.codes.values[rows] == self.language.code_for(language)) &
+                (duration >= min_duration) & (duration <= max_duration))
+        return rows[mask].tolist()
+
+    def rank(self, rows):
+        """Lignes triées par vues décroissantes (tri stable : l'ordre d'arrivée départage)."""
+        np = _numpy()
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[np.argsort(-self.viewer_count.values[rows], kind="stable")]
+
+    def interval(self, row):
+        """Intervalle [début, fin] du clip dans sa VOD, ou None sans VOD."""
+        start = self.vod_offset.values[row]
+        if self.video_id[row] is None or start != start: # NaN
+            return None
+        return float(start), float(start + self.duration.values[row])
+
+    # --- Matérialisation ---
+    def row(self, row):
+        """Dict d'un clip (clés habituelles d'un clip Helix, vues sous "viewer_count", et sa source)."""
+        row = int(row)
+        clip_id = self.ids[row]
+        created_at = self.created_at.values[row]
+        vod_offset = self.vod_offset.values[row]
+        return {
+            "id": clip_id,
+            "url": self._urls.get(row, CLIP_URL_TEMPLATE.format(clip_id=clip_id)),
+            "embed_url": self._embed_urls.get(row, EMBED_URL_TEMPLATE.format(clip_id=clip_id)),
+            "thumbnail_url": self.thumbnail_urls[row],
+            "title": self.titles[row],
+            "viewer_count": int(self.viewer_count.values[row]),
+            "broadcaster_id": self.broadcaster_id[row],
+            "broadcaster_name": self.broadcaster_name[row],
+            "game_id": self.game_id[row],
+            "game_name": self.game_name[row],
+            "created_at": None if created_at != created_at else
+                datetime.fromtimestamp(created_at, timezone.utc).strftime(TWITCH_TIMESTAMP_FORMAT),
+            "duration": float(self.duration.values[row]),
+            "language": self.language[row],
+            "video_id": self.video_id[row],
+            "vod_offset": None if vod_offset != vod_offset else int(vod_offset),
+            "source": self.source[row],
+        }
+
+    def view(self, rows):
+        return CandidateList(self, rows)
+
+
+class CandidateList:
+    """
+    Séquence de clips adossée à une CandidateTable (résultat de la sélection, déjà classé).
+    S'utilise comme une liste de dicts ; chaque dict n'est construit qu'à sa lecture.
+    Les clips gardés en repli d'un doublon visuel portent en plus la clé 'duplicate_of'
+    (ID du clip mieux classé qu'ils doublent, voir thumbnail_hash).
+    """
+
+    def __init__(self, table, rows, duplicate_of=None):
+        self.table = table
+        self.rows = rows
+        self.duplicate_of = duplicate_of or {} # Ligne -> ID du clip doublé
+
+    def _clip(self, row):
+        clip = self.table.row(row)
+        if int(row) in self.duplicate_of:
+            clip["duplicate_of"] = self.duplicate_of[int(row)]
+        return clip
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return len(self.rows) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._clip(row) for row in self.rows[index]]
+        return self._clip(self.rows[index])
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self._clip(row)
+
+    def select(self, positions, duplicate_of=None):
+        """
+        Sous-séquence (positions dans cette liste, dans l'ordre donné), sans construire de dict.
+        duplicate_of : position -> ID du clip doublé, pour les clips gardés en repli.
+        """
+        marked = dict(self.duplicate_of)
+        marked.update({int(self.rows[i]): clip_id for i, clip_id in (duplicate_of or {}).items()})
+        return CandidateList(self.table, [self.rows[i] for i in positions], marked)
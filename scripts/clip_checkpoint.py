@@ -0,0 +1,125 @@
+# scripts/clip_checkpoint.py
+import os
+import json
+from datetime import datetime, timedelta
+
+# Étapes franchies par un clip, dans l'ordre.
+STAGES = ("selected", "downloaded", "rendered", "metadata", "uploaded")
+
+# Un point de reprise plus ancien est abandonné (le clip n'est plus d'actualité).
+CHECKPOINT_MAX_AGE_HOURS = 48
+
+CHECKPOINT_FILE_PREFIX = "clip_state_"
+
+
+class ClipCheckpoints:
+    """
+    Points de reprise par clip : un petit fichier JSON par clip, à côté de ses fichiers vidéo,
+    qui indique la dernière étape terminée et les fichiers produits (avec leur taille).
+
+    Si une exécution est interrompue (ex : job GitHub Actions tué pendant l'upload),
+    l'exécution suivante reprend chaque clip à sa dernière étape terminée au lieu de le
+    retélécharger et de refaire le rendu. Un fichier n'est réutilisé que s'il existe encore
+    avec la taille enregistrée.
+
+    Chaque écriture est atomique (fichier temporaire, fsync puis renommage) : un crash laisse
+    l'ancien état ou le nouveau, jamais un fichier à moitié écrit. Un clip n'étant traité que par
+    une étape à la fois, les étapes (threads ou processus de rendu) peuvent écrire sans verrou.
+    """
+
+    def __init__(self, directory, max_age_hours=CHECKPOINT_MAX_AGE_HOURS):
+        self.directory = directory
+        self.max_age_hours = max_age_hours
+
+    def path_for(self, clip_id):
+        return os.path.join(self.directory, f"{CHECKPOINT_FILE_PREFIX}{clip_id}.json")
+
+    # --- Lecture ---
+    def load(self, clip_id):
+        """Retourne l'état enregistré d'un clip, ou None s'il n'y en a pas (ou s'il est illisible)."""
+        path = self.path_for(clip_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Point de reprise du clip '{clip_id}' illisible ({e}). Ignoré.")
+            return None
+
+    def load_all(self):
+        """
+        Retourne les états de tous les clips, du plus ancien au plus récent.
+        Les points de reprise expirés ou illisibles sont supprimés.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        cutoff = datetime.now() - timedelta(hours=self.max_age_hours)
+        records = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith(CHECKPOINT_FILE_PREFIX) and name.endswith('.json')):
+                continue
+            clip_id = name[len(CHECKPOINT_FILE_PREFIX):-len('.json')]
+            record = self.load(clip_id)
+            if record is None or datetime.fromisoformat(record.get("created_at", "1970-01-01")) < cutoff:
+                print(f"🧹 Point de reprise du clip '{clip_id}' expiré ou illisible. Supprimé.")
+                self.remove(clip_id)
+                continue
+            records.append(record)
+        return sorted(records, key=lambda r: r["created_at"])
+
+    @staticmethod
+    def reached(record, stage):
+        """Indique si le clip a terminé l'étape donnée (ou une étape ultérieure)."""
+        return record is not None and STAGES.index(record["stage"]) >= STAGES.index(stage)
+
+    @staticmethod
+    def artifact_valid(record, kind):
+        """Indique si le fichier 'raw' ou 'video' enregistré existe toujours avec la même taille."""
+        path = record.get(f"{kind}_path")
+        size = record.get(f"{kind}_size")
+        return bool(path) and bool(size) and os.path.exists(path) and os.path.getsize(path) == size
+
+    def resume_stage(self, record):
+        """
+        Retourne la dernière étape terminée dont les fichiers sont encore valides :
+        un rendu disparu du disque ramène au téléchargement, un téléchargement disparu à la sélection.
+        """
+        if self.reached(record, "uploaded"):
+            return "uploaded"
+        if self.reached(record, "rendered") and self.artifact_valid(record, "video"):
+            return record["stage"]
+        if self.reached(record, "downloaded") and self.artifact_valid(record, "raw"):
+            return "downloaded"
+        return "selected"
+
+    def artifact_paths(self, record):
+        """Fichiers vidéo encore utiles à la reprise d'un clip."""
+        return [record[f"{kind}_path"] for kind in ("raw", "video") if self.artifact_valid(record, kind)]
+
+    # --- Écriture ---
+    def save(self, clip_id, stage, **fields):
+        """Enregistre qu'un clip a terminé une étape, avec les champs associés (chemins, tailles, métadonnées...)."""
+        now = datetime.now().isoformat()
+        record = self.load(clip_id) or {"clip_id": clip_id, "created_at": now}
+        record.update(fields)
+        record["stage"] = stage
+        record["updated_at"] = now
+        for kind in ("raw", "video"):
+            path = record.get(f"{kind}_path")
+            if f"{kind}_path" in fields:
+                record[f"{kind}_size"] = os.path.getsize(path) if path and os.path.exists(path) else None
+
+        path = self.path_for(clip_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return record
+
+    def remove(self, clip_id):
+        path = self.path_for(clip_id)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,346 @@
+# scripts/daemon.py
+import os
+import json
+import threading
+from datetime import datetime, timedelta, time as dt_time, timezone
+
+# --- PARAMÈTRES DU MODE DÉMON ---
+# Heures de publication (heure locale du démon), au format "HH:MM".
+PUBLISH_SLOTS = ["12:00", "18:00"]
+# Nombre de Shorts publiés à chaque créneau.
+CLIPS_PER_SLOT = 1
+# Les clips du prochain créneau sont téléchargés et rendus à l'avance, à partir de ce délai avant le créneau.
+PREPARE_AHEAD_MINUTES = 60
+# Rafraîchissement incrémental des candidats : seuls les clips créés depuis le dernier passage sont demandés.
+CANDIDATE_REFRESH_MINUTES = 20
+# Rafraîchissement complet de la fenêtre (met à jour le nombre de vues des clips déjà connus).
+FULL_REFRESH_HOURS = 6
+# Fenêtre de collecte : un clip plus ancien n'est plus candidat.
+CANDIDATE_WINDOW_HOURS = 24
+# Chevauchement entre deux rafraîchissements incrémentaux (clips indexés en retard par Twitch).
+REFRESH_OVERLAP_MINUTES = 5
+# Délai maximal d'attente d'une préparation encore en cours à l'heure du créneau.
+SLOT_GRACE_MINUTES = 30
+# Intervalle de la boucle principale (commandes, statut, créneaux).
+DAEMON_TICK_SECONDS = 2
+# --- FIN PARAMÈTRES ---
+
+COMMAND_FILE_NAME = "command"
+STATUS_FILE_NAME = "status.json"
+# Commandes acceptées dans le fichier de contrôle
+COMMANDS = ("publish-now", "refresh", "status", "stop")
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def parse_slots(slots):
+    """Convertit ["HH:MM", ...] en heures triées."""
+    return sorted(dt_time(*map(int, slot.split(":"))) for slot in slots)
+
+
+def next_slot_after(moment, slots):
+    """Retourne le premier créneau strictement postérieur à moment."""
+    for day_offset in (0, 1):
+        day = (moment + timedelta(days=day_offset)).date()
+        for slot in slots:
+            candidate = datetime.combine(day, slot)
+            if candidate > moment:
+                return candidate
+    raise ValueError("Aucun créneau de publication configuré.")
+
+
+def send_command(control_dir, command):
+    """Dépose une commande pour le démon (lue à son prochain tour de boucle)."""
+    if command not in COMMANDS:
+        raise ValueError(f"Commande inconnue '{command}'. Commandes possibles : {', '.join(COMMANDS)}.")
+    os.makedirs(control_dir, exist_ok=True)
+    path = os.path.join(control_dir, COMMAND_FILE_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(command)
+    os.replace(tmp_path, path)
+
+
+def read_status(control_dir):
+    """Retourne le dernier statut publié par le démon, ou None."""
+    path = os.path.join(control_dir, STATUS_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ShortsDaemon:
+    """
+    Processus de publication permanent : les imports, le jeton Twitch et les candidats restent chauds.
+
+    - Un thread d'arrière-plan rafraîchit les candidats de façon incrémentale et prépare
+      (téléchargement, rendu, métadonnées) les meilleurs clips avant chaque créneau.
+    - La boucle principale publie les clips prêts à l'heure du créneau, traite les commandes
+      du fichier de contrôle et publie son statut dans status.json.
+    - stop() (ou la commande 'stop', SIGTERM, Ctrl+C) arrête proprement : la préparation en cours est
+      annulée (les points de reprise la conservent pour plus tard) et la boucle se termine.
+
+    Args:
+        collect (callable): collect(started_after) retourne les clips éligibles créés après cette date
+            (datetime UTC), déjà filtrés de l'historique.
+        make_prepare_pipeline (callable): make_prepare_pipeline(target) retourne un pipeline.Pipeline
+            dont les résultats sont des jobs prêts à publier.
+        publish (callable): publish(job) lance la publication d'un job prêt (en arrière-plan).
+        is_published (callable): is_published(clip_id) indique si un clip est déjà dans l'historique.
+        control_dir (str): Dossier du fichier de commande et de status.json.
+        initial_clips (list): Clips prioritaires (ex : repris d'une exécution interrompue).
+        on_slot_published (callable): Appelé après chaque créneau (ex : export des métriques).
+    """
+
+    def __init__(self, collect, make_prepare_pipeline, publish, is_published, control_dir,
+                 slots=PUBLISH_SLOTS, clips_per_slot=CLIPS_PER_SLOT, prepare_ahead_minutes=PREPARE_AHEAD_MINUTES,
+                 refresh_minutes=CANDIDATE_REFRESH_MINUTES, full_refresh_hours=FULL_REFRESH_HOURS,
+                 window_hours=CANDIDATE_WINDOW_HOURS, initial_clips=None, on_slot_published=None):
+        self.collect = collect
+        self.make_prepare_pipeline = make_prepare_pipeline
+        self.publish = publish
+        self.is_published = is_published
+        self.control_dir = control_dir
+        self.slots = parse_slots(slots)
+        self.clips_per_slot = clips_per_slot
+        self.prepare_ahead = timedelta(minutes=prepare_ahead_minutes)
+        self.refresh_interval = timedelta(minutes=refresh_minutes)
+        self.full_refresh_interval = timedelta(hours=full_refresh_hours)
+        self.window = timedelta(hours=window_hours)
+        self.on_slot_published = on_slot_published
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event() # Réveille le thread d'arrière-plan (commande, créneau passé)
+        self._candidates = {} # ID -> clip
+        self._priority_clips = list(initial_clips or [])
+        self._attempted = set()
+        self._ready = [] # Jobs prêts à publier, dans l'ordre de préparation
+        self._current_pipeline = None
+        self._prepared_for = None # Créneau pour lequel la dernière préparation s'est terminée
+        self._force_full_refresh = True
+        self._last_refresh = None # datetime UTC
+        self._last_full_refresh = None
+        self.next_slot = next_slot_after(datetime.now(), self.slots)
+        self.started_at = datetime.now()
+        self.published = [] # (clip_id, créneau)
+        self.last_error = None
+
+    # --- Candidats ---
+    def _refresh_candidates(self):
+        now = datetime.now(timezone.utc)
+        full = (self._force_full_refresh or self._last_full_refresh is None or
+                now - self._last_full_refresh >= self.full_refresh_interval)
+        started_after = now - self.window if full else self._last_refresh - timedelta(minutes=REFRESH_OVERLAP_MINUTES)
+        print(f"🔄 Rafraîchissement {'complet' if full else 'incrémental'} des candidats "
+              f"(clips créés depuis {started_after:%Y-%m-%d %H:%M} UTC)...")
+        clips = self.collect(started_after)
+        with self._lock:
+            for clip in clips:
+                self._candidates[clip["id"]] = clip # Met à jour le nombre de vues d'un clip connu
+            cutoff = now - self.window
+            for clip_id, clip in list(self._candidates.items()):
+                created_at = datetime.fromisoformat(clip["created_at"].replace("Z", "+00:00")) if clip.get("created_at") else now
+                if created_at < cutoff or clip_id in self._attempted or self.is_published(clip_id):
+                    del self._candidates[clip_id]
+            self._last_refresh = now
+            if full:
+                self._last_full_refresh = now
+                self._force_full_refresh = False
+            count = len(self._candidates)
+        print(f"✅ {count} candidat(s) en mémoire ({len(clips)} reçu(s) lors de ce rafraîchissement).")
+
+    def _refresh_due(self):
+        return (self._force_full_refresh or self._last_refresh is None or
+                datetime.now(timezone.utc) - self._last_refresh >= self.refresh_interval)
+
+    def _ranked_candidates(self):
+        """
+        Clips à préparer : d'abord les clips prioritaires, puis les candidats par vues décroissantes,
+        les replis de doublons visuels (clé 'duplicate_of') en dernier, ignorés si le clip doublé est publié.
+        """
+        with self._lock:
+            ranked = self._priority_clips + sorted(self._candidates.values(),
+                                                   key=lambda c: ("duplicate_of" in c, -c.get("viewer_count", 0)))
+        for clip in ranked:
+            with self._lock:
+                if clip["id"] in self._attempted or self.is_published(clip["id"]):
+                    continue
+                if clip.get("duplicate_of") is not None and self.is_published(clip["duplicate_of"]):
+                    continue
+                self._attempted.add(clip["id"])
+                self._candidates.pop(clip["id"], None)
+            yield clip
+
+    # --- Préparation ---
+    def _missing_ready(self):
+        with self._lock:
+            return max(0, self.clips_per_slot - len(self._ready))
+
+    def _has_candidates(self):
+        with self._lock:
+            return bool(self._priority_clips or self._candidates)
+
+    def _prepare_due(self):
+        if datetime.now() < self.next_slot - self.prepare_ahead or self._missing_ready() == 0:
+            return False
+        # Sans candidat, une seule tentative par créneau (le prochain rafraîchissement en apportera peut-être)
+        return self._has_candidates() or self._prepared_for != self.next_slot
+
+    def _prepare(self):
+        missing = self._missing_ready()
+        slot = self.next_slot
+        print(f"🎬 Préparation de {missing} clip(s) pour le créneau de {slot:%H:%M}...")
+        clip_pipeline = self.make_prepare_pipeline(missing)
+        with self._lock:
+            if self._stop.is_set():
+                return
+            self._current_pipeline = clip_pipeline
+        try:
+            jobs = clip_pipeline.run(self._ranked_candidates())
+        finally:
+            with self._lock:
+                self._current_pipeline = None
+        with self._lock:
+            self._ready.extend(jobs)
+            self._prepared_for = slot
+            self._priority_clips = [c for c in self._priority_clips if c["id"] not in self._attempted]
+        print(f"✅ {len(jobs)} clip(s) prêt(s) à publier.")
+
+    def _background_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._refresh_due():
+                    self._refresh_candidates()
+                if self._prepare_due():
+                    self._prepare()
+            except Exception as e:
+                self.last_error = f"{datetime.now().isoformat()} {e}"
+                print(f"❌ Erreur dans le thread de préparation du démon : {e}")
+            self._wake.wait(DAEMON_TICK_SECONDS * 5)
+            self._wake.clear()
+
+    # --- Publication ---
+    def _publish_ready(self, reason):
+        with self._lock:
+            jobs, self._ready = self._ready[:self.clips_per_slot], self._ready[self.clips_per_slot:]
+        if not jobs:
+            print(f"🤷‍♂️ Aucun clip prêt pour la publication ({reason}).")
+        for job in jobs:
+            clip_id = job["clip"]["id"]
+            if self.is_published(clip_id):
+                continue
+            print(f"📤 Publication du clip '{clip_id}' ({reason}).")
+            self.publish(job)
+            self.published.append((clip_id, datetime.now().isoformat(timespec="seconds")))
+        if self.on_slot_published:
+            self.on_slot_published()
+
+    def _slot_reached(self):
+        """
+        Le créneau est publié dès que ses clips sont prêts, ou que sa préparation est terminée
+        (même incomplète), ou au plus tard SLOT_GRACE_MINUTES après l'heure prévue.
+        """
+        now = datetime.now()
+        if now < self.next_slot:
+            return False
+        with self._lock:
+            preparing = self._current_pipeline is not None
+            prepared = self._prepared_for == self.next_slot
+        return (self._missing_ready() == 0 or (prepared and not preparing) or
+                now >= self.next_slot + timedelta(minutes=SLOT_GRACE_MINUTES))
+
+    # --- Contrôle ---
+    def _handle_command(self):
+        path = os.path.join(self.control_dir, COMMAND_FILE_NAME)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            command = f.read().strip()
+        os.remove(path)
+        print(f"📨 Commande reçue : '{command}'.")
+        if command == "publish-now":
+            if self._missing_ready() == self.clips_per_slot:
+                # Préparation immédiate : on considère le créneau comme imminent
+                self.next_slot = datetime.now()
+                self._wake.set()
+            else:
+                self._publish_ready("commande publish-now")
+        elif command == "refresh":
+            self._force_full_refresh = True
+            self._wake.set()
+        elif command == "stop":
+            self.stop()
+        elif command != "status":
+            print(f"⚠️ Commande inconnue ignorée : '{command}'.")
+
+    def status(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "state": "stopping" if self._stop.is_set() else
+                         ("preparing" if self._current_pipeline is not None else "idle"),
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+                "next_slot": self.next_slot.isoformat(timespec="minutes"),
+                "last_refresh": self._last_refresh.isoformat(timespec="seconds") if self._last_refresh else None,
+                "candidates": len(self._candidates),
+                "ready": [job["clip"]["id"] for job in self._ready],
+                "published": self.published[-20:],
+                "last_error": self.last_error,
+            }
+
+    def _write_status(self):
+        _write_json_atomic(os.path.join(self.control_dir, STATUS_FILE_NAME), self.status())
+
+    # --- Cycle de vie ---
+    def run(self):
+        """Boucle principale, jusqu'à stop()."""
+        os.makedirs(self.control_dir, exist_ok=True)
+        print(f"🛰️ Démon démarré (PID {os.getpid()}). Créneaux : {', '.join(s.strftime('%H:%M') for s in self.slots)}. "
+              f"Prochain créneau : {self.next_slot:%Y-%m-%d %H:%M}.")
+        background = threading.Thread(target=self._background_loop, name="daemon-prepare", daemon=True)
+        background.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._handle_command()
+                    if self._slot_reached():
+                        slot = self.next_slot
+                        self.next_slot = next_slot_after(max(datetime.now(), slot), self.slots)
+                        self._publish_ready(f"créneau de {slot:%H:%M}")
+                        self._wake.set()
+                    self._write_status()
+                except Exception as e:
+                    self.last_error = f"{datetime.now().isoformat()} {e}"
+                    print(f"❌ Erreur dans la boucle du démon : {e}")
+                self._stop.wait(DAEMON_TICK_SECONDS)
+        finally:
+            print("🛑 Arrêt du démon demandé...")
+            self.stop()
+            self._cancel_preparation()
+            background.join()
+            self._write_status()
+            print("🛑 Démon arrêté.")
+
+    def stop(self):
+        """
+        Demande l'arrêt : la boucle principale se termine et annule la préparation en cours.
+        Ne fait que lever deux Event (ni verrou ni écriture) : appelable depuis un gestionnaire de signal,
+        même si le signal interrompt le thread principal pendant qu'il tient self._lock.
+        """
+        self._stop.set()
+        self._wake.set()
+
+    def _cancel_preparation(self):
+        """Annule le pipeline de préparation en cours (appelé par run() une fois l'arrêt constaté)."""
+        with self._lock:
+            current = self._current_pipeline
+        if current is not None:
+            current.cancel()
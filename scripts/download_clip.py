@@ -3,6 +3,36 @@ import subprocess
 import sys
 import os
 
+# Format demandé en mode flux : un seul fichier MP4 progressif (vidéo et audio ensemble), lisible
+# par ffmpeg pendant son transfert. Les clips Twitch sont servis ainsi ; sinon, pas de flux.
+STREAM_FORMAT = "best[ext=mp4]/best"
+# Délai maximal de résolution de l'URL directe par yt-dlp.
+RESOLVE_TIMEOUT_SECONDS = 60
+
+def resolve_media_url(clip_url):
+    """
+    Résout l'URL directe du média d'un clip Twitch (yt-dlp -g), sans rien télécharger.
+    MoviePy (ffmpeg) lit cette URL pendant le transfert : le rendu commence dès les premiers octets
+    et aucun fichier brut n'est écrit sur le disque.
+
+    Returns:
+        str: L'URL directe, ou None si elle n'a pas pu être résolue en un seul flux
+             (l'appelant revient alors au téléchargement dans un fichier).
+    """
+    print(f"🔗 Résolution de l'URL directe du clip (mode flux) : {clip_url}")
+    command = [sys.executable, "-m", "yt_dlp", "-g", "-f", STREAM_FORMAT, clip_url]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=RESOLVE_TIMEOUT_SECONDS)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️ Résolution de l'URL directe impossible : {e}")
+        return None
+    urls = [line.strip() for line in result.stdout.splitlines() if line.strip()]
+    if result.returncode != 0 or len(urls) != 1:
+        # Vidéo et audio séparés (deux URL) ou échec : le flux ne peut pas être lu tel quel
+        print(f"⚠️ Pas d'URL directe unique pour ce clip (code {result.returncode}, {len(urls)} URL).")
+        return None
+    return urls[0]
+
 def download_twitch_clip(clip_url, output_path):
     """
     Télécharge un clip Twitch en utilisant yt-dlp.
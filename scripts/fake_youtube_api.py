@@ -0,0 +1,344 @@
+# scripts/fake_youtube_api.py
+"""
+Faux serveur local du protocole d'upload résumable de YouTube Data API (videos.insert).
+
+Il permet d'exercer upload_youtube.upload_youtube_short() sans les serveurs de Google,
+avec des pannes injectables : latence par requête, bande passante plafonnée,
+erreurs 5xx et connexions coupées en plein envoi.
+"""
+import json
+import random
+import re
+import socket
+import string
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+UPLOAD_PATH = "/upload/youtube/v3/videos"
+API_SERVICE_PATH = "/youtube/v3/"
+READ_BLOCK_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+class _BandwidthLimiter:
+    """Plafond de bande passante partagé par toutes les connexions (comme une liaison montante)."""
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def consume(self, num_bytes):
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            start = max(time.monotonic(), self._next_free)
+            self._next_free = start + num_bytes / self.bytes_per_second
+            wake_at = self._next_free
+        delay = wake_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _UploadSession:
+    def __init__(self, total_size, resource):
+        self.total_size = total_size
+        self.received = 0
+        self.resource = resource
+        self.video_id = None
+
+
+class FakeYouTubeServer:
+    """
+    Serveur HTTP local qui imite l'upload résumable de videos.insert.
+
+    Args:
+        latency_seconds (float): Délai ajouté avant chaque réponse.
+        bandwidth_bytes_per_second (int): Débit montant maximal (None = illimité).
+        error_rate (float): Probabilité de répondre 503 à une requête d'upload.
+        drop_rate (float): Probabilité de couper la connexion au milieu d'un morceau.
+        seed (int): Graine pour rendre les pannes injectées reproductibles.
+        stall_timeout_seconds (float): Délai après lequel un corps de requête incomplet est abandonné
+            (httplib2 renvoie parfois un morceau déjà consommé après une coupure : le serveur
+            doit alors fermer la connexion, comme le font les serveurs de Google).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_seconds=0.0, bandwidth_bytes_per_second=None,
+                 error_rate=0.0, drop_rate=0.0, seed=None, stall_timeout_seconds=2.0):
+        self.latency_seconds = latency_seconds
+        self.stall_timeout_seconds = stall_timeout_seconds
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._limiter = _BandwidthLimiter(bandwidth_bytes_per_second)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.reset_stats()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    # --- Cycle de vie ---
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_endpoint(self):
+        """Valeur à passer en client_options['api_endpoint'] à googleapiclient."""
+        return self.base_url + API_SERVICE_PATH
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-youtube", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {
+                "sessions_started": 0,
+                "requests": 0,
+                "chunks_accepted": 0,
+                "status_queries": 0,
+                "bytes_received": 0,
+                "injected_errors": 0,
+                "dropped_connections": 0,
+                "stalled_requests": 0,
+                "videos_created": 0,
+            }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _roll(self, probability):
+        if probability <= 0:
+            return False
+        with self._random_lock:
+            return self._random.random() < probability
+
+    # --- Gestionnaire HTTP ---
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            timeout = server.stall_timeout_seconds
+
+            def log_message(self, format, *args):
+                pass # Pas de journal par requête : le benchmark affiche ses propres statistiques
+
+            def _send_json(self, status, payload, extra_headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (extra_headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_error_json(self, status, reason, message):
+                self._send_json(status, {"error": {"code": status, "message": message,
+                                                   "errors": [{"reason": reason, "message": message}]}})
+
+            def _read_body(self, drop_after=None):
+                """
+                Lit le corps de la requête en respectant le plafond de bande passante.
+                Retourne None si le corps est incomplet (coupure injectée, client muet ou déconnecté).
+                """
+                remaining = int(self.headers.get("Content-Length", 0) or 0)
+                chunks = []
+                read = 0
+                while remaining > 0:
+                    if drop_after is not None and read >= drop_after:
+                        return None
+                    try:
+                        block = self.rfile.read(min(READ_BLOCK_SIZE, remaining))
+                    except OSError: # Inclut le délai d'attente dépassé
+                        block = b""
+                    if not block:
+                        server._count("stalled_requests")
+                        self.close_connection = True
+                        return None
+                    server._limiter.consume(len(block))
+                    chunks.append(block)
+                    read += len(block)
+                    remaining -= len(block)
+                return b"".join(chunks)
+
+            def _drop_connection(self):
+                server._count("dropped_connections")
+                self.close_connection = True
+                try:
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+            def do_POST(self):
+                server._count("requests")
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                body = self._read_body()
+                if body is None:
+                    return
+                if parsed.path != UPLOAD_PATH or query.get("uploadType") != ["resumable"]:
+                    self._send_error_json(404, "notFound", "Seul l'upload résumable de videos.insert est simulé.")
+                    return
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+                if server._roll(server.error_rate):
+                    server._count("injected_errors")
+                    self._send_error_json(503, "backendError", "Erreur 503 injectée.")
+                    return
+
+                total = self.headers.get("X-Upload-Content-Length")
+                resource = json.loads(body.decode("utf-8")) if body else {}
+                upload_id = uuid.uuid4().hex
+                with server._lock:
+                    server._sessions[upload_id] = _UploadSession(int(total) if total else None, resource)
+                    server.stats["sessions_started"] += 1
+                location = f"{server.base_url}{UPLOAD_PATH}?uploadType=resumable&upload_id={upload_id}"
+                self.send_response(200)
+                self.send_header("Location", location)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_PUT(self):
+                server._count("requests")
+                query = parse_qs(urlparse(self.path).query)
+                upload_id = (query.get("upload_id") or [None])[0]
+                with server._lock:
+                    session = server._sessions.get(upload_id)
+                if session is None:
+                    if self._read_body() is None:
+                        return
+                    self._send_error_json(404, "notFound", "Session d'upload inconnue.")
+                    return
+
+                content_range = self.headers.get("Content-Range", "")
+                match = CONTENT_RANGE_RE.match(content_range)
+                length = int(self.headers.get("Content-Length", 0) or 0)
+                is_status_query = match is not None and match.group(1) is None
+
+                if not is_status_query and length and server._roll(server.drop_rate):
+                    # Coupe la connexion au milieu du morceau, sans réponse.
+                    self._read_body(drop_after=length // 2)
+                    self._drop_connection()
+                    return
+
+                body = self._read_body()
+                if body is None:
+                    return
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+
+                if is_status_query:
+                    server._count("status_queries")
+                elif server._roll(server.error_rate):
+                    server._count("injected_errors")
+                    self._send_error_json(503, "backendError", "Erreur 503 injectée.")
+                    return
+                elif match:
+                    start, end = int(match.group(1)), int(match.group(2))
+                    with server._lock:
+                        # Un morceau qui ne reprend pas exactement à la position courante est ignoré :
+                        # le client se resynchronise avec l'en-tête Range de la réponse 308.
+                        if start == session.received and len(body) == end - start + 1:
+                            session.received = end + 1
+                            server.stats["chunks_accepted"] += 1
+                            server.stats["bytes_received"] += len(body)
+                        if match.group(3) != "*":
+                            session.total_size = int(match.group(3))
+
+                if session.total_size is not None and session.received >= session.total_size:
+                    self._send_json(200, self._video_resource(session))
+                    return
+
+                headers = {"Content-Length": "0"}
+                if session.received:
+                    headers["Range"] = f"bytes=0-{session.received - 1}"
+                self.send_response(308)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+
+            def _video_resource(self, session):
+                with server._lock:
+                    if session.video_id is None:
+                        alphabet = string.ascii_letters + string.digits + "-_"
+                        with server._random_lock:
+                            session.video_id = "".join(server._random.choice(alphabet) for _ in range(11))
+                        server.stats["videos_created"] += 1
+                resource = dict(session.resource)
+                resource.update({
+                    "kind": "youtube#video",
+                    "id": session.video_id,
+                    "status": dict(resource.get("status", {}), uploadStatus="uploaded"),
+                })
+                return resource
+
+        return Handler
+
+
+def build_fake_youtube_service(api_endpoint):
+    """Construit un service googleapiclient qui parle au faux serveur au lieu de Google."""
+    import httplib2
+    from googleapiclient.discovery import build
+
+    fake_netloc = urlparse(api_endpoint).netloc
+
+    class _PlainHttpToFake(httplib2.Http):
+        # googleapiclient garde le schéma https de l'URL d'upload média quand l'endpoint
+        # est surchargé : on le ramène en http pour le faux serveur local.
+        def request(self, uri, *args, **kwargs):
+            parsed = urlparse(uri)
+            if parsed.scheme == "https" and parsed.netloc == fake_netloc:
+                uri = parsed._replace(scheme="http").geturl()
+            return super().request(uri, *args, **kwargs)
+
+    http = _PlainHttpToFake(timeout=60) # Même délai par défaut que googleapiclient.http.build_http()
+    # Comme googleapiclient.http.build_http() : le 308 de l'upload résumable n'est pas une redirection.
+    http.redirect_codes = http.redirect_codes - {308}
+    return build("youtube", "v3", http=http, static_discovery=True,
+                 client_options={"api_endpoint": api_endpoint})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lance le faux serveur d'upload YouTube en local.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="Débit montant maximal en Mo/s (0 = illimité).")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeYouTubeServer(port=args.port, latency_seconds=args.latency_ms / 1000.0,
+                             bandwidth_bytes_per_second=args.bandwidth_mbps * 1024 * 1024 or None,
+                             error_rate=args.error_rate, drop_rate=args.drop_rate)
+    print(f"🧪 Faux serveur YouTube à l'écoute : {fake.api_endpoint}")
+    try:
+        fake._httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt du faux serveur.")
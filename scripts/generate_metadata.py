@@ -4,12 +4,15 @@ from datetime import datetime
 import locale
 import os
 
-def generate_youtube_metadata(clip_data):
+def generate_youtube_metadata(clip_data, template=None):
     """
     Génère un dictionnaire de métadonnées pour un Short YouTube.
 
     Args:
         clip_data (dict): Le dictionnaire contenant les informations du clip sélectionné.
+        template (dict): Modèle propre à une chaîne (profil), facultatif. Clés reconnues :
+            'title' et 'description' (chaînes format avec {clip_title}, {broadcaster_name}, {game_name},
+            {date} et {url}), 'extra_tags' (liste), 'category_id' et 'privacy_status'.
 
     Returns:
         dict: Un dictionnaire contenant 'title', 'description', et 'tags' (liste de strings).
@@ -48,8 +51,20 @@ def generate_youtube_metadata(clip_data):
     # Assurez-vous que la locale est appliquée pour le nom du mois.
     today_date = datetime.now().strftime('%d %B %Y')
 
+    template = template or {}
+    template_fields = {
+        "clip_title": clip_title_clean,
+        "broadcaster_name": broadcaster_name,
+        "game_name": game_name,
+        "date": today_date,
+        "url": clip_data.get('url', 'N/A'),
+    }
+
     # Titre du Short
-    title = f"{clip_title_clean} par {broadcaster_name} | Clip Twitch du Jour FR - {today_date}"
+    if template.get("title"):
+        title = template["title"].format(**template_fields)
+    else:
+        title = f"{clip_title_clean} par {broadcaster_name} | Clip Twitch du Jour FR - {today_date}"
     # S'assurer que le titre ne dépasse pas 100 caractères pour YouTube
     if len(title) > 100:
         # Tronque au lieu de couper brutalement pour éviter un titre trop long
@@ -71,6 +86,8 @@ Lien direct vers le clip : {clip_data.get('url', 'N/A')}
 
 #Twitch #Shorts #ClipsTwitch #Gaming #{clean_broadcaster_name_for_url} #{clean_game_name_for_hashtag}
 """
+    if template.get("description"):
+        description = template["description"].format(**template_fields)
     # YouTube limite les descriptions à 5000 caractères, ce qui est largement suffisant ici.
 
     # Tags du Short
@@ -80,7 +97,7 @@ Lien direct vers le clip : {clip_data.get('url', 'N/A')}
         "Gaming", "Gameplay", "Drôle", "Épique", "Highlight",
         broadcaster_name, game_name,
         "TwitchFr", "ShortsGaming"
-    ]
+    ] + list(template.get("extra_tags", []))
     
     # Nettoyage et normalisation des tags:
     # 1. Convertir en minuscules pour la cohérence
@@ -104,8 +121,8 @@ Lien direct vers le clip : {clip_data.get('url', 'N/A')}
         "title": title,
         "description": description,
         "tags": tags, # IMPORTANT : C'est une LISTE de strings ici
-        "categoryId": "20", # Catégorie "Gaming" pour YouTube
-        "privacyStatus": "public",
+        "categoryId": template.get("category_id", "20"), # Catégorie "Gaming" pour YouTube par défaut
+        "privacyStatus": template.get("privacy_status", "public"),
         "selfDeclaredMadeForKids": False, # Important pour les Shorts non destinés aux enfants
         "embeddable": True,
         "license": "youtube", # Standard YouTube License
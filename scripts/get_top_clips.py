@@ -2,17 +2,21 @@
 import requests
 import os
 import json
-import sys
+import heapq
+import functools
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
+import run_metrics
+import moment_index
+import candidate_table
+
 # Twitch API credentials from GitHub Secrets
+# (vérifiés dans get_twitch_access_token, pas à l'import : importer ce module n'a aucun effet de bord)
 CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
 CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
 
-if not CLIENT_ID or not CLIENT_SECRET:
-    print("❌ ERREUR: TWITCH_CLIENT_ID ou TWITCH_CLIENT_SECRET non définis.")
-    sys.exit(1)
-
 TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
 TWITCH_API_URL = "https://api.twitch.tv/helix/clips"
 
@@ -106,10 +110,22 @@ CLIP_LANGUAGE = "fr" # Code ISO 639-1 pour le français
 MIN_VIDEO_DURATION_SECONDS = 15   # Minimum 15 secondes pour un Short
 MAX_VIDEO_DURATION_SECONDS = 180  # Maximum 180 secondes (3 minutes) pour un Short
 
+# PARAMÈTRES DES FENÊTRES DE PLUSIEURS JOURS
+# Helix ne renvoie que les clips les plus vus de toute la fenêtre demandée : une fenêtre plus longue
+# que TIME_SLICE_HOURS est découpée en tranches, chacune interrogée avec le budget complet de la source,
+# pour ne pas manquer les bons clips des heures plus calmes.
+TIME_SLICE_HOURS = 24
+# Requêtes Helix simultanées : toutes les tranches d'une source, et les sources suivantes du plan,
+# sont soumises à l'avance (COLLECT_WORKERS sources au plus) pendant que la source courante est traitée.
+COLLECT_WORKERS = 8
+
 # --- FIN PARAMÈTRES ---
 
 def get_twitch_access_token():
-    """Gets an application access token for Twitch API."""
+    """Gets an application access token for Twitch API. Returns None on failure."""
+    if not CLIENT_ID or not CLIENT_SECRET:
+        print("❌ ERREUR: TWITCH_CLIENT_ID ou TWITCH_CLIENT_SECRET non définis.")
+        return None
     print("🔑 Récupération du jeton d'accès Twitch...")
     payload = {
         "client_id": CLIENT_ID,
@@ -118,22 +134,24 @@ def get_twitch_access_token():
     }
     try:
         response = requests.post(TWITCH_AUTH_URL, data=payload)
+        run_metrics.note(twitch_api_requests=1)
         response.raise_for_status()
         token_data = response.json()
         print("✅ Jeton d'accès Twitch récupéré.")
         return token_data["access_token"]
     except requests.exceptions.RequestException as e:
         print(f"❌ Erreur lors de la récupération du jeton d'accès Twitch : {e}")
-        sys.exit(1)
+        return None
 
-def fetch_clips(access_token, params, source_type, source_id):
-    """Helper function to fetch clips and handle errors."""
+def request_clips(access_token, params, source_type, source_id):
+    """Requête Helix /clips pour une source. Retourne les clips bruts de la réponse (vide en cas d'erreur)."""
     headers = {
         "Client-ID": CLIENT_ID,
         "Authorization": f"Bearer {access_token}"
     }
     try:
         response = requests.get(TWITCH_API_URL, headers=headers, params=params)
+        run_metrics.note(twitch_api_requests=1, bytes=len(response.content))
         response.raise_for_status()
         clips_data = response.json()
         
@@ -141,24 +159,7 @@ def fetch_clips(access_token, params, source_type, source_id):
             print(f"  ⚠️ Aucune donnée de clip trouvée pour {source_type} {source_id} dans la période spécifiée.")
             return []
 
-        collected_clips = []
-        for clip in clips_data.get("data", []):
-            collected_clips.append({
-                "id": clip.get("id"),
-                "url": clip.get("url"),
-                "embed_url": clip.get("embed_url"),
-                "thumbnail_url": clip.get("thumbnail_url"),
-                "title": clip.get("title"),
-                # CORRECTION ICI: Utilise "view_count" au lieu de "viewer_count"
-                "viewer_count": clip.get("view_count", 0),  # Clé correcte de l'API Twitch
-                "broadcaster_id": clip.get("broadcaster_id"),
-                "broadcaster_name": clip.get("broadcaster_name"),
-                "game_name": clip.get("game_name"),
-                "created_at": clip.get("created_at"),
-                "duration": float(clip.get("duration", 0.0)),
-                "language": clip.get("language")
-            })
-        return collected_clips
+        return clips_data.get("data", [])
             
     except requests.exceptions.RequestException as e:
         print(f"❌ Erreur lors de la récupération des clips Twitch pour {source_type} {source_id} : {e}")
@@ -171,72 +172,175 @@ def fetch_clips(access_token, params, source_type, source_id):
             print(f"    Contenu brut de la réponse: {response.content.decode()}")
         return []
 
-def get_eligible_short_clips(access_token, num_clips_per_source=50, days_ago=1, already_published_clip_ids=None):
+def time_slices(start_date, end_date, slice_hours=TIME_SLICE_HOURS):
+    """Découpe [start_date, end_date] en tranches consécutives d'au plus slice_hours heures."""
+    slices = []
+    slice_start = start_date
+    while slice_start < end_date:
+        slice_end = min(slice_start + timedelta(hours=slice_hours), end_date)
+        slices.append((slice_start, slice_end))
+        slice_start = slice_end
+    return slices or [(start_date, end_date)]
+
+def submit_source(executor, access_token, params, source_type, source_id, slices):
+    """Soumet au pool une requête par tranche de temps pour une source. Retourne les futures, dans l'ordre des tranches."""
+    request = functools.partial(request_clips, access_token, source_type=source_type, source_id=source_id)
+    return [executor.submit(run_metrics.measured_call, request,
+                            dict(params, started_at=slice_start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                                 ended_at=slice_end.strftime('%Y-%m-%dT%H:%M:%SZ')))
+            for slice_start, slice_end in slices]
+
+def merge_source_into(table, futures, source_type, source_id):
+    """
+    Attend les réponses d'une source (futures de submit_source) et les fusionne en flux (k-way merge),
+    déjà triées par vues, dans la CandidateTable. Retourne les numéros des lignes ajoutées, par vues décroissantes.
+    """
+    responses = []
+    for future in futures:
+        clips, sample = future.result()
+        # Requêtes faites dans les threads du pool : leurs compteurs sont reportés sur la mesure en cours
+        run_metrics.note(twitch_api_requests=sample.get("twitch_api_requests", 0), bytes=sample.get("bytes", 0))
+        responses.append(clips)
+    # "view_count" dans l'API Twitch (exposé sous "viewer_count"), VOD d'origine et position
+    # dans la VOD (doublons d'un même moment), source qui a fourni le clip (statistiques par source)
+    source = f"{source_type}:{source_id}"
+    merged = heapq.merge(*responses, key=lambda clip: clip.get("view_count", 0), reverse=True)
+    return [table.append_helix(clip, source=source) for clip in merged]
+
+def prefetch_sources(executor, access_token, planned, slices, lookahead=COLLECT_WORKERS, wanted=None):
+    """
+    Parcourt les sources du plan dans l'ordre, les requêtes (toutes tranches) des `lookahead` sources
+    suivantes étant déjà soumises au pool : les requêtes de plusieurs sources sont en vol en même temps,
+    même quand la fenêtre ne compte qu'une tranche.
+
+    Args:
+        planned: itérable de (type de source, ID, paramètres Helix, exploration), dans l'ordre de traitement.
+        wanted (callable): wanted(exploration) est appelé au moment de soumettre une source ; s'il retourne
+            False (ex : la collecte est arrêtée), la source est générée sans requête (futures vides).
+
+    Génère (type de source, ID, exploration, futures) ; l'appelant passe les futures à merge_source_into
+    ou les annule. Les requêtes soumises mais non consommées sont annulées à la fermeture du générateur.
+    """
+    planned = iter(planned)
+    pending = collections.deque()
+    try:
+        while True:
+            while len(pending) < lookahead:
+                entry = next(planned, None)
+                if entry is None:
+                    break
+                source_type, source_id, params, exploring = entry
+                futures = (submit_source(executor, access_token, params, source_type, source_id, slices)
+                           if wanted is None or wanted(exploring) else [])
+                pending.append((source_type, source_id, exploring, futures))
+            if not pending:
+                return
+            yield pending.popleft()
+    finally:
+        for _, _, _, futures in pending:
+            for future in futures:
+                future.cancel()
+
+def get_eligible_short_clips(access_token, num_clips_per_source=50, days_ago=1, already_published_clip_ids=None,
+                             started_after=None, source_stats=None, thumbnail_filter=None):
     """
     Récupère les clips populaires des chaînes spécifiées et des jeux,
     filtre ceux déjà publiés et ceux qui ne respectent pas les contraintes de durée/langue.
     Retourne une liste de clips éligibles, triés par popularité (vues).
+
+    already_published_clip_ids peut être n'importe quel conteneur supportant `in`
+    (liste, set ou PublishHistory) : il n'est pas copié.
+    started_after (datetime UTC) remplace days_ago comme début de la fenêtre (collecte incrémentale).
+    source_stats (source_stats.SourceStats), si fourni, dimensionne la demande faite à chaque source
+    d'après son rendement passé, ignore les sources froides (hors exploration) et arrête la collecte
+    dès que les candidats en main ne peuvent plus être battus. La collecte y est ensuite enregistrée.
+    thumbnail_filter (thumbnail_hash.ThumbnailDeduplicator), si fourni, écarte avant tout téléchargement
+    les clips dont la miniature est quasi identique à celle d'un clip mieux classé ou déjà publié.
     """
     if already_published_clip_ids is None:
-        already_published_clip_ids = []
+        already_published_clip_ids = set()
 
-    print(f"📊 Recherche de clips éligibles ({MIN_VIDEO_DURATION_SECONDS}-{MAX_VIDEO_DURATION_SECONDS}s) pour les dernières {days_ago} jour(s)...")
-    print(f"Clips déjà publiés aujourd'hui (transmis) : {len(already_published_clip_ids)} IDs.")
+    if started_after is None:
+        print(f"📊 Recherche de clips éligibles ({MIN_VIDEO_DURATION_SECONDS}-{MAX_VIDEO_DURATION_SECONDS}s) pour les dernières {days_ago} jour(s)...")
+    else:
+        print(f"📊 Recherche de clips éligibles ({MIN_VIDEO_DURATION_SECONDS}-{MAX_VIDEO_DURATION_SECONDS}s) créés depuis {started_after:%Y-%m-%d %H:%M} UTC...")
+    print(f"Clips déjà publiés (transmis) : {len(already_published_clip_ids)} IDs.")
             
     end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=days_ago)
+    start_date = started_after or end_date - timedelta(days=days_ago)
+    slices = time_slices(start_date, end_date)
+    if len(slices) > 1:
+        print(f"🕒 Fenêtre découpée en {len(slices)} tranches de {TIME_SLICE_HOURS}h, interrogées en parallèle.")
+
+    # Streamers d'abord, puis jeux ; une source listée deux fois n'est interrogée qu'une fois.
+    sources = list(dict.fromkeys([("broadcaster_id", broadcaster_id) for broadcaster_id in BROADCASTER_IDS] +
+                                 [("game_id", game_id) for game_id in GAME_IDS]))
+    if source_stats is None:
+        planned = [(source_type, source_id, num_clips_per_source, False) for source_type, source_id in sources]
+    else:
+        planned = source_stats.plan(sources, num_clips_per_source)
             
-    # Utilise un set pour une recherche rapide et pour éviter les doublons lors de la collecte
-    seen_clip_ids = set(already_published_clip_ids) 
-    all_potential_clips = []
+    # Utilise un set pour une recherche rapide et pour éviter les doublons lors de la collecte.
+    # Les clips déjà publiés sont vérifiés directement dans le conteneur transmis (sans copie).
+    seen_clip_ids = set()
+    # Candidats stockés en colonnes : filtres, dédoublonnage et tri travaillent sur des numéros de ligne,
+    # les dicts des clips ne sont construits que lorsqu'ils sont consommés.
+    table = candidate_table.CandidateTable()
+    # Un même moment clippé plusieurs fois (même VOD, intervalles qui se chevauchent) n'est gardé
+    # qu'une fois, avec le clip le plus vu : aucun téléchargement ni rendu n'est dépensé sur ses doublons.
+    views = lambda row: table.viewer_count.values[row]
+    moments = moment_index.MomentIndex(score=views, interval=table.interval,
+                                       vod=lambda row: table.video_id[row], key=lambda row: row)
+    per_source = {} # Clé de source -> compteurs de la collecte (statistiques par source)
+    stopped_early = False
 
     # --- Phase de collecte ---
-    # Collecte des clips des broadcasters
-    print("\n--- Collecte des clips des streamers spécifiés ---")
-    for broadcaster_id in BROADCASTER_IDS:
-        # print(f"  - Recherche de clips pour le streamer: {broadcaster_id}") # Moins verbeux
-        params = {
-            "first": num_clips_per_source,
-            "started_at": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "ended_at": end_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "sort": "views",
-            "broadcaster_id": broadcaster_id,
-            "language": CLIP_LANGUAGE
-        }
-        clips = fetch_clips(access_token, params, "broadcaster_id", broadcaster_id)
-        for clip in clips:
-            # Filtrer par langue et durée dès la collecte pour optimiser
-            if (clip["id"] not in seen_clip_ids and 
-                clip.get('language') == CLIP_LANGUAGE and
-                MIN_VIDEO_DURATION_SECONDS <= clip.get('duration', 0.0) <= MAX_VIDEO_DURATION_SECONDS):
-                all_potential_clips.append(clip)
-                seen_clip_ids.add(clip["id"]) # Ajoute à 'seen' pour éviter les doublons globaux
-    print(f"✅ Collecté {len(all_potential_clips)} clips uniques éligibles (streamers).")
-
-    # Collecte des clips des jeux (excluant ceux déjà vus des broadcasters et déjà publiés)
-    print("\n--- Collecte des clips des jeux spécifiés ---")
-    for game_id in GAME_IDS:
-        # print(f"  - Recherche de clips pour le jeu: {game_id}") # Moins verbeux
-        params = {
-            "first": num_clips_per_source,
-            "started_at": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "ended_at": end_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "sort": "views",
-            "game_id": game_id,
-            "language": CLIP_LANGUAGE
-        }
-        clips = fetch_clips(access_token, params, "game_id", game_id)
-        for clip in clips:
-            # Filtrer par langue et durée dès la collecte pour optimiser
-            if (clip["id"] not in seen_clip_ids and 
-                clip.get('language') == CLIP_LANGUAGE and
-                MIN_VIDEO_DURATION_SECONDS <= clip.get('duration', 0.0) <= MAX_VIDEO_DURATION_SECONDS):
-                all_potential_clips.append(clip)
-                seen_clip_ids.add(clip["id"])
-    print(f"✅ Collecté un total de {len(all_potential_clips)} clips uniques éligibles (streamers + jeux).")
-
+    print("\n--- Collecte des clips des streamers et des jeux spécifiés ---")
+    requests_plan = ((source_type, source_id, {
+        "first": first,
+        "sort": "views",
+        source_type: source_id,
+        "language": CLIP_LANGUAGE
+    }, exploring) for source_type, source_id, first, exploring in planned)
+    with ThreadPoolExecutor(max_workers=COLLECT_WORKERS, thread_name_prefix="twitch-collect") as executor:
+        # Une fois la collecte arrêtée, seules les sources tirées en exploration sont encore soumises
+        for source_type, source_id, exploring, futures in prefetch_sources(
+                executor, access_token, requests_plan, slices, wanted=lambda exploring: exploring or not stopped_early):
+            if source_stats is not None and not exploring and (stopped_early or source_stats.should_stop(
+                    (source_type, source_id), moments.scores())):
+                # Les sources restantes (moins prometteuses) ne battraient pas les candidats en main ;
+                # les sources tirées en exploration sont tout de même interrogées.
+                stopped_early = True
+                for future in futures:
+                    future.cancel() # Requête soumise à l'avance devenue inutile
+                continue
+            rows = merge_source_into(table, futures, source_type, source_id)
+            # Filtrer par langue et durée dès la collecte (masque sur les colonnes)
+            eligible = table.eligible_rows(rows, CLIP_LANGUAGE, MIN_VIDEO_DURATION_SECONDS, MAX_VIDEO_DURATION_SECONDS)
+            per_source[f"{source_type}:{source_id}"] = {
+                "fetched": len(rows),
+                "eligible": len(eligible),
+                "best_views": int(table.viewer_count.values[eligible].max()) if eligible else 0,
+            }
+            for row in eligible:
+                clip_id = table.ids[row]
+                # Filtrer les doublons et les clips déjà publiés dès la collecte
+                if clip_id not in seen_clip_ids and clip_id not in already_published_clip_ids:
+                    moments.offer(row)
+                    seen_clip_ids.add(clip_id) # Ajoute à 'seen' pour éviter les doublons globaux
     # Trier tous les clips éligibles par vues (plus populaire en premier)
-    all_potential_clips.sort(key=lambda x: x.get('viewer_count', 0), reverse=True)
+    all_potential_clips = table.view(table.rank(moments.clips()))
+    if moments.collapsed:
+        print(f"🔁 {moments.collapsed} clip(s) écarté(s) : même moment d'une VOD qu'un clip plus vu.")
+    if thumbnail_filter is not None:
+        # Même moment sans VOD commune (ré-uploads, VOD supprimée) : repéré par la miniature
+        all_potential_clips = thumbnail_filter.filter(all_potential_clips, already_published_clip_ids)
+    if stopped_early:
+        print(f"⏹️ Collecte arrêtée avant {len(planned) - len(per_source)} source(s) : les candidats en main suffisent.")
+    print(f"✅ Collecté un total de {len(all_potential_clips)} clips uniques éligibles (streamers + jeux, {len(per_source)} source(s) interrogée(s)).")
+
+    if source_stats is not None:
+        source_stats.record_collection(per_source, all_potential_clips)
 
     if not all_potential_clips:
         print(f"⚠️ Aucun clip éligible trouvé après collecte et filtrage (durée entre {MIN_VIDEO_DURATION_SECONDS} et {MAX_VIDEO_DURATION_SECONDS}s, non publié).")
@@ -254,20 +358,12 @@ def get_eligible_short_clips(access_token, num_clips_per_source=50, days_ago=1,
 if __name__ == "__main__":
     token = get_twitch_access_token()
     if token:
-        # Simule l'historique de publication pour le test
-        published_clips_log_path = os.path.join("data", "published_shorts_history.json")
-        current_published_ids = []
-        if os.path.exists(published_clips_log_path):
-            try:
-                with open(published_clips_log_path, "r", encoding="utf-8") as f:
-                    history_data = json.load(f)
-                    today_str = datetime.now(timezone.utc).date().isoformat()
-                    if today_str in history_data:
-                        current_published_ids = [item["twitch_clip_id"] for item in history_data[today_str]]
-            except json.JSONDecodeError:
-                print("⚠️ Fichier d'historique des publications corrompu ou vide. Utilisation d'un historique vide.")
-            except Exception as e:
-                print(f"❌ Erreur lors du chargement de l'historique simulé : {e}")
+        # Utilise l'historique de publication local pour le test
+        from publish_history import PublishHistory
+        current_published_ids = PublishHistory(
+            os.path.join("data", "published_shorts_history.sqlite3"),
+            legacy_json_path=os.path.join("data", "published_shorts_history.json")
+        )
 
         eligible_clips_list = get_eligible_short_clips(
             access_token=token,
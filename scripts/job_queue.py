@@ -0,0 +1,345 @@
+# scripts/job_queue.py
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# --- PARAMÈTRES DE LA FILE DE TRAVAUX ---
+# Durée d'un bail : un worker qui ne le renouvelle pas à temps (crash, machine perdue) le perd,
+# et le clip est repris par un autre worker.
+LEASE_SECONDS = 300
+# Le bail est renouvelé à ce rythme (en fraction de sa durée).
+HEARTBEAT_FRACTION = 1 / 3
+# Nombre de baux accordés à un même clip avant de l'abandonner (échecs répétés ou crashs en boucle).
+MAX_ATTEMPTS = 3
+# Intervalle d'attente d'un worker quand aucun clip n'est disponible.
+POLL_SECONDS = 5
+# Report d'un clip prêt quand le quota YouTube du jour est épuisé.
+QUOTA_RETRY_SECONDS = 3600
+# Attente maximale d'un verrou SQLite tenu par un autre processus.
+SQLITE_TIMEOUT_SECONDS = 30
+# --- FIN PARAMÈTRES ---
+
+# États d'un travail. 'publishing' n'est jamais repris automatiquement : un worker mort pendant
+# l'upload a peut-être publié la vidéo (au plus une publication par clip).
+# 'deferred' n'est plus attribué (anciennes files) : un clip différé revient en 'queued' avec un délai.
+STATES = ("queued", "leased", "publishing", "done", "deferred", "failed")
+
+# Retourné par la fonction de publication quand l'upload est refusé faute de quota, avant tout envoi.
+DEFERRED = "deferred"
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    File de travaux partagée dans un fichier SQLite (local ou sur un système de fichiers partagé),
+    sans broker externe. Un coordinateur y dépose les clips sélectionnés ; des workers (processus
+    sur une ou plusieurs machines) les prennent à bail, les préparent et les publient.
+
+    - lease() accorde un bail exclusif, renouvelé par heartbeat() ; les baux expirés sont récupérés
+      au bail suivant (le clip revient dans la file, jusqu'à MAX_ATTEMPTS baux).
+    - begin_publish() fait passer le clip en 'publishing' seulement si le worker détient toujours
+      un bail valide : un seul worker peut uploader un clip. Un clip resté en 'publishing' après
+      la mort de son worker n'est jamais republié automatiquement (voir stale_publishing()).
+
+    Chaque opération est une transaction SQLite 'BEGIN IMMEDIATE' sur une connexion dédiée :
+    les processus et les threads (heartbeat) s'excluent par le verrou du fichier.
+    Sur un partage réseau, le verrouillage de fichiers doit être fiable (NFSv4, SMB) ;
+    le journal WAL n'est pas utilisé car il exige une mémoire partagée locale.
+    """
+
+    def __init__(self, db_path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    clip_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    priority REAL NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    worker_id TEXT,
+                    lease_expires_at REAL,
+                    available_at REAL NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    youtube_video_id TEXT,
+                    last_error TEXT,
+                    enqueued_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, priority)")
+
+    @contextmanager
+    def _transaction(self):
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT_SECONDS, isolation_level=None)
+        try:
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    # --- Coordinateur ---
+    def enqueue(self, clip_id, payload, priority=0):
+        """Dépose un clip dans la file. Retourne False s'il y est déjà (quel que soit son état)."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs (clip_id, payload, priority, enqueued_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (clip_id, json.dumps(payload, ensure_ascii=False), priority, now, now))
+            return cursor.rowcount == 1
+
+    def __contains__(self, clip_id):
+        with self._transaction() as conn:
+            return conn.execute("SELECT 1 FROM jobs WHERE clip_id = ?", (clip_id,)).fetchone() is not None
+
+    def counts(self):
+        with self._transaction() as conn:
+            return dict(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def jobs(self, state=None):
+        query = ("SELECT clip_id, state, worker_id, attempts, lease_expires_at, youtube_video_id, last_error "
+                 "FROM jobs" + (" WHERE state = ?" if state else "") + " ORDER BY enqueued_at")
+        with self._transaction() as conn:
+            rows = conn.execute(query, (state,) if state else ()).fetchall()
+        keys = ("clip_id", "state", "worker_id", "attempts", "lease_expires_at", "youtube_video_id", "last_error")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def stale_publishing(self):
+        """Clips dont le worker est mort pendant l'upload : à vérifier à la main sur la chaîne YouTube."""
+        now = time.time()
+        return [job for job in self.jobs("publishing") if job["lease_expires_at"] < now]
+
+    # --- Workers ---
+    def _reclaim_expired(self, conn, now):
+        conn.execute("""
+            UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                            worker_id = NULL, last_error = 'bail expiré', updated_at = ?
+            WHERE state = 'leased' AND lease_expires_at < ?
+        """, (self.max_attempts, now, now))
+
+    def lease(self, worker_id):
+        """Prend à bail le clip disponible le plus prioritaire. Retourne (clip_id, payload) ou None."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._reclaim_expired(conn, now)
+            row = conn.execute("""
+                SELECT clip_id, payload FROM jobs
+                WHERE state = 'queued' AND available_at <= ?
+                ORDER BY priority DESC, enqueued_at LIMIT 1
+            """, (now,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("""
+                UPDATE jobs SET state = 'leased', worker_id = ?, lease_expires_at = ?,
+                                attempts = attempts + 1, updated_at = ?
+                WHERE clip_id = ?
+            """, (worker_id, now + self.lease_seconds, now, row[0]))
+        return row[0], json.loads(row[1])
+
+    def heartbeat(self, clip_id, worker_id):
+        """Renouvelle le bail. Retourne False si le worker ne le détient plus (expiré et repris)."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET lease_expires_at = ?, updated_at = ?
+                WHERE clip_id = ? AND worker_id = ? AND state IN ('leased', 'publishing')
+                      AND (state = 'publishing' OR lease_expires_at >= ?)
+            """, (now + self.lease_seconds, now, clip_id, worker_id, now))
+            return cursor.rowcount == 1
+
+    def begin_publish(self, clip_id, worker_id):
+        """
+        Réserve la publication du clip pour ce worker. Ne réussit que si son bail est toujours valide :
+        après ce point, le clip n'est plus jamais repris automatiquement.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET state = 'publishing', updated_at = ?
+                WHERE clip_id = ? AND worker_id = ? AND state = 'leased' AND lease_expires_at >= ?
+            """, (now, clip_id, worker_id, now))
+            return cursor.rowcount == 1
+
+    def _finish(self, clip_id, worker_id, states, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        placeholders = ", ".join("?" for _ in states)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE clip_id = ? AND worker_id = ? AND state IN ({placeholders})",
+                (*fields.values(), clip_id, worker_id, *states))
+            return cursor.rowcount == 1
+
+    def complete(self, clip_id, worker_id, youtube_video_id=None):
+        """Clip publié."""
+        return self._finish(clip_id, worker_id, ("publishing",), state="done", youtube_video_id=youtube_video_id)
+
+    def fail(self, clip_id, worker_id, error):
+        """
+        Échec sans publication (préparation ratée, ou upload terminé en erreur sans créer de vidéo) :
+        le clip revient dans la file, ou est abandonné après MAX_ATTEMPTS baux.
+        """
+        # Lecture des tentatives et changement d'état dans la même transaction (un bail repris ou
+        # un clip rendu à la file entre les deux ne peut pas être écrasé)
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                                last_error = ?, updated_at = ?
+                WHERE clip_id = ? AND worker_id = ? AND state IN ('leased', 'publishing')
+            """, (self.max_attempts, str(error), time.time(), clip_id, worker_id))
+            return cursor.rowcount == 1
+
+    def release(self, clip_id, worker_id, delay_seconds):
+        """
+        Rend le clip à la file sans compter de tentative, disponible seulement après delay_seconds.
+        Depuis 'publishing', uniquement si aucun envoi n'a commencé (upload refusé faute de quota).
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET state = 'queued', worker_id = NULL, attempts = attempts - 1,
+                                available_at = ?, updated_at = ?
+                WHERE clip_id = ? AND worker_id = ? AND state IN ('leased', 'publishing')
+            """, (time.time() + delay_seconds, time.time(), clip_id, worker_id))
+            return cursor.rowcount == 1
+
+    def has_pending(self):
+        """
+        Indique s'il reste des clips à traiter maintenant : pris à bail (peut-être repris à expiration)
+        ou en file et déjà disponibles. Les clips rendus à la file avec un délai (quota) n'en font pas partie.
+        """
+        with self._transaction() as conn:
+            return conn.execute("""
+                SELECT 1 FROM jobs WHERE state = 'leased' OR (state = 'queued' AND available_at <= ?) LIMIT 1
+            """, (time.time(),)).fetchone() is not None
+
+    def delayed_count(self):
+        """Nombre de clips en file qui ne seront disponibles que plus tard (rendus faute de quota)."""
+        with self._transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND available_at > ?",
+                                (time.time(),)).fetchone()[0]
+
+
+class LeaseKeeper:
+    """Renouvelle un bail en arrière-plan pendant le traitement d'un clip. `lost` est levé si le bail est perdu."""
+
+    def __init__(self, job_queue, clip_id, worker_id):
+        self.job_queue = job_queue
+        self.clip_id = clip_id
+        self.worker_id = worker_id
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{clip_id}", daemon=True)
+
+    def _run(self):
+        interval = self.job_queue.lease_seconds * HEARTBEAT_FRACTION
+        while not self._stop.wait(interval):
+            try:
+                renewed = self.job_queue.heartbeat(self.clip_id, self.worker_id)
+            except sqlite3.Error as e:
+                print(f"⚠️ Renouvellement du bail du clip '{self.clip_id}' impossible : {e}")
+                continue
+            if not renewed:
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(job_queue, prepare, publish, worker_id=None, can_publish=lambda: True,
+               exit_when_idle=True, max_jobs=None, stop=None):
+    """
+    Boucle d'un worker : prend un clip à bail, le prépare (prepare(payload) -> résultat ou None),
+    puis le publie (publish(payload, résultat) -> ID YouTube, None en cas d'échec, ou DEFERRED).
+    Un clip DEFERRED est rendu à la file pour QUOTA_RETRY_SECONDS : n'importe quel worker le reprendra.
+    Retourne le nombre de clips publiés par ce worker.
+
+    Args:
+        can_publish (callable): Indique si la publication est possible maintenant (quota YouTube).
+            Vérifié avant de prendre un bail (aucun clip n'est préparé pour rien), puis avant la publication
+            (un autre worker a pu épuiser le quota entre-temps : le clip est alors rendu à la file).
+        exit_when_idle (bool): S'arrête quand rien n'est disponible maintenant dans la file (les clips rendus
+            avec un délai attendent un prochain worker) ou que le quota est épuisé.
+        stop (threading.Event): Arrêt demandé (le clip en cours est terminé d'abord).
+    """
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    finished = 0
+    handled = 0
+    print(f"👷 Worker '{worker_id}' démarré sur {job_queue.db_path}.")
+    while not stop.is_set() and (max_jobs is None or handled < max_jobs):
+        if not can_publish():
+            if exit_when_idle:
+                print(f"⏸️ Quota YouTube épuisé : worker '{worker_id}' arrêté, les clips restent dans la file.")
+                break
+            stop.wait(POLL_SECONDS)
+            continue
+        leased = job_queue.lease(worker_id)
+        if leased is None:
+            if exit_when_idle and not job_queue.has_pending():
+                delayed = job_queue.delayed_count()
+                if delayed:
+                    print(f"ℹ️ {delayed} clip(s) rendu(s) à la file avec un délai : repris par un prochain worker.")
+                break
+            stop.wait(POLL_SECONDS)
+            continue
+        clip_id, payload = leased
+        handled += 1
+        print(f"🔒 Worker '{worker_id}' : clip '{clip_id}' pris à bail.")
+        with LeaseKeeper(job_queue, clip_id, worker_id) as keeper:
+            try:
+                prepared = prepare(payload)
+                error = "préparation échouée"
+            except Exception as e:
+                prepared, error = None, e
+            if keeper.lost.is_set():
+                print(f"⚠️ Bail du clip '{clip_id}' perdu pendant la préparation : abandonné à l'autre worker.")
+                continue
+            if prepared is None:
+                job_queue.fail(clip_id, worker_id, error)
+                continue
+            if not can_publish():
+                print(f"⏸️ Quota YouTube épuisé : clip '{clip_id}' rendu à la file pour {QUOTA_RETRY_SECONDS}s.")
+                job_queue.release(clip_id, worker_id, QUOTA_RETRY_SECONDS)
+                continue
+            if not job_queue.begin_publish(clip_id, worker_id):
+                print(f"⚠️ Bail du clip '{clip_id}' expiré avant la publication : abandonné.")
+                continue
+            try:
+                youtube_video_id = publish(payload, prepared)
+            except Exception as e:
+                # Issue inconnue : le clip reste en 'publishing' (jamais republié automatiquement).
+                print(f"❌ Erreur pendant la publication du clip '{clip_id}' : {e}")
+                continue
+            if youtube_video_id == DEFERRED:
+                # Quota épuisé entre la vérification et la réservation (autre worker) : rien n'a été envoyé
+                print(f"⏸️ Quota YouTube épuisé : clip '{clip_id}' rendu à la file pour {QUOTA_RETRY_SECONDS}s.")
+                job_queue.release(clip_id, worker_id, QUOTA_RETRY_SECONDS)
+            elif youtube_video_id:
+                job_queue.complete(clip_id, worker_id, youtube_video_id)
+                finished += 1
+            else:
+                # L'upload résumable n'a pas abouti : aucune vidéo n'a été créée, le clip peut être retenté.
+                job_queue.fail(clip_id, worker_id, "upload échoué")
+    print(f"👷 Worker '{worker_id}' arrêté : {finished} clip(s) publié(s).")
+    return finished
@@ -0,0 +1,92 @@
+# scripts/moment_index.py
+import bisect
+
+# Deux clips d'une même VOD montrent le même moment si leur chevauchement couvre au moins
+# cette fraction du plus court des deux.
+MIN_OVERLAP_RATIO = 0.5
+
+
+class MomentIndex:
+    """
+    Index d'intervalles par VOD ([vod_offset, vod_offset + durée], en secondes) qui ne garde,
+    pour chaque moment clippé plusieurs fois, que le clip au meilleur score.
+
+    Les clips sans VOD (VOD supprimée ou non archivée : video_id vide, vod_offset nul) sont toujours gardés.
+    Chaque offre coûte O(log n + k) : recherche dichotomique des intervalles proches par début,
+    k étant le nombre de clips gardés qui commencent dans la fenêtre de la durée maximale d'un clip.
+
+    Les clips sont des dicts par défaut ; score, interval, vod et key permettent d'indexer
+    d'autres représentations (ex : numéros de ligne d'une CandidateTable).
+    """
+
+    def __init__(self, score=lambda clip: clip.get("viewer_count", 0), min_overlap_ratio=MIN_OVERLAP_RATIO,
+                 interval=None, vod=lambda clip: clip.get("video_id"), key=lambda clip: clip["id"]):
+        self.score = score
+        self.min_overlap_ratio = min_overlap_ratio
+        self.interval = interval or self.clip_interval
+        self.vod = vod
+        self.key = key
+        self._vods = {} # video_id -> (débuts triés, [(début, fin, clip)] dans le même ordre)
+        self._max_duration = 0.0
+        self._order = {} # ID du clip -> rang d'arrivée (pour rendre les survivants dans l'ordre d'offre)
+        self._without_vod = []
+        self.collapsed = 0
+
+    @staticmethod
+    def clip_interval(clip):
+        if not clip.get("video_id") or clip.get("vod_offset") is None:
+            return None
+        start = float(clip["vod_offset"])
+        return start, start + float(clip.get("duration", 0.0))
+
+    def _same_moment(self, a_start, a_end, b_start, b_end):
+        overlap = min(a_end, b_end) - max(a_start, b_start)
+        shortest = min(a_end - a_start, b_end - b_start)
+        return overlap > 0 and overlap >= self.min_overlap_ratio * max(shortest, 1e-9)
+
+    def offer(self, clip):
+        """Ajoute un clip. Retourne False s'il double un clip déjà gardé au score supérieur ou égal."""
+        self._order.setdefault(self.key(clip), len(self._order))
+        interval = self.interval(clip)
+        if interval is None:
+            self._without_vod.append(clip)
+            return True
+        start, end = interval
+        starts, entries = self._vods.setdefault(self.vod(clip), ([], []))
+        # Les clips gardés qui peuvent chevaucher celui-ci commencent dans [début - durée max, fin[
+        low = bisect.bisect_left(starts, start - self._max_duration)
+        high = bisect.bisect_left(starts, end)
+        duplicates = [i for i in range(low, high) if self._same_moment(start, end, entries[i][0], entries[i][1])]
+        if any(self.score(entries[i][2]) >= self.score(clip) for i in duplicates):
+            self.collapsed += 1
+            return False
+        for i in reversed(duplicates):
+            del starts[i]
+            del entries[i]
+            self.collapsed += 1
+        position = bisect.bisect_right(starts, start)
+        starts.insert(position, start)
+        entries.insert(position, (start, end, clip))
+        self._max_duration = max(self._max_duration, end - start)
+        return True
+
+    def scores(self):
+        """Scores des clips gardés, sans ordre (ex : seuil des meilleurs candidats, sans trier les clips)."""
+        for clip in self._without_vod:
+            yield self.score(clip)
+        for _, entries in self._vods.values():
+            for entry in entries:
+                yield self.score(entry[2])
+
+    def clips(self):
+        """Clips gardés, dans leur ordre d'offre."""
+        kept = self._without_vod + [entry[2] for _, entries in self._vods.values() for entry in entries]
+        return sorted(kept, key=lambda clip: self._order[self.key(clip)])
+
+
+def collapse_same_moments(clips):
+    """Retourne les clips sans les doublons d'un même moment (le meilleur score est gardé), dans leur ordre."""
+    index = MomentIndex()
+    for clip in clips:
+        index.offer(clip)
+    return index.clips()
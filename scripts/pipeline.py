@@ -0,0 +1,307 @@
+# scripts/pipeline.py
+import queue
+import threading
+import time
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import run_metrics
+
+# Intervalle auquel les workers bloqués vérifient si le pipeline doit s'arrêter.
+POLL_INTERVAL_SECONDS = 0.2
+
+_END_OF_SOURCE = object()
+
+
+class Stage:
+    """
+    Étape du pipeline.
+
+    Args:
+        name (str): Nom de l'étape (pour les journaux et le résumé).
+        func (callable): Fonction appliquée à chaque élément. Elle retourne l'élément à passer
+            à l'étape suivante, ou None si l'élément est abandonné (échec).
+        workers (int): Nombre d'éléments traités en parallèle par cette étape.
+        use_processes (bool): Exécute func dans des processus séparés (étapes CPU comme le rendu).
+            func et les éléments doivent alors être picklables (fonction de niveau module).
+    """
+
+    def __init__(self, name, func, workers=1, use_processes=False):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.use_processes = use_processes
+        self.executor = None
+        self.stats = {"processed": 0, "failed": 0, "busy_seconds": 0.0}
+
+
+class Pipeline:
+    """
+    Enchaîne des étapes reliées par des files bornées (back-pressure) : chaque étape
+    avance à son rythme, et la latence totale tend vers celle de l'étape la plus lente
+    plutôt que vers la somme de toutes les étapes.
+
+    Le pipeline s'arrête dès que target_successes éléments ont traversé la dernière étape.
+    Pour ne pas gaspiller de travail, au plus target_successes + lookahead éléments sont
+    en cours à un instant donné, et la dernière étape n'est jamais lancée au-delà de l'objectif.
+
+    Args:
+        stages (list[Stage]): Étapes, dans l'ordre.
+        target_successes (int): Nombre d'éléments à mener au bout avant l'arrêt anticipé.
+        queue_size (int): Capacité de chaque file entre deux étapes.
+        lookahead (int): Éléments admis en plus de l'objectif restant (travail spéculatif).
+        on_drop (callable): Appelé avec (nom_étape, élément) pour chaque élément abandonné
+            ou annulé, afin de nettoyer ses fichiers temporaires.
+        metrics (run_metrics.RunMetrics): Si fourni, chaque appel d'étape est mesuré là où il
+            s'exécute (thread ou processus) et enregistré avec son issue.
+        item_id (callable): Retourne l'identifiant d'un élément pour les métriques.
+    """
+
+    def __init__(self, stages, target_successes, queue_size=2, lookahead=1, on_drop=None, metrics=None, item_id=None):
+        self.stages = stages
+        self.target_successes = target_successes
+        self.queue_size = queue_size
+        self.lookahead = lookahead
+        self.on_drop = on_drop
+        self.metrics = metrics
+        self.item_id = item_id or (lambda item: None)
+        self.results = []
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._finalizing = 0
+        self._producer_done = False
+
+    # --- Comptabilité ---
+    def _successes(self):
+        return len(self.results)
+
+    def _target_reached(self):
+        return self._successes() >= self.target_successes
+
+    def _finished(self):
+        return self._target_reached() or (self._producer_done and self._in_flight == 0)
+
+    def _release(self, stage_name, item, dropped=True):
+        if dropped and self.on_drop:
+            try:
+                self.on_drop(stage_name, item)
+            except Exception as e:
+                print(f"⚠️ Erreur lors du nettoyage d'un élément abandonné ({stage_name}) : {e}")
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    # --- Producteur (première étape : la source d'éléments) ---
+    def _produce(self, source):
+        items = iter(source)
+        try:
+            while True:
+                # L'admission est vérifiée AVANT de tirer l'élément suivant : la source (souvent un
+                # générateur qui marque ses clips comme tentés) n'en produit jamais un qui serait ignoré.
+                with self._cond:
+                    while (not self._stop.is_set() and
+                           self._successes() + self._in_flight >= self.target_successes + self.lookahead):
+                        self._cond.wait(POLL_INTERVAL_SECONDS)
+                    if self._stop.is_set() or self._target_reached():
+                        break
+                    self._in_flight += 1
+                try:
+                    item = next(items, _END_OF_SOURCE)
+                except Exception:
+                    self._release("source", None, dropped=False)
+                    raise
+                if item is _END_OF_SOURCE:
+                    self._release("source", None, dropped=False)
+                    break
+                if not self._put(0, item):
+                    self._release("source", item)
+                    break
+        except Exception as e:
+            print(f"❌ Erreur dans la source du pipeline : {e}")
+        finally:
+            with self._cond:
+                self._producer_done = True
+                self._cond.notify_all()
+
+    def _put(self, index, item):
+        """Place un élément dans la file d'une étape, en bloquant tant qu'elle est pleine."""
+        while not self._stop.is_set():
+            try:
+                self._queues[index].put(item, timeout=POLL_INTERVAL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # --- Workers ---
+    def _call(self, stage, item):
+        func = stage.func
+        if self.metrics is not None:
+            # Mesure faite dans le worker lui-même : retourne (résultat, mesure)
+            func = functools.partial(run_metrics.measured_call, stage.func)
+        if not stage.use_processes:
+            return func(item)
+        with self._cond:
+            executor = stage.executor
+        if executor is None:
+            return None # Pipeline annulé : le pool a déjà été arrêté
+        future = executor.submit(func, item)
+        while not future.done():
+            if self._stop.is_set():
+                future.cancel()
+                return None
+            time.sleep(POLL_INTERVAL_SECONDS)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            if self._stop.is_set():
+                return None # Processus interrompu par l'annulation du pipeline
+            # Un processus a été tué (ex : manque de mémoire) : le pool est recréé pour les éléments suivants.
+            print(f"❌ Un processus de l'étape '{stage.name}' s'est arrêté brutalement. Recréation du pool.")
+            with self._cond:
+                if stage.executor is executor:
+                    stage.executor = self._make_executor(stage)
+            return None
+
+    def _work(self, index):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        while not self._stop.is_set():
+            try:
+                item = self._queues[index].get(timeout=POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+
+            if is_last:
+                # Ne jamais lancer la dernière étape (la publication) au-delà de l'objectif
+                with self._cond:
+                    if self._successes() + self._finalizing >= self.target_successes:
+                        skip = True
+                    else:
+                        skip = False
+                        self._finalizing += 1
+                if skip:
+                    self._release(stage.name, item)
+                    continue
+
+            started = time.perf_counter()
+            outcome, sample = "ok", {}
+            try:
+                result = self._call(stage, item)
+                if self.metrics is not None and result is not None:
+                    result, sample = result
+            except Exception as e:
+                print(f"❌ Erreur dans l'étape '{stage.name}' : {e}")
+                result = None
+                outcome = "error"
+            elapsed = time.perf_counter() - started
+            if self.metrics is not None:
+                if result is None and outcome == "ok":
+                    outcome = "cancelled" if self._stop.is_set() else "failed"
+                sample.setdefault("wall_seconds", elapsed)
+                self.metrics.record(stage.name, self.item_id(item), sample, outcome)
+            with self._cond:
+                stage.stats["busy_seconds"] += elapsed
+                if result is None:
+                    stage.stats["failed"] += 1
+                else:
+                    stage.stats["processed"] += 1
+                if is_last:
+                    self._finalizing -= 1
+                    if result is not None:
+                        self.results.append(result)
+
+            if result is None:
+                self._release(stage.name, item)
+            elif is_last:
+                self._release(stage.name, result, dropped=False)
+            elif not self._put(index + 1, result):
+                self._release(stage.name, result)
+
+    # --- Exécution ---
+    @staticmethod
+    def _make_executor(stage):
+        # 'spawn' : les threads d'upload actifs ne doivent pas être dupliqués par fork().
+        return ProcessPoolExecutor(max_workers=stage.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def run(self, source):
+        """Exécute le pipeline sur les éléments de source. Retourne les résultats de la dernière étape."""
+        for stage in self.stages:
+            if stage.use_processes:
+                stage.executor = self._make_executor(stage)
+
+        threads = [threading.Thread(target=self._produce, args=(source,), name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                threads.append(threading.Thread(target=self._work, args=(index,),
+                                                name=f"pipeline-{stage.name}-{n}", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            with self._cond:
+                while not self._finished():
+                    self._cond.wait(POLL_INTERVAL_SECONDS)
+            if self._target_reached():
+                print(f"✅ Objectif de {self.target_successes} élément(s) atteint : arrêt du pipeline.")
+        except KeyboardInterrupt:
+            print("\n🛑 Interruption demandée : annulation du travail en cours...")
+            raise
+        finally:
+            self.cancel()
+            for thread in threads:
+                thread.join()
+            self._drain_queues()
+        return self.results
+
+    def stopping(self):
+        """Indique si le pipeline s'arrête (objectif atteint ou annulation) : une source bloquante doit rendre la main."""
+        return self._stop.is_set() or self._target_reached()
+
+    @staticmethod
+    def _pool_processes(executor):
+        """Processus de travail d'un pool (créés à la demande : à relever avant son arrêt, qui les oublie)."""
+        return list((executor._processes or {}).values())
+
+    def cancel(self):
+        """Arrête le pipeline : plus aucun élément n'est admis ni transmis, le travail en cours est annulé."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+            # Les pools sont retirés des étapes : plus rien n'y est soumis, et un second appel est sans effet
+            pools = [(stage.executor, self._pool_processes(stage.executor))
+                     for stage in self.stages if stage.executor is not None]
+            for stage in self.stages:
+                stage.executor = None
+            work_in_progress = self._in_flight > 0
+        for executor, _ in pools:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if work_in_progress:
+            # Les rendus devenus inutiles sont interrompus plutôt qu'attendus. Seuls les processus des pools
+            # de ce pipeline sont visés : pas ceux d'un autre pipeline, du démon ou du planificateur d'uploads.
+            for _, processes in pools:
+                for process in processes:
+                    process.terminate()
+        for _, processes in pools:
+            for process in processes:
+                process.join()
+
+    def _drain_queues(self):
+        for stage, q in zip(self.stages, self._queues):
+            while True:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                self._release(stage.name, item)
+
+    def print_summary(self):
+        print("\n--- Résumé du pipeline par étape ---")
+        for stage in self.stages:
+            s = stage.stats
+            print(f"  {stage.name:<10} workers={stage.workers} réussis={s['processed']} échoués={s['failed']} "
+                  f"temps occupé={s['busy_seconds']:.1f}s")
@@ -1,10 +1,190 @@
 import os
 import sys
+import subprocess
+import threading
+from collections import OrderedDict
 from typing import List, Optional
 
 from moviepy.editor import VideoFileClip, CompositeVideoClip, TextClip, ImageClip, ColorClip, concatenate_videoclips
 from moviepy.video.fx.all import crop, even_size, resize as moviepy_resize
-import numpy as np # Gardé car il pourrait être utile pour d'autres traitements futurs
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+import numpy as np
+
+import run_metrics
+import stage_profiler
+
+# --- PARAMÈTRES DU DÉCODEUR D'ANALYSE ---
+# Les analyses du contenu d'un clip (webcam, scènes, qualité) travaillent sur de petites images :
+# largeur des images décodées (la hauteur suit le format du clip) et images par seconde échantillonnées.
+ANALYSIS_WIDTH = 320
+ANALYSIS_FPS = 1.0
+# Ne décoder que les images clés (ffmpeg -skip_frame nokey) : quelques millisecondes par image au lieu
+# du décodage de toutes les images du clip ; chaque échantillon est alors l'image clé la plus proche
+# (à l'intervalle entre images clés près, 2 s pour les clips Twitch).
+ANALYSIS_KEYFRAMES_ONLY = True
+# Nombre de décodages gardés en mémoire (par ID de clip et réglages), du plus récent au plus ancien.
+ANALYSIS_CACHE_SIZE = 16
+# Instant de l'image analysée pour la recherche de la webcam (en secondes).
+WEBCAM_SEARCH_TIME = 1.0
+# --- FIN PARAMÈTRES ---
+
+# --- PARAMÈTRES DU RENDU PROXY (aperçus rapides, jamais publiés) ---
+# Le proxy rend la même composition que le Short final, toutes dimensions multipliées par PROXY_SCALE
+# (1/3 : 360x640), à PROXY_FPS images/s au plus, avec les réglages d'encodage les plus rapides.
+PROXY_SCALE = 1 / 3
+PROXY_FPS = 15
+PROXY_PRESET = "ultrafast"
+PROXY_FFMPEG_PARAMS = ["-crf", "32", "-tune", "fastdecode"]
+PROXY_AUDIO_BITRATE = "64k"
+# --- FIN PARAMÈTRES ---
+
+# --- PARAMÈTRES DU RENDU À MÉMOIRE BORNÉE ---
+# Plafond de mémoire d'un rendu en Mo (RENDER_MEMORY_CEILING_MB, ou --render-memory-mb dans main.py) ;
+# 0 = pas de plafond. La variable d'environnement est lue au début de chaque rendu : elle est héritée
+# par les processus de rendu (lancés en 'spawn'). Si l'empreinte estimée du rendu dépasse le plafond,
+# le rendu passe en mode borné : seule la partie visible du clip (ou de la webcam recadrée) est
+# agrandie (recadrage central avant le redimensionnement, au lieu d'une image de 2160 px de large dont
+# la moitié sort du cadre), l'encodeur x264 garde moins d'images en file (lookahead) avec moins de
+# threads, et le tampon audio du lecteur est réduit.
+RENDER_MEMORY_ENV_VAR = "RENDER_MEMORY_CEILING_MB"
+BOUNDED_ENCODER_LOOKAHEAD = 10
+BOUNDED_ENCODER_THREADS = 2
+BOUNDED_AUDIO_BUFFERSIZE = 50000 # Échantillons audio lus à la fois (200000 par défaut dans MoviePy)
+# Modèle d'estimation de l'empreinte (ordres de grandeur : à recaler avec le pic mesuré, peak_rss_mb
+# dans data/metrics/run_metrics.jsonl).
+BASE_MEMORY_MB = 200              # Python, MoviePy, NumPy et processus ffmpeg au repos
+DECODER_BUFFERED_FRAMES = 20      # Images de référence et threads du décodeur H.264 (YUV 4:2:0)
+COMPOSITE_BYTES_PER_PIXEL = 60    # Canevas et masques en flottants des couches composées
+X264_DEFAULT_LOOKAHEAD = 40       # Lookahead de x264 en preset 'medium'
+X264_REFERENCE_FRAMES = 3
+X264_BYTES_PER_PIXEL_FRAME = 4.5  # Image YUV 4:2:0 avec marges, plans réduits et données de macroblocs
+# --- FIN PARAMÈTRES ---
+
+# Résolution des Shorts (9:16) : dimensions de référence de la mise en page.
+SHORT_WIDTH, SHORT_HEIGHT = 1080, 1920
+
+
+def render_memory_ceiling_mb():
+    """Plafond de mémoire d'un rendu en Mo (0 = pas de plafond), lu à chaque appel."""
+    return float(os.environ.get(RENDER_MEMORY_ENV_VAR, "0") or 0)
+
+
+def estimate_render_memory_mb(source_size, target_size, bounded=False):
+    """
+    Estimation du pic de mémoire d'un rendu (Python et processus ffmpeg), en Mo, d'après la taille
+    du clip et celle du Short. bounded : avec les réglages du mode borné.
+    """
+    source_width, source_height = source_size
+    target_width, target_height = target_size
+    zoom = 2 * target_width / source_width # Le clip est affiché à deux fois la largeur du Short
+    zoomed_width, zoomed_height = source_width * zoom, source_height * zoom
+    if bounded:
+        zoomed_width, zoomed_height = min(zoomed_width, target_width), min(zoomed_height, target_height)
+    lookahead = BOUNDED_ENCODER_LOOKAHEAD if bounded else X264_DEFAULT_LOOKAHEAD
+    threads = BOUNDED_ENCODER_THREADS if bounded else (os.cpu_count() or 1)
+    source_pixels, target_pixels = source_width * source_height, target_width * target_height
+    total_bytes = (
+        DECODER_BUFFERED_FRAMES * source_pixels * 1.5   # Décodeur ffmpeg
+        + 2 * source_pixels * 3                         # Image lue (pipe et tableau NumPy)
+        + 2 * zoomed_width * zoomed_height * 3          # Agrandissement (image source et résultat)
+        + COMPOSITE_BYTES_PER_PIXEL * target_pixels     # Composition
+        + (lookahead + threads + X264_REFERENCE_FRAMES) * target_pixels * X264_BYTES_PER_PIXEL_FRAME # Encodeur
+    )
+    return BASE_MEMORY_MB + total_bytes / (1024 * 1024)
+
+
+class AnalysisFrames:
+    """
+    Images d'analyse d'un clip : images (tableau NumPy N×H×W×3, RGB, uint8, en lecture seule)
+    et times (instant de chaque image, en secondes dans le clip). scale convertit une coordonnée
+    d'image d'analyse en pixels du clip d'origine.
+    """
+
+    def __init__(self, images, times, scale):
+        self.images = images
+        self.times = times
+        self.scale = scale
+
+    def __len__(self):
+        return len(self.images)
+
+    def at(self, t):
+        """Image la plus proche de l'instant t, ou None si aucune image n'a été décodée."""
+        if not len(self.images):
+            return None
+        return self.images[int(np.abs(self.times - t).argmin())]
+
+
+_analysis_cache = OrderedDict() # (ID du clip, réglages) -> AnalysisFrames
+_analysis_cache_lock = threading.Lock()
+
+
+def _decode_analysis_frames(input_path, width, fps, start, duration, keyframes_only, source_size):
+    """Décode les images d'analyse : ffmpeg les écrit en RGB brut sur un pipe, lues directement dans NumPy."""
+    source_width, source_height = source_size or ffmpeg_parse_infos(input_path)["video_size"]
+    height = max(2, int(round(width * source_height / source_width / 2)) * 2)
+    command = [get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if keyframes_only:
+        command += ["-skip_frame", "nokey"]
+    # -ss avant -i : saut direct à l'image clé qui précède start, sans décoder le début du clip
+    command += ["-ss", f"{start:.3f}", "-i", input_path]
+    if duration is not None:
+        command += ["-t", f"{duration:.3f}"]
+    command += ["-an", "-vf", f"fps={fps},scale={width}:{height}", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+
+    frame_size = width * height * 3
+    frames = []
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            buffer = process.stdout.read(frame_size)
+            if len(buffer) < frame_size:
+                break
+            frames.append(np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3))
+        _, stderr = process.communicate()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if process.returncode != 0 and not frames:
+        raise RuntimeError(f"ffmpeg ({process.returncode}) : {stderr.decode(errors='replace').strip()}")
+
+    images = np.stack(frames) if frames else np.empty((0, height, width, 3), dtype=np.uint8)
+    images.flags.writeable = False # Partagées entre les analyses via le cache
+    times = start + np.arange(len(images)) / fps
+    return AnalysisFrames(images, times, source_width / width)
+
+
+def analysis_frames(input_path, clip_id=None, width=ANALYSIS_WIDTH, fps=ANALYSIS_FPS, start=0.0, duration=None,
+                    keyframes_only=ANALYSIS_KEYFRAMES_ONLY, source_size=None):
+    """
+    Images basse résolution d'un clip pour l'analyse de son contenu, décodées par ffmpeg à la taille
+    et à la cadence demandées, sans fichier intermédiaire ni décodage pleine résolution.
+
+    Le résultat est mémorisé par clip_id (et réglages) : les analyses successives d'un même clip
+    (webcam, scènes, qualité...) ne le décodent qu'une fois. Sans clip_id, rien n'est mémorisé.
+
+    Args:
+        input_path (str): Fichier ou URL directe du clip.
+        source_size (tuple): (largeur, hauteur) du clip si elle est connue (évite une lecture des en-têtes).
+
+    Returns:
+        AnalysisFrames
+    """
+    key = (clip_id, width, fps, start, duration, keyframes_only)
+    if clip_id is not None:
+        with _analysis_cache_lock:
+            if key in _analysis_cache:
+                _analysis_cache.move_to_end(key)
+                return _analysis_cache[key]
+    frames = _decode_analysis_frames(input_path, width, fps, start, duration, keyframes_only, source_size)
+    if clip_id is not None:
+        with _analysis_cache_lock:
+            _analysis_cache[key] = frames
+            while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+                _analysis_cache.popitem(last=False)
+    return frames
 
 # ==============================================================================
 # ATTENTION : Vous DEVEZ implémenter cette fonction ou la remplacer par une logique
@@ -13,41 +193,40 @@ import numpy as np # Gardé car il pourrait être utile pour d'autres traitement
 # Si vous n'avez pas le code de 'get_people_coords', vous pouvez laisser _crop_webcam=False
 # dans l'appel de trim_video_for_short dans main.py.
 # ==============================================================================
-def get_people_coords(image_path: str) -> Optional[List[int]]:
+def get_people_coords(frame: np.ndarray) -> Optional[List[int]]:
     """
     Simule la détection de personnes.
     Dans un vrai projet, cela ferait appel à une bibliothèque de détection de visages/corps.
-    Exemple de retour : [x, y, x1, y1] des coordonnées du cadre de la personne.
+    frame est une image d'analyse (tableau NumPy H×W×3, RGB), voir analysis_frames.
+    Exemple de retour : [x, y, x1, y1] des coordonnées du cadre de la personne, dans cette image.
     """
-    # print(f"DEBUG: Tentative de détection de personne sur {image_path}")
+    # print(f"DEBUG: Tentative de détection de personne sur une image {frame.shape}")
     # Simuler l'absence de détection pour l'instant
     return None
 
-def crop_webcam(clip: VideoFileClip) -> Optional[VideoFileClip]:
+def crop_webcam(clip: VideoFileClip, clip_id: Optional[str] = None) -> Optional[VideoFileClip]:
     """
     Tente de recadrer le clip autour de la zone de la webcam (visage du diffuseur).
+    L'image analysée vient du décodeur d'analyse (basse résolution, sans fichier, mémorisée par clip_id).
     """
     margin_value = 20
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    temp_dir = os.path.abspath(os.path.join(script_dir, '..', 'data')) # Utilisez votre répertoire 'data'
-    frame_image = os.path.join(temp_dir, 'webcam_search_frame.png')
 
     print("🔎 Recherche de la zone de la webcam (visage du diffuseur)...")
     try:
-        # Assurez-vous que le répertoire existe avant d'enregistrer l'image
-        os.makedirs(temp_dir, exist_ok=True)
-        clip.save_frame(frame_image, t=1) # Sauvegarde une image pour analyse
+        frames = analysis_frames(clip.filename, clip_id=clip_id, source_size=clip.size)
     except Exception as e:
-        print(f"❌ Erreur lors de la sauvegarde de l'image pour détection de webcam : {e}")
+        print(f"❌ Erreur lors du décodage de l'image pour détection de webcam : {e}")
         return None
+    frame = frames.at(WEBCAM_SEARCH_TIME)
 
-    box = get_people_coords(frame_image)
+    box = get_people_coords(frame) if frame is not None else None
     if not box:
         print("\t⏩ Aucun visage de diffuseur trouvé - rognage de la webcam ignoré.")
         return None
     print("\t✅ Visage du diffuseur trouvé - rognage et zoom.")
 
-    x, y, x1, y1 = tuple(box)
+    # Coordonnées de l'image d'analyse -> pixels du clip
+    x, y, x1, y1 = (int(round(value * frames.scale)) for value in box)
     x -= margin_value
     y -= margin_value
     x1 += margin_value
@@ -59,36 +238,71 @@ def crop_webcam(clip: VideoFileClip) -> Optional[VideoFileClip]:
     x1 = min(clip.w, x1)
     y1 = min(clip.h, y1)
 
-    # Nettoyage
-    if os.path.exists(frame_image):
-        os.remove(frame_image)
-
     return crop(clip, x1=x1, y1=y1, x2=x, y2=y)
 
 
-def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_data=None, enable_webcam_crop=False):
+def zoom_to_frame(clip, display_width, frame_size, bounded=False):
+    """
+    Agrandit clip à la largeur display_width, pour être centré dans une image de taille frame_size.
+    bounded : seule la partie centrale qui reste dans l'image une fois agrandie est recadrée, puis
+    agrandie (même image finale, moins de pixels redimensionnés par image).
+    """
+    if not bounded:
+        return moviepy_resize(clip, width=display_width)
+    frame_width, frame_height = frame_size
+    zoom = display_width / clip.w
+    visible_width = min(clip.w, frame_width / zoom)
+    visible_height = min(clip.h, frame_height / zoom)
+    clip = crop(clip, x_center=clip.w / 2, y_center=clip.h / 2, width=visible_width, height=visible_height)
+    return moviepy_resize(clip, newsize=(int(round(visible_width * zoom)), int(round(visible_height * zoom))))
+
+
+def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_data=None, enable_webcam_crop=False,
+                         proxy=False, memory_ceiling_mb=None):
     """
     Traite une vidéo pour le format Short (9:16) :
     - Coupe si elle dépasse la durée maximale.
     - Ajoute un fond personnalisé (ou noir si l'image n'est pas trouvée).
     - Ajoute le titre du clip, le nom du streamer et une icône Twitch.
     - Ajoute une séquence de fin de 1.2s
+
+    Avec proxy=True, produit un aperçu basse résolution de la même mise en page (voir PROXY_SCALE) :
+    pour vérifier visuellement une modification de la composition ou tester le pipeline, pas pour publier.
+
+    Avec memory_ceiling_mb, le rendu passe en mode borné si son empreinte estimée dépasse ce plafond
+    (par défaut : RENDER_MEMORY_CEILING_MB au moment du rendu, voir render_memory_ceiling_mb).
     """
-    print(f"✂️ Traitement vidéo : {input_path}")
+    if memory_ceiling_mb is None:
+        memory_ceiling_mb = render_memory_ceiling_mb()
+    print(f"✂️ Traitement vidéo : {input_path.split('?')[0]}") # Sans la signature d'une URL directe
     print(f"Durée maximale souhaitée : {max_duration_seconds} secondes.")
     if clip_data:
         print(f"Titre du clip : {clip_data.get('title', 'N/A')}")
         print(f"Streamer : {clip_data.get('broadcaster_name', 'N/A')}")
 
-    if not os.path.exists(input_path):
+    # input_path peut être une URL directe (mode flux) : ffmpeg la lit pendant son transfert
+    is_stream = input_path.startswith(("http://", "https://"))
+    if not is_stream and not os.path.exists(input_path):
         print(f"❌ Erreur : Le fichier d'entrée n'existe pas à {input_path}")
         return None
 
     clip = None # Initialiser clip à None pour le finally
     end_clip = None # Initialiser end_clip à None pour le finally
 
+    # Échelle de la mise en page : toutes les tailles et positions en pixels sont multipliées par scale
+    scale = PROXY_SCALE if proxy else 1.0
+    def px(value):
+        return int(round(value * scale))
+
     try:
-        clip = VideoFileClip(input_path)
+        # Avec un plafond de mémoire, le tampon audio du lecteur est toujours réduit (coût négligeable)
+        reader_options = dict(audio_buffersize=BOUNDED_AUDIO_BUFFERSIZE) if memory_ceiling_mb else {}
+        if proxy:
+            # ffmpeg réduit les images dès le décodage, à la largeur d'affichage du clip (zoom x2)
+            clip = VideoFileClip(input_path, target_resolution=(None, 2 * px(SHORT_WIDTH)), **reader_options)
+            print(f"🔍 Rendu proxy : échelle {scale:.2f}, {PROXY_FPS} img/s au plus, encodage '{PROXY_PRESET}'.")
+        else:
+            clip = VideoFileClip(input_path, **reader_options)
         
         original_width, original_height = clip.size
         print(f"Résolution originale du clip : {original_width}x{original_height}")
@@ -103,7 +317,21 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
         duration = clip.duration
 
         # --- Définir la résolution cible pour les Shorts (9:16) ---
-        target_width, target_height = 1080, 1920
+        target_width, target_height = 2 * (px(SHORT_WIDTH) // 2), 2 * (px(SHORT_HEIGHT) // 2)
+
+        # --- Plafond de mémoire : choix du mode de rendu ---
+        bounded = False
+        if memory_ceiling_mb:
+            estimated_mb = estimate_render_memory_mb(clip.size, (target_width, target_height))
+            bounded = estimated_mb > memory_ceiling_mb
+            if bounded:
+                bounded_mb = estimate_render_memory_mb(clip.size, (target_width, target_height), bounded=True)
+                print(f"🧮 Empreinte estimée {estimated_mb:.0f} Mo > plafond {memory_ceiling_mb:.0f} Mo : "
+                      f"rendu en mode borné (estimation {bounded_mb:.0f} Mo).")
+                if bounded_mb > memory_ceiling_mb:
+                    print("⚠️ Le plafond risque d'être dépassé même en mode borné. Rendu tenté quand même.")
+            else:
+                print(f"🧮 Empreinte estimée {estimated_mb:.0f} Mo (plafond {memory_ceiling_mb:.0f} Mo) : rendu normal.")
 
         # --- DÉFINITION DES CHEMINS DES ASSETS (TRÈS TÔT DANS LA FONCTION) ---
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -161,10 +389,11 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
 
         found_webcam_and_cropped = False
         if enable_webcam_crop:
-            cropped_webcam_clip = crop_webcam(clip)
+            cropped_webcam_clip = crop_webcam(clip, clip_id=(clip_data or {}).get('id'))
             if cropped_webcam_clip:
                 found_webcam_and_cropped = True
-                main_video_clip = moviepy_resize(cropped_webcam_clip, width=target_width * 2) # Facteur de zoom 2
+                main_video_clip = zoom_to_frame(cropped_webcam_clip, target_width * 2, # Facteur de zoom 2
+                                                (target_width, target_height), bounded=bounded)
                 
                 all_video_elements.append(background_clip)
                 all_video_elements.append(main_video_clip.set_position(("center", "center")))
@@ -173,9 +402,8 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
 
         if not found_webcam_and_cropped:
             all_video_elements.append(background_clip.set_position(("center", "center")))
-            main_video_clip = clip.copy()
-            main_video_display_width = int(target_width * 2) # Facteur de zoom 2
-            main_video_clip = moviepy_resize(main_video_clip, width=main_video_display_width)
+            main_video_clip = zoom_to_frame(clip.copy(), int(target_width * 2), # Facteur de zoom 2
+                                            (target_width, target_height), bounded=bounded)
             main_video_clip = main_video_clip.fx(even_size)
 
             all_video_elements.append(main_video_clip.set_position(("center", "center")))
@@ -188,33 +416,35 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
         # --- Utilise font_path_bold pour le titre du clip ---
         text_color = "white"
         stroke_color = "black"
-        stroke_width = 1.5
+        stroke_width = 1.5 * scale
         
-        # Ajustements pour le titre : positionné un peu plus bas que le bord supérieur
-        title_clip = TextClip(title_text, fontsize=70, color=text_color,
-                              font=font_path_bold, stroke_color=stroke_color, stroke_width=stroke_width, # <--- ICI : Utilise font_path_bold
-                              size=(target_width * 0.9, None), # Texte sur 90% de la largeur
-                              method='caption') \
-                     .set_duration(duration) \
-                     .set_position(("center", int(target_height * 0.08))) # 8% de la hauteur du haut
-
-        # Ajustements pour le nom du streamer : positionné un peu plus haut que le bord inférieur
-        # target_height * 0.92 place le HAUT du texte à 92% de la hauteur.
-        # Soustraire 40 (taille approximative de la police) assure que le bas du texte est visible.
-        streamer_clip = TextClip(f"@{streamer_name}", fontsize=40, color=text_color,
-                                 font=font_path_regular, stroke_color=stroke_color, stroke_width=stroke_width) \
-                        .set_duration(duration) \
-                        .set_position(("center", int(target_height * 0.85) - 40)) 
+        # Rendu des textes (ImageMagick) : section profilée avec --profile
+        with stage_profiler.section("text", output_path):
+            # Ajustements pour le titre : positionné un peu plus bas que le bord supérieur
+            title_clip = TextClip(title_text, fontsize=px(70), color=text_color,
+                                  font=font_path_bold, stroke_color=stroke_color, stroke_width=stroke_width, # <--- ICI : Utilise font_path_bold
+                                  size=(target_width * 0.9, None), # Texte sur 90% de la largeur
+                                  method='caption') \
+                         .set_duration(duration) \
+                         .set_position(("center", int(target_height * 0.08))) # 8% de la hauteur du haut
+
+            # Ajustements pour le nom du streamer : positionné un peu plus haut que le bord inférieur
+            # target_height * 0.92 place le HAUT du texte à 92% de la hauteur.
+            # Soustraire 40 (taille approximative de la police) assure que le bas du texte est visible.
+            streamer_clip = TextClip(f"@{streamer_name}", fontsize=px(40), color=text_color,
+                                     font=font_path_regular, stroke_color=stroke_color, stroke_width=stroke_width) \
+                            .set_duration(duration) \
+                            .set_position(("center", int(target_height * 0.85) - px(40))) 
         
         # Logique de l'icône Twitch (maintenue pour la complétude, même si tu la désactives)
         twitch_icon_clip = None
         if os.path.exists(twitch_icon_path):
             try:
                 twitch_icon_clip = ImageClip(twitch_icon_path, duration=duration)
-                twitch_icon_clip = moviepy_resize(twitch_icon_clip, width=80)
+                twitch_icon_clip = moviepy_resize(twitch_icon_clip, width=px(80))
                 
                 # Positionnement de l'icône à gauche du titre, centré verticalement par rapport au titre
-                icon_x = title_clip.pos[0] - twitch_icon_clip.w - 10 # 10 pixels de marge à gauche du titre
+                icon_x = title_clip.pos[0] - twitch_icon_clip.w - px(10) # 10 pixels de marge à gauche du titre
                 icon_y = title_clip.pos[1] + (title_clip.h / 2) - (twitch_icon_clip.h / 2) # Centré verticalement avec le titre
 
                 twitch_icon_clip = twitch_icon_clip.set_position((icon_x, icon_y))
@@ -266,14 +496,27 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
 
 
         # L'écriture du fichier final, qui est la partie cruciale !
-        final_video.write_videofile(output_path,
-                                    codec="libx264",
-                                    audio_codec="aac",
-                                    temp_audiofile='temp-audio.m4a',
-                                    remove_temp=True,
-                                    fps=clip.fps, # Utilise le FPS du clip original pour la vidéo principale
-                                    logger=None)
+        # (composition image par image et encodage : section profilée avec --profile)
+        output_fps = min(clip.fps, PROXY_FPS) if proxy else clip.fps # FPS du clip original pour la vidéo principale
+        encoder_options = dict(preset=PROXY_PRESET, ffmpeg_params=list(PROXY_FFMPEG_PARAMS),
+                               audio_bitrate=PROXY_AUDIO_BITRATE) if proxy else {}
+        if bounded:
+            encoder_options["threads"] = BOUNDED_ENCODER_THREADS
+            encoder_options["ffmpeg_params"] = encoder_options.get("ffmpeg_params", []) + \
+                ["-rc-lookahead", str(BOUNDED_ENCODER_LOOKAHEAD)]
+        with stage_profiler.section("encode", output_path):
+            final_video.write_videofile(output_path,
+                                        codec="libx264",
+                                        audio_codec="aac",
+                                        # Propre au clip : plusieurs rendus (workers) peuvent tourner dans le même dossier
+                                        temp_audiofile=f"{os.path.splitext(output_path)[0]}.temp-audio.m4a",
+                                        remove_temp=True,
+                                        fps=output_fps,
+                                        logger=None,
+                                        **encoder_options)
         print(f"✅ Clip traité et sauvegardé : {output_path}")
+        # Images écrites (pour le débit de rendu en images/s) et taille du fichier produit
+        run_metrics.note(frames=int(final_video.duration * output_fps), bytes=os.path.getsize(output_path))
         return output_path
             
     except Exception as e:
@@ -0,0 +1,255 @@
+# scripts/profiles.py
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import get_top_clips
+import moment_index
+import candidate_table
+
+# Intervalle auquel la source attend la fin des clips en cours avant de décider s'il en faut d'autres.
+ASSIGNER_POLL_SECONDS = 0.2
+
+
+class ChannelProfile:
+    """
+    Profil d'une chaîne YouTube : ses propres filtres de sélection, son historique,
+    son modèle de métadonnées et ses identifiants. Les valeurs absentes du fichier de profils
+    reprennent les paramètres de get_top_clips.py (comportement du mode à une seule chaîne).
+    """
+
+    def __init__(self, name, data_dir, language=None, game_ids=None, broadcaster_ids=None, clips_to_publish=1,
+                 min_duration_seconds=None, max_duration_seconds=None, youtube_token_file='token.json',
+                 client_secrets_file='client_secret.json', metadata_template=None):
+        self.name = name
+        self.language = language or get_top_clips.CLIP_LANGUAGE
+        self.game_ids = list(dict.fromkeys(get_top_clips.GAME_IDS if game_ids is None else game_ids))
+        self.broadcaster_ids = list(dict.fromkeys(get_top_clips.BROADCASTER_IDS if broadcaster_ids is None else broadcaster_ids))
+        self.clips_to_publish = clips_to_publish
+        self.min_duration_seconds = min_duration_seconds or get_top_clips.MIN_VIDEO_DURATION_SECONDS
+        self.max_duration_seconds = max_duration_seconds or get_top_clips.MAX_VIDEO_DURATION_SECONDS
+        self.youtube_token_file = youtube_token_file
+        self.client_secrets_file = client_secrets_file
+        self.metadata_template = metadata_template or {}
+        # Historique, registre de quota et uploads différés propres au profil
+        self.data_dir = os.path.join(data_dir, 'profiles', name)
+
+    def accepted_rows(self, table, rows):
+        """Lignes d'une CandidateTable (parmi rows) acceptées par le profil (source, langue, durée), sur les colonnes."""
+        np = candidate_table._numpy()
+        rows = np.asarray(table.eligible_rows(rows, self.language, self.min_duration_seconds, self.max_duration_seconds),
+                          dtype=np.int64)
+        broadcasters = [table.broadcaster_id.code_for(broadcaster_id) for broadcaster_id in self.broadcaster_ids]
+        games = [table.game_id.code_for(game_id) for game_id in self.game_ids]
+        from_sources = (np.isin(table.broadcaster_id.codes.values[rows], broadcasters) |
+                        np.isin(table.game_id.codes.values[rows], games))
+        return rows[from_sources].tolist()
+
+
+def load_profiles(path, data_dir):
+    """
+    Charge les profils depuis un fichier JSON : { "profiles": [ { "name": "...", ... }, ... ] }.
+    Les clés de chaque profil sont les arguments de ChannelProfile.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    profiles = [ChannelProfile(data_dir=data_dir, **entry) for entry in config.get("profiles", [])]
+    names = [profile.name for profile in profiles]
+    if not profiles or len(set(names)) != len(names):
+        raise ValueError(f"Le fichier de profils '{path}' doit contenir au moins un profil, avec des noms uniques.")
+    return profiles
+
+
+def collect_for_profiles(access_token, profiles, histories, num_clips_per_source=50, days_ago=1, thumbnail_filter=None,
+                         source_stats=None):
+    """
+    Collecte unique pour tous les profils : chaque source (streamer ou jeu) n'est interrogée qu'une fois,
+    même si plusieurs profils la suivent, puis chaque profil filtre et classe les clips de son côté.
+    Même chemin que get_top_clips.get_eligible_short_clips : tranches de temps, CandidateTable en colonnes
+    et doublons d'un même moment écartés au fil de la collecte (un index par profil).
+
+    Args:
+        histories (dict): Nom du profil -> historique des clips déjà publiés par ce profil (conteneur `in`).
+        thumbnail_filter (thumbnail_hash.ThumbnailDeduplicator): si fourni, écarte les doublons visuels
+            de chaque profil (miniatures téléchargées et hachées une seule fois pour tous les profils).
+        source_stats (source_stats.SourceStats): si fourni, dimensionne la demande faite à chaque source,
+            ignore les sources froides et arrête la collecte avant une source qui ne battrait les candidats
+            en main d'aucun des profils qui la suivent. La collecte y est ensuite enregistrée.
+
+    Returns:
+        dict: Nom du profil -> clips éligibles (CandidateList), triés par vues décroissantes.
+    """
+    sources = {} # (type de source, ID) -> langues des profils qui la suivent
+    for profile in profiles:
+        for broadcaster_id in profile.broadcaster_ids:
+            sources.setdefault(("broadcaster_id", broadcaster_id), set()).add(profile.language)
+        for game_id in profile.game_ids:
+            sources.setdefault(("game_id", game_id), set()).add(profile.language)
+    requested = sum(len(profile.broadcaster_ids) + len(profile.game_ids) for profile in profiles)
+    print(f"📊 Collecte unique pour {len(profiles)} profil(s) : {len(sources)} source(s) interrogée(s) "
+          f"(au lieu de {requested} sans partage).")
+    followers = {source: [profile for profile in profiles
+                          if source[1] in (profile.broadcaster_ids if source[0] == "broadcaster_id" else profile.game_ids)]
+                 for source in sources}
+
+    end_date = datetime.now(timezone.utc)
+    slices = get_top_clips.time_slices(end_date - timedelta(days=days_ago), end_date)
+    if len(slices) > 1:
+        print(f"🕒 Fenêtre découpée en {len(slices)} tranches de {get_top_clips.TIME_SLICE_HOURS}h, "
+              f"interrogées en parallèle.")
+    if source_stats is None:
+        planned = [(source_type, source_id, num_clips_per_source, False) for source_type, source_id in sources]
+    else:
+        planned = source_stats.plan(list(sources), num_clips_per_source)
+
+    table = candidate_table.CandidateTable()
+    views = lambda row: table.viewer_count.values[row]
+    moments = {profile.name: moment_index.MomentIndex(score=views, interval=table.interval,
+                                                      vod=lambda row: table.video_id[row], key=lambda row: row)
+               for profile in profiles}
+    seen = {profile.name: set() for profile in profiles}
+    per_source = {} # Clé de source -> compteurs de la collecte (statistiques par source)
+    stopped_early = False
+
+    def beaten_for_all(source):
+        # La source ne battrait les candidats en main d'aucun des profils qui la suivent
+        return all(source_stats.should_stop(source, moments[profile.name].scores())
+                   for profile in followers[source])
+
+    def source_params(source_type, source_id, first):
+        params = {"first": first, "sort": "views", source_type: source_id}
+        languages = sources[(source_type, source_id)]
+        if len(languages) == 1:
+            # Source suivie par des profils d'une seule langue : filtrage côté Twitch
+            params["language"] = next(iter(languages))
+        return params
+
+    requests_plan = ((source_type, source_id, source_params(source_type, source_id, first), exploring)
+                     for source_type, source_id, first, exploring in planned)
+    with ThreadPoolExecutor(max_workers=get_top_clips.COLLECT_WORKERS, thread_name_prefix="twitch-collect") as executor:
+        # Requêtes des sources suivantes soumises à l'avance ; après l'arrêt, seules les explorations le sont
+        for source_type, source_id, exploring, futures in get_top_clips.prefetch_sources(
+                executor, access_token, requests_plan, slices, wanted=lambda exploring: exploring or not stopped_early):
+            if source_stats is not None and not exploring and (stopped_early or beaten_for_all((source_type, source_id))):
+                stopped_early = True
+                for future in futures:
+                    future.cancel()
+                continue
+            rows = get_top_clips.merge_source_into(table, futures, source_type, source_id)
+            eligible = set()
+            for profile in followers[(source_type, source_id)]:
+                history = histories[profile.name]
+                for row in profile.accepted_rows(table, rows):
+                    eligible.add(row)
+                    clip_id = table.ids[row]
+                    if clip_id not in seen[profile.name] and clip_id not in history:
+                        # Doublons d'un même moment écartés par profil : le meilleur clip accepté par ce profil est gardé
+                        moments[profile.name].offer(row)
+                        seen[profile.name].add(clip_id)
+            per_source[f"{source_type}:{source_id}"] = {
+                "fetched": len(rows),
+                "eligible": len(eligible),
+                "best_views": int(table.viewer_count.values[sorted(eligible)].max()) if eligible else 0,
+            }
+    print(f"✅ {len(table)} clip(s) collecté(s) pour l'ensemble des profils ({len(per_source)} source(s) interrogée(s)).")
+    if stopped_early:
+        print(f"⏹️ Collecte arrêtée avant {len(planned) - len(per_source)} source(s) : les candidats en main suffisent.")
+
+    ranked = {}
+    for profile in profiles:
+        eligible = table.view(table.rank(moments[profile.name].clips()))
+        if thumbnail_filter is not None:
+            eligible = thumbnail_filter.filter(eligible, histories[profile.name])
+        ranked[profile.name] = eligible
+        print(f"  - Profil '{profile.name}' : {len(eligible)} clip(s) éligible(s).")
+
+    if source_stats is not None:
+        best = {row for index in moments.values() for row in index.clips()}
+        source_stats.record_collection(per_source, table.view(table.rank(sorted(best))))
+    return ranked
+
+
+class FanOutAssigner:
+    """
+    Répartit les clips entre les profils pour un pipeline commun.
+
+    Chaque élément produit est { "clip": ..., "profiles": [noms] } : un clip retenu par plusieurs
+    profils (dans leurs meilleurs candidats restants) n'est téléchargé et rendu qu'une fois.
+    Une place est réservée pour chaque profil visé ; elle est libérée si la publication échoue,
+    et la source produit alors le clip suivant de ce profil. Un clip gardé en repli d'un doublon visuel
+    (clé 'duplicate_of') n'est produit pour un profil que si le clip doublé n'y est ni en cours ni publié. La source s'arrête quand chaque profil
+    a atteint son objectif (ou n'a plus de candidat) et qu'aucun clip n'est en cours.
+
+    Args:
+        profiles (list[ChannelProfile]): Profils à servir.
+        ranked (dict): Nom du profil -> clips éligibles classés.
+        already_done (dict): Nom du profil -> publications déjà acquises (ex : uploads différés relancés).
+    """
+
+    def __init__(self, profiles, ranked, already_done=None):
+        self.quota = {profile.name: profile.clips_to_publish for profile in profiles}
+        self.reserved = {name: (already_done or {}).get(name, 0) for name in self.quota}
+        self.ranked = ranked
+        self._yielded = set()
+        self._pending = {} # ID du clip -> profils visés, pour les clips en cours
+        self._published = {name: set() for name in self.quota} # Nom du profil -> IDs publiés par la source
+        self._cond = threading.Condition()
+
+    def _need(self, name):
+        return self.quota[name] - self.reserved[name]
+
+    def _upcoming(self, name, count):
+        """Les `count` prochains candidats non encore produits d'un profil (sans avancer)."""
+        upcoming = []
+        for clip in self.ranked.get(name, []):
+            if len(upcoming) >= count:
+                break
+            duplicate_of = clip.get("duplicate_of")
+            if duplicate_of is not None and (duplicate_of in self._published[name] or
+                                             name in self._pending.get(duplicate_of, ())):
+                continue # Repli d'un doublon visuel dont l'original est publié (ou en cours) sur ce profil
+            if clip["id"] not in self._yielded:
+                upcoming.append(clip)
+        return upcoming
+
+    def items(self, stopping=lambda: False):
+        """Générateur des éléments à traiter (à passer comme source au pipeline)."""
+        while True:
+            with self._cond:
+                while True:
+                    if stopping():
+                        return
+                    needy = [name for name in self.quota if self._need(name) > 0 and self._upcoming(name, 1)]
+                    if needy:
+                        break
+                    if not self._pending:
+                        return
+                    self._cond.wait(ASSIGNER_POLL_SECONDS)
+                # Le profil le plus en retard sur son objectif choisit le prochain clip
+                name = max(needy, key=self._need)
+                clip = self._upcoming(name, 1)[0]
+                targets = [other for other in needy
+                           if other == name or any(c["id"] == clip["id"] for c in self._upcoming(other, self._need(other)))]
+                for target in targets:
+                    self.reserved[target] += 1
+                self._yielded.add(clip["id"])
+                self._pending[clip["id"]] = targets
+                if len(targets) > 1:
+                    print(f"🔀 Clip '{clip['id']}' retenu par {len(targets)} profils ({', '.join(targets)}) : "
+                          f"un seul téléchargement et un seul rendu.")
+            yield {"clip": clip, "profiles": targets}
+
+    def finish(self, clip_id, published_profiles):
+        """Termine un clip : les places des profils où il n'a pas été publié sont libérées. Idempotent."""
+        with self._cond:
+            targets = self._pending.pop(clip_id, None)
+            if targets is None:
+                return
+            for target in targets:
+                if target in published_profiles:
+                    self._published[target].add(clip_id)
+                else:
+                    self.reserved[target] -= 1
+            self._cond.notify_all()
@@ -0,0 +1,129 @@
+# scripts/publish_history.py
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, date, timedelta
+
+# Nombre de jours pendant lesquels une publication est conservée dans l'historique.
+# Au-delà, elle est supprimée lors du compactage (les fenêtres de collecte sont bien plus courtes).
+HISTORY_RETENTION_DAYS = 30
+# Attente maximale d'un verrou SQLite tenu par un autre processus (historique partagé).
+SQLITE_TIMEOUT_SECONDS = 30
+
+
+class PublishHistory:
+    """
+    Historique des clips publiés, stocké dans SQLite.
+
+    - Recherche en temps constant sur toutes les dates grâce à un index en mémoire (set)
+      chargé à l'ouverture : `clip_id in history`.
+    - Ajouts atomiques et résistants aux crashs (transaction SQLite en mode WAL),
+      sans relire ni réécrire tout l'historique. Avec shared=True (data/ partagé entre machines par
+      les workers de la file de travaux), journal classique : WAL exige une mémoire partagée locale.
+    - Rétention configurable et compactage (suppression des anciennes entrées + VACUUM).
+    - Migration unique depuis l'ancien fichier JSON { "YYYY-MM-DD": [ {...}, ... ] }.
+    """
+
+    def __init__(self, db_path, retention_days=HISTORY_RETENTION_DAYS, legacy_json_path=None, shared=False):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Les ajouts sont faits depuis les threads d'upload : connexion partagée, protégée par un verrou.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=SQLITE_TIMEOUT_SECONDS)
+        self._conn.execute("PRAGMA journal_mode=DELETE" if shared else "PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS published (
+                twitch_clip_id TEXT PRIMARY KEY,
+                youtube_short_id TEXT,
+                published_date TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_published_date ON published (published_date)")
+        self._conn.commit()
+
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            self.migrate_from_json(legacy_json_path)
+
+        self._ids = {row[0] for row in self._conn.execute("SELECT twitch_clip_id FROM published")}
+
+    # --- Lecture ---
+    def __contains__(self, clip_id):
+        return clip_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def published_on(self, day=None):
+        """Retourne les IDs des clips publiés un jour donné (aujourd'hui par défaut)."""
+        day_str = (day or date.today()).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT twitch_clip_id FROM published WHERE published_date = ? ORDER BY timestamp", (day_str,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # --- Écriture ---
+    def add(self, clip_id, youtube_id):
+        """Enregistre une publication (aujourd'hui). Sans effet si le clip est déjà dans l'historique."""
+        now = datetime.now()
+        with self._lock:
+            with self._conn: # Transaction : validée entièrement ou pas du tout
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO published (twitch_clip_id, youtube_short_id, published_date, timestamp) "
+                    "VALUES (?, ?, ?, ?)",
+                    (clip_id, youtube_id, now.date().isoformat(), now.isoformat())
+                )
+            self._ids.add(clip_id)
+
+    def compact(self, retention_days=None):
+        """Supprime les publications plus anciennes que la rétention. Retourne le nombre d'entrées supprimées."""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+        with self._lock:
+            with self._conn:
+                removed = [row[0] for row in self._conn.execute(
+                    "SELECT twitch_clip_id FROM published WHERE published_date < ?", (cutoff,))]
+                self._conn.execute("DELETE FROM published WHERE published_date < ?", (cutoff,))
+            if removed:
+                self._conn.execute("VACUUM")
+                self._ids.difference_update(removed)
+        if removed:
+            print(f"🧹 Historique compacté : {len(removed)} publication(s) de plus de {retention_days} jours supprimée(s).")
+        return len(removed)
+
+    def migrate_from_json(self, json_path):
+        """
+        Importe l'ancien historique JSON puis le renomme en '.migrated' pour que la migration
+        ne soit faite qu'une fois. Retourne le nombre de publications importées.
+        """
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Ancien historique JSON illisible ({e}). Migration ignorée.")
+            return 0
+
+        rows = []
+        for day_str, items in legacy.items():
+            for item in items or []:
+                if not item.get("twitch_clip_id"):
+                    continue
+                rows.append((item["twitch_clip_id"], item.get("youtube_short_id"), day_str,
+                             item.get("timestamp") or f"{day_str}T00:00:00"))
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO published (twitch_clip_id, youtube_short_id, published_date, timestamp) "
+                    "VALUES (?, ?, ?, ?)", rows
+                )
+        os.replace(json_path, f"{json_path}.migrated")
+        print(f"📦 Historique JSON migré vers SQLite : {len(rows)} publication(s) importée(s).")
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
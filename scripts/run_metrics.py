@@ -0,0 +1,287 @@
+# scripts/run_metrics.py
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource # Unix uniquement : temps CPU des sous-processus (ffmpeg, yt-dlp)
+except ImportError:
+    resource = None
+
+# Préfixe des métriques exportées au format Prometheus
+METRIC_PREFIX = "twitch_shorts"
+
+# Mesure en cours dans le thread courant (alimentée par note())
+_current = threading.local()
+# Intervalle de relevé de la mémoire résidente pendant un rendu (track_peak_rss).
+RSS_SAMPLE_INTERVAL_SECONDS = 0.1
+
+
+def _children_cpu_seconds():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss_bytes(pid):
+    """Mémoire résidente d'un processus (Linux : /proc), ou 0 s'il n'existe plus."""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _child_pids(pid):
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", 'r') as f:
+                children += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return children
+
+
+def process_tree_rss_bytes(pid=None):
+    """Mémoire résidente d'un processus et de ses descendants (ex : les ffmpeg de MoviePy)."""
+    pending, total = [pid or os.getpid()], 0
+    while pending:
+        current = pending.pop()
+        total += _rss_bytes(current)
+        pending += _child_pids(current)
+    return total
+
+
+@contextmanager
+def track_peak_rss():
+    """
+    Relève la mémoire résidente de ce processus et de ses sous-processus pendant le bloc et garde
+    son pic dans la mesure en cours (peak_rss_mb, le maximum si plusieurs blocs sont mesurés).
+    Produit un dict dont la clé peak_rss_mb est remplie à la sortie du bloc. Sans /proc (hors Linux),
+    le pic du processus depuis son démarrage (getrusage) est utilisé.
+    """
+    result = {}
+    peak = [process_tree_rss_bytes()]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(RSS_SAMPLE_INTERVAL_SECONDS):
+            peak[0] = max(peak[0], process_tree_rss_bytes())
+
+    sampler = threading.Thread(target=sample, name="rss-sampler", daemon=True)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        sampler.join()
+        peak_mb = max(peak[0], process_tree_rss_bytes()) / (1024 * 1024)
+        if not peak_mb and resource is not None:
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # Ko sous Linux
+        result["peak_rss_mb"] = peak_mb
+        sample = getattr(_current, "sample", None)
+        if sample is not None:
+            sample["peak_rss_mb"] = max(sample.get("peak_rss_mb", 0.0), peak_mb)
+
+
+def note(**counters):
+    """
+    Ajoute des compteurs (octets, images, requêtes API...) à la mesure en cours dans ce thread.
+    Sans effet en dehors d'une mesure : les modules peuvent l'appeler sans savoir s'ils sont instrumentés.
+    """
+    sample = getattr(_current, "sample", None)
+    if sample is None:
+        return
+    for key, value in counters.items():
+        sample[key] = sample.get(key, 0) + value
+
+
+@contextmanager
+def measure():
+    """
+    Mesure le bloc : temps réel, temps CPU du thread et temps CPU des sous-processus terminés
+    pendant le bloc (approximatif si plusieurs threads lancent des sous-processus en même temps).
+    Produit le dict de la mesure, complété par les appels à note() faits dans ce thread.
+    """
+    sample = {}
+    previous = getattr(_current, "sample", None)
+    _current.sample = sample
+    wall_started = time.perf_counter()
+    cpu_started = time.thread_time()
+    children_started = _children_cpu_seconds()
+    try:
+        yield sample
+    finally:
+        sample["wall_seconds"] = time.perf_counter() - wall_started
+        # Cumulés : une étape peut reporter le temps CPU d'un autre thread (ex : thread d'upload)
+        sample["cpu_seconds"] = sample.get("cpu_seconds", 0.0) + time.thread_time() - cpu_started
+        sample["children_cpu_seconds"] = sample.get("children_cpu_seconds", 0.0) + _children_cpu_seconds() - children_started
+        _current.sample = previous
+
+
+def measured_call(func, item):
+    """Appelle func(item) sous mesure. Retourne (résultat, mesure). Picklable (processus de rendu)."""
+    with measure() as sample:
+        result = func(item)
+    return result, sample
+
+
+class RunMetrics:
+    """
+    Métriques d'une exécution, par clip et par étape : temps réel et CPU, octets transférés,
+    images rendues (et images/s), requêtes API et issue (ok, failed, error, cancelled).
+
+    Exportées en JSON lines (une ligne par clip et par étape, ajoutées d'exécution en exécution)
+    et en fichier texte Prometheus (agrégats de la dernière exécution, pour le textfile collector
+    de node_exporter), avec un tableau récapitulatif dans le journal.
+    """
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.started_at = time.time()
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, clip_id, sample, outcome):
+        entry = {
+            "run_id": self.run_id,
+            "timestamp": datetime.now().isoformat(),
+            "stage": stage,
+            "clip_id": clip_id,
+            "outcome": outcome,
+        }
+        entry.update(sample)
+        if entry.get("frames") and entry.get("wall_seconds"):
+            entry["render_fps"] = entry["frames"] / entry["wall_seconds"]
+        with self._lock:
+            self.records.append(entry)
+        return entry
+
+    @contextmanager
+    def stage(self, stage, clip_id=None):
+        """Mesure un bloc hors pipeline (ex : la collecte Twitch) et l'enregistre comme une étape."""
+        outcome = "error"
+        sample = {}
+        try:
+            with measure() as sample:
+                yield sample
+            outcome = "ok"
+        finally:
+            self.record(stage, clip_id, sample, outcome)
+
+    # --- Agrégats ---
+    def _by_stage(self):
+        stages = {}
+        with self._lock:
+            records = list(self.records)
+        for entry in records:
+            s = stages.setdefault(entry["stage"], {
+                "outcomes": {}, "wall_seconds": 0.0, "max_wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "bytes": 0, "frames": 0, "render_seconds": 0.0, "twitch_api_requests": 0, "youtube_api_requests": 0,
+                "max_peak_rss_mb": 0.0,
+            })
+            s["outcomes"][entry["outcome"]] = s["outcomes"].get(entry["outcome"], 0) + 1
+            wall = entry.get("wall_seconds", 0.0)
+            s["wall_seconds"] += wall
+            s["max_wall_seconds"] = max(s["max_wall_seconds"], wall)
+            s["cpu_seconds"] += entry.get("cpu_seconds", 0.0) + entry.get("children_cpu_seconds", 0.0)
+            s["bytes"] += entry.get("bytes", 0)
+            if entry.get("frames"):
+                s["frames"] += entry["frames"]
+                s["render_seconds"] += wall
+            s["twitch_api_requests"] += entry.get("twitch_api_requests", 0)
+            s["youtube_api_requests"] += entry.get("youtube_api_requests", 0)
+            s["max_peak_rss_mb"] = max(s["max_peak_rss_mb"], entry.get("peak_rss_mb", 0.0))
+        return stages
+
+    # --- Exports ---
+    def write_jsonl(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            records = list(self.records)
+        with open(path, 'a', encoding='utf-8') as f:
+            for entry in records:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path):
+        """Écrit le fichier texte Prometheus de façon atomique (le collecteur ne lit jamais un fichier partiel)."""
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_last_run_timestamp_seconds Début de la dernière exécution (epoch).",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {self.started_at:.0f}",
+            f"# HELP {p}_run_duration_seconds Durée de la dernière exécution.",
+            f"# TYPE {p}_run_duration_seconds gauge",
+            f"{p}_run_duration_seconds {time.time() - self.started_at:.3f}",
+        ]
+        series = {
+            "stage_items": ("Clips traités par étape et par issue.", []),
+            "stage_wall_seconds": ("Temps réel cumulé par étape.", []),
+            "stage_max_wall_seconds": ("Temps réel maximal d'un clip par étape.", []),
+            "stage_cpu_seconds": ("Temps CPU cumulé par étape (sous-processus inclus).", []),
+            "stage_bytes": ("Octets transférés ou écrits par étape.", []),
+            "render_fps": ("Images rendues par seconde (moyenne de l'exécution).", []),
+            "api_requests": ("Requêtes API par étape.", []),
+            "stage_peak_rss_bytes": ("Pic de mémoire résidente d'un clip par étape (sous-processus inclus).", []),
+        }
+        for stage, s in self._by_stage().items():
+            for outcome, count in sorted(s["outcomes"].items()):
+                series["stage_items"][1].append(f'{p}_stage_items{{stage="{stage}",outcome="{outcome}"}} {count}')
+            series["stage_wall_seconds"][1].append(f'{p}_stage_wall_seconds{{stage="{stage}"}} {s["wall_seconds"]:.3f}')
+            series["stage_max_wall_seconds"][1].append(f'{p}_stage_max_wall_seconds{{stage="{stage}"}} {s["max_wall_seconds"]:.3f}')
+            series["stage_cpu_seconds"][1].append(f'{p}_stage_cpu_seconds{{stage="{stage}"}} {s["cpu_seconds"]:.3f}')
+            series["stage_bytes"][1].append(f'{p}_stage_bytes{{stage="{stage}"}} {s["bytes"]}')
+            if s["render_seconds"]:
+                series["render_fps"][1].append(f'{p}_render_fps{{stage="{stage}"}} {s["frames"] / s["render_seconds"]:.3f}')
+            if s["max_peak_rss_mb"]:
+                series["stage_peak_rss_bytes"][1].append(
+                    f'{p}_stage_peak_rss_bytes{{stage="{stage}"}} {s["max_peak_rss_mb"] * 1024 * 1024:.0f}')
+            for api in ("twitch", "youtube"):
+                if s[f"{api}_api_requests"]:
+                    series["api_requests"][1].append(
+                        f'{p}_api_requests{{stage="{stage}",api="{api}"}} {s[f"{api}_api_requests"]}')
+        for name, (help_text, samples) in series.items():
+            if samples:
+                lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} gauge"] + samples
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def print_summary(self):
+        stages = self._by_stage()
+        if not stages:
+            return
+        header = (f"{'Étape':<10} {'OK':>4} {'Échecs':>7} {'Réel (s)':>9} {'Max (s)':>8} {'CPU (s)':>8} "
+                  f"{'Mo':>8} {'img/s':>7} {'Req. API':>9} {'RSS max':>8}")
+        print("\n--- Métriques de l'exécution par étape ---")
+        print(header)
+        print("-" * len(header))
+        for stage, s in stages.items():
+            ok = s["outcomes"].get("ok", 0)
+            failed = sum(count for outcome, count in s["outcomes"].items() if outcome != "ok")
+            fps = f"{s['frames'] / s['render_seconds']:.1f}" if s["render_seconds"] else "-"
+            requests_count = s["twitch_api_requests"] + s["youtube_api_requests"]
+            rss = f"{s['max_peak_rss_mb']:.0f}" if s["max_peak_rss_mb"] else "-"
+            print(f"{stage:<10} {ok:>4} {failed:>7} {s['wall_seconds']:>9.1f} {s['max_wall_seconds']:>8.1f} "
+                  f"{s['cpu_seconds']:>8.1f} {s['bytes'] / (1024 * 1024):>8.1f} {fps:>7} {requests_count:>9} {rss:>8}")
+
+    def export(self, jsonl_path, prometheus_path):
+        """Écrit les deux exports et affiche le récapitulatif. Une erreur d'export n'interrompt jamais le bot."""
+        try:
+            self.write_jsonl(jsonl_path)
+            self.write_prometheus(prometheus_path)
+            print(f"📈 Métriques écrites : {jsonl_path} et {prometheus_path}")
+        except OSError as e:
+            print(f"⚠️ Impossible d'écrire les métriques : {e}")
+        self.print_summary()
@@ -0,0 +1,160 @@
+# scripts/simulate_job_queue.py
+"""
+Simulation de la file de travaux partagée (job_queue.py) avec plusieurs processus workers locaux.
+
+Le téléchargement, le rendu et YouTube sont simulés : la préparation attend un temps aléatoire et
+le faux upload ajoute une ligne à un faux journal YouTube. La publication passe par le vrai planificateur
+d'uploads et un registre de quota partagé par tous les workers (data/ commun), avec un quota du jour
+plus petit que la file. Des workers meurent au hasard (os._exit) pendant la préparation ou pendant
+l'upload, et sont relancés tant que la file n'est pas vide et que le quota le permet.
+Avec des baux courts, les clips des workers morts sont repris par les autres.
+
+Vérifie à la fin qu'aucun clip n'a été publié deux fois, que chaque clip de la file est publié,
+abandonné, en attente de quota ou signalé comme "mort pendant l'upload" (jamais republié),
+et que le registre partagé a compté chaque vidéo créée sans dépasser le quota du jour.
+
+Exemple :
+    python scripts/simulate_job_queue.py --clips 30 --workers 4 --crash-rate 0.15 --quota-uploads 20
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from collections import Counter
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(SCRIPTS_DIR)
+
+import job_queue
+import upload_scheduler
+
+
+def worker_main(db_path, log_path, ledger_path, daily_quota, lease_seconds, crash_rate, fail_rate, seed):
+    """Exécuté dans un processus worker."""
+    rng = random.Random(seed)
+    queue_db = job_queue.JobQueue(db_path, lease_seconds=lease_seconds)
+    job_queue.POLL_SECONDS = 0.2
+
+    def prepare(clip):
+        time.sleep(rng.uniform(0.05, 0.3))
+        if rng.random() < crash_rate:
+            os._exit(3) # Crash pendant la préparation : le bail expirera et le clip sera repris
+        return None if rng.random() < fail_rate else {"video": f"{clip['id']}.mp4"}
+
+    def fake_upload(service, video_path, metadata):
+        time.sleep(rng.uniform(0.05, 0.2))
+        if rng.random() < crash_rate / 2:
+            os._exit(4) # Crash pendant l'upload, avant la réponse : la vidéo n'existe pas encore
+        # Faux journal YouTube : une ligne par vidéo créée (écriture atomique en mode ajout)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(f"{metadata['clip_id']}\n")
+        if rng.random() < crash_rate / 2:
+            os._exit(5) # Crash après la création de la vidéo, avant l'enregistrement du résultat
+        return f"yt-{metadata['clip_id']}"
+
+    # Le planificateur importe upload_youtube au premier upload : le faux module le remplace
+    sys.modules["upload_youtube"] = types.SimpleNamespace(upload_youtube_short=fake_upload)
+    scheduler = upload_scheduler.UploadScheduler(
+        service_factory=lambda: None,
+        ledger=upload_scheduler.QuotaLedger(ledger_path, daily_quota=daily_quota),
+        deferred_file=f"{ledger_path}.deferred.json"
+    )
+
+    def publish(clip, prepared):
+        # Comme run_queue_worker (main.py) : faute de quota, le clip est rendu à la file
+        future = scheduler.submit(clip, prepared["video"], {"clip_id": clip["id"]}, defer=False)
+        return job_queue.DEFERRED if future is None else future.result()
+
+    try:
+        job_queue.run_worker(queue_db, prepare, publish, worker_id=f"sim-{os.getpid()}",
+                             can_publish=scheduler.can_afford_upload)
+    finally:
+        scheduler.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation de la file de travaux avec plusieurs workers locaux.")
+    parser.add_argument("--clips", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lease-seconds", type=float, default=1.0)
+    parser.add_argument("--crash-rate", type=float, default=0.15, help="Probabilité de crash par étape.")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="Probabilité d'échec de la préparation.")
+    parser.add_argument("--quota-uploads", type=int, default=20,
+                        help="Quota YouTube du jour, en nombre d'uploads (partagé par tous les workers).")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "jobs.sqlite3")
+        log_path = os.path.join(work_dir, "youtube.log")
+        open(log_path, 'w').close()
+        ledger_path = os.path.join(work_dir, "youtube_quota_ledger.json")
+        cost = upload_scheduler.VIDEO_INSERT_QUOTA_COST
+        daily_quota = args.quota_uploads * cost
+        ledger = upload_scheduler.QuotaLedger(ledger_path, daily_quota=daily_quota)
+        queue_db = job_queue.JobQueue(db_path, lease_seconds=args.lease_seconds)
+        for n in range(args.clips):
+            queue_db.enqueue(f"clip{n:03d}", {"id": f"clip{n:03d}"}, priority=args.clips - n)
+
+        started = time.perf_counter()
+        spawned = 0
+        crashes = Counter()
+        processes = []
+        while True:
+            for process in [p for p in processes if p.poll() is not None]:
+                processes.remove(process)
+                if process.returncode:
+                    crashes[process.returncode] += 1
+            quota_left = ledger.remaining() >= cost
+            if not processes and (not quota_left or not queue_db.has_pending()):
+                # Quota du jour épuisé : les workers s'arrêtent d'eux-mêmes, les clips restants attendent dans la file
+                break
+            while quota_left and queue_db.has_pending() and len(processes) < args.workers:
+                spawned += 1
+                processes.append(subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), "--worker", db_path, log_path, ledger_path,
+                     str(daily_quota), str(args.lease_seconds), str(args.crash_rate), str(args.fail_rate),
+                     str(args.seed * 1000 + spawned)],
+                    stdout=subprocess.DEVNULL))
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - started
+
+        with open(log_path, 'r', encoding='utf-8') as f:
+            publications = Counter(line.strip() for line in f if line.strip())
+        counts = queue_db.counts()
+        duplicates = {clip_id: n for clip_id, n in publications.items() if n > 1}
+        done_ids = {job["clip_id"] for job in queue_db.jobs("done")}
+        unrecorded = set(publications) - done_ids - {job["clip_id"] for job in queue_db.jobs("publishing")}
+        used_units = daily_quota - ledger.remaining()
+
+    print(f"Workers lancés : {spawned} (crashs : préparation={crashes[3]}, upload={crashes[4]}, "
+          f"après publication={crashes[5]}) en {elapsed:.1f}s")
+    print("États de la file : " + ", ".join(f"{state}={count}" for state, count in sorted(counts.items())))
+    print(f"Vidéos publiées : {sum(publications.values())} pour {len(publications)} clip(s) distinct(s)")
+    print(f"Quota : {used_units} unités comptées pour {sum(publications.values()) * cost} consommées "
+          f"(quota du jour : {daily_quota})")
+    # Chaque vidéo créée a réservé son quota avant l'envoi ; une réservation sans vidéo (crash) reste comptée
+    quota_ok = sum(publications.values()) * cost <= used_units <= daily_quota
+    ok = not duplicates and not unrecorded and quota_ok
+    if duplicates:
+        print(f"❌ Clips publiés plusieurs fois : {duplicates}")
+    if unrecorded:
+        print(f"❌ Clips publiés sans être marqués 'done' ni 'publishing' : {sorted(unrecorded)}")
+    if not quota_ok:
+        print("❌ Quota sous-compté ou dépassé par les workers.")
+    if ok:
+        print("✅ Au plus une publication par clip ; les clips morts pendant l'upload restent en 'publishing' ; "
+              "quota partagé respecté.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 10 and sys.argv[1] == "--worker":
+        worker_main(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]), float(sys.argv[6]),
+                    float(sys.argv[7]), float(sys.argv[8]), int(sys.argv[9]))
+    else:
+        sys.exit(main())
@@ -0,0 +1,171 @@
+# scripts/source_stats.py
+import os
+import json
+import heapq
+import math
+import random
+import threading
+from datetime import datetime
+
+# --- PARAMÈTRES DU BUDGET ADAPTATIF PAR SOURCE ---
+# Poids des exécutions passées : à chaque collecte, les compteurs d'une source sont multipliés
+# par ce facteur avant d'ajouter les nouveaux (les sources qui changent de rythme sont suivies).
+STATS_DECAY = 0.8
+# En dessous de ce nombre de collectes, une source est "en découverte" : budget plein.
+MIN_OBSERVATIONS = 3
+# Nombre de clips éligibles (langue et durée) visé par source : la demande est dimensionnée
+# d'après le taux d'éligibilité observé (une source à 10 % d'éligibles reçoit une demande plus grande).
+TARGET_ELIGIBLE_PER_SOURCE = 10
+# Demande minimale à une source interrogée, et maximum accepté par l'API Twitch (paramètre 'first').
+MIN_CLIPS_PER_SOURCE = 5
+MAX_CLIPS_PER_SOURCE = 100
+# Une source dont le rendement (clips classés dans le haut du classement, clips publiés) est nul
+# après MIN_OBSERVATIONS collectes est ignorée, sauf tirage d'exploration.
+EXPLORATION_SHARE = 0.1
+# Taille du "haut du classement" pris en compte pour le rendement d'une source.
+TOP_RANK_WINDOW = 10
+# Poids d'une publication par rapport à un clip classé dans le haut du classement.
+PUBLISHED_WEIGHT = 3
+# La collecte s'arrête quand ce nombre de candidats est atteint et qu'aucune source restante
+# ne peut, d'après son historique, battre le dernier d'entre eux.
+ENOUGH_CANDIDATES = 20
+# --- FIN PARAMÈTRES ---
+
+
+def source_key(source_type, source_id):
+    return f"{source_type}:{source_id}"
+
+
+class SourceStats:
+    """
+    Statistiques par source Twitch (streamer ou jeu), conservées d'une exécution à l'autre :
+    clips récupérés, clips éligibles après filtrage langue/durée, clips classés dans le haut du
+    classement, clips publiés et meilleur nombre de vues (moyennes amorties par STATS_DECAY).
+
+    plan() en déduit, pour chaque source, la taille de la demande ou son exclusion, et l'ordre
+    d'interrogation (les sources les plus prometteuses d'abord) ; should_stop() permet d'arrêter
+    la collecte dès que les candidats en main ne peuvent plus être battus.
+    """
+
+    def __init__(self, path, exploration_share=EXPLORATION_SHARE, rng=None):
+        self.path = path
+        self.exploration_share = exploration_share
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self.sources = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.sources = json.load(f).get("sources", {})
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"⚠️ Statistiques des sources illisibles ({e}). Toutes les sources repartent en découverte.")
+
+    # --- Indicateurs ---
+    def _stats(self, key):
+        return self.sources.get(key, {})
+
+    def eligible_rate(self, key):
+        s = self._stats(key)
+        return s["eligible"] / s["fetched"] if s.get("fetched") else None
+
+    def yield_score(self, key):
+        s = self._stats(key)
+        return s.get("top", 0.0) + PUBLISHED_WEIGHT * s.get("published", 0.0)
+
+    def expected_best_views(self, key):
+        """Meilleur nombre de vues attendu d'une source (infini si elle est encore mal connue)."""
+        s = self._stats(key)
+        if s.get("runs", 0) < MIN_OBSERVATIONS:
+            return math.inf
+        return s.get("best_views", 0.0)
+
+    def budget(self, key, default):
+        """Nombre de clips à demander à une source (budget plein tant qu'elle est en découverte)."""
+        s = self._stats(key)
+        rate = self.eligible_rate(key)
+        if s.get("runs", 0) < MIN_OBSERVATIONS or rate is None:
+            return default
+        wanted = math.ceil(TARGET_ELIGIBLE_PER_SOURCE / max(rate, 0.01))
+        return max(MIN_CLIPS_PER_SOURCE, min(wanted, default, MAX_CLIPS_PER_SOURCE))
+
+    # --- Planification ---
+    def plan(self, sources, default_budget):
+        """
+        Retourne [(type, id, nombre de clips à demander, exploration)] pour les sources à interroger,
+        de la plus prometteuse à la moins prometteuse. Les sources froides sont ignorées, sauf une part
+        EXPLORATION_SHARE tirée au hasard (interrogées avec le budget minimal, sans arrêt anticipé).
+        """
+        with self._lock:
+            hot, cold = [], []
+            for source_type, source_id in sources:
+                key = source_key(source_type, source_id)
+                s = self._stats(key)
+                if s.get("runs", 0) >= MIN_OBSERVATIONS and self.yield_score(key) < 0.05:
+                    cold.append((source_type, source_id))
+                else:
+                    hot.append((source_type, source_id))
+            hot.sort(key=lambda source: self.expected_best_views(source_key(*source)), reverse=True)
+            explored = self._rng.sample(cold, min(len(cold), math.ceil(len(cold) * self.exploration_share)))
+            planned = [(t, i, self.budget(source_key(t, i), default_budget), False) for t, i in hot]
+            planned += [(t, i, MIN_CLIPS_PER_SOURCE, True) for t, i in explored]
+        skipped = len(cold) - len(explored)
+        requested = sum(first for _, _, first, _ in planned)
+        print(f"🎯 Budget adaptatif : {len(planned)} source(s) interrogée(s) ({len(explored)} en exploration), "
+              f"{skipped} source(s) froide(s) ignorée(s), {requested} clips demandés au plus "
+              f"(au lieu de {len(sources) * default_budget}).")
+        return planned
+
+    def should_stop(self, next_source, eligible_views):
+        """
+        Indique si la collecte peut s'arrêter avant next_source : ENOUGH_CANDIDATES candidats sont en main
+        et le meilleur clip attendu de cette source (et des suivantes, moins prometteuses) ne les bat pas.
+        """
+        best = heapq.nlargest(ENOUGH_CANDIDATES, eligible_views) # Itérable quelconque : seuls les k meilleurs sont gardés
+        if len(best) < ENOUGH_CANDIDATES:
+            return False
+        threshold = best[-1]
+        return self.expected_best_views(source_key(*next_source)) <= threshold
+
+    # --- Mise à jour ---
+    def _update(self, key, **counts):
+        s = self.sources.setdefault(key, {"runs": 0, "fetched": 0.0, "eligible": 0.0, "top": 0.0,
+                                          "published": 0.0, "best_views": 0.0})
+        for field, value in counts.items():
+            s[field] = s.get(field, 0.0) * STATS_DECAY + value
+        s["last_seen"] = datetime.now().isoformat()
+        return s
+
+    def record_collection(self, per_source, ranked_clips):
+        """
+        Enregistre une collecte. per_source : clé de source -> {"fetched", "eligible", "best_views"} ;
+        ranked_clips : candidats classés (chacun porte la clé 'source' de sa source).
+        """
+        top_counts = {}
+        for clip in ranked_clips[:TOP_RANK_WINDOW]:
+            top_counts[clip.get("source")] = top_counts.get(clip.get("source"), 0) + 1
+        with self._lock:
+            for key, counts in per_source.items():
+                s = self._update(key, fetched=counts["fetched"], eligible=counts["eligible"],
+                                 top=top_counts.get(key, 0), published=0)
+                # Meilleures vues : moyenne mobile (une somme amortie grossirait avec le nombre de collectes)
+                s["best_views"] = counts["best_views"] if not s["runs"] else \
+                    STATS_DECAY * s["best_views"] + (1 - STATS_DECAY) * counts["best_views"]
+                s["runs"] += 1
+
+    def record_published(self, source):
+        """Crédite la source d'un clip publié (clé 'source' du clip)."""
+        if not source:
+            return
+        with self._lock:
+            s = self.sources.setdefault(source, {"runs": 0, "fetched": 0.0, "eligible": 0.0, "top": 0.0,
+                                                 "published": 0.0, "best_views": 0.0})
+            s["published"] += 1
+
+    def save(self):
+        with self._lock:
+            data = {"updated_at": datetime.now().isoformat(), "sources": self.sources}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
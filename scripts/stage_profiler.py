@@ -0,0 +1,148 @@
+# scripts/stage_profiler.py
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# --- PARAMÈTRES DU PROFILAGE (opt-in) ---
+# Activé par --profile (main.py) ou PROFILE_STAGES=1. La variable d'environnement est lue à chaque
+# appel : elle est héritée par les processus de rendu (lancés en 'spawn').
+PROFILE_ENV_VAR = "PROFILE_STAGES"
+# Intervalle d'échantillonnage des piles d'appels (fichiers .collapsed.txt).
+SAMPLE_INTERVAL_SECONDS = 0.005
+# Un cProfile par thread n'est possible qu'avant Python 3.12 : cProfile s'appuie ensuite sur
+# sys.monitoring, qui n'accepte qu'un profileur actif par processus ("Another profiling tool is
+# already active"). Les sections n'écrivent alors que les piles échantillonnées (pas de .prof).
+CPROFILE_PER_THREAD = sys.version_info < (3, 12)
+# --- FIN PARAMÈTRES ---
+
+_local = threading.local() # Sections actives du thread courant (de la plus externe à la plus interne)
+
+
+def enabled():
+    return os.environ.get(PROFILE_ENV_VAR, "0") == "1"
+
+
+def enable():
+    """Active le profilage pour ce processus et les processus qu'il lancera."""
+    os.environ[PROFILE_ENV_VAR] = "1"
+
+
+def profile_paths(artifact_path, name):
+    """Fichiers d'une section, à côté de l'artefact : <artefact>.<section>.prof et .collapsed.txt."""
+    base = os.path.splitext(artifact_path)[0]
+    return f"{base}.{name}.prof", f"{base}.{name}.collapsed.txt"
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """
+    Échantillonne la pile d'appels d'un thread à intervalle régulier et en compte chaque occurrence
+    pour toutes les sections actives de ce thread (piles "repliées", une par ligne, lisibles par
+    flamegraph.pl, speedscope ou inferno). Contrairement à cProfile, donne les piles complètes.
+    """
+
+    def __init__(self, thread_id, sections):
+        super().__init__(name="stage-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.sections = sections
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL_SECONDS):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            stack = ";".join(reversed(labels))
+            for section in list(self.sections):
+                section.samples[stack] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class _Section:
+    def __init__(self, name, artifact_path):
+        import cProfile
+        self.name = name
+        self.artifact_path = artifact_path
+        self.profiler = cProfile.Profile() if CPROFILE_PER_THREAD else None
+        self.children = [] # Profils des sections imbriquées (fusionnés dans celui-ci)
+        self.samples = Counter()
+        self.started = time.perf_counter()
+
+    def write(self):
+        import pstats
+        prof_path, collapsed_path = profile_paths(self.artifact_path, self.name)
+        os.makedirs(os.path.dirname(os.path.abspath(prof_path)), exist_ok=True)
+        if self.profiler is not None:
+            stats = pstats.Stats(self.profiler)
+            if self.children:
+                stats.add(*self.children)
+            stats.dump_stats(prof_path)
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        written_path = prof_path if self.profiler is not None else collapsed_path
+        print(f"🔬 Profil '{self.name}' ({time.perf_counter() - self.started:.1f}s) : {written_path}")
+
+
+@contextmanager
+def _profiled_section(name, artifact_path):
+    sections = getattr(_local, "sections", None)
+    if sections is None:
+        sections = _local.sections = []
+    section = _Section(name, artifact_path)
+    # cProfile ne s'imbrique pas : la section englobante est suspendue, puis reçoit le profil de celle-ci
+    if sections and section.profiler is not None:
+        sections[-1].profiler.disable()
+    sampler = None
+    if not sections:
+        sampler = _StackSampler(threading.get_ident(), sections)
+        sampler.start()
+    sections.append(section)
+    if section.profiler is not None:
+        section.profiler.enable()
+    try:
+        yield
+    finally:
+        if section.profiler is not None:
+            section.profiler.disable()
+        sections.pop()
+        if sampler is not None:
+            sampler.stop()
+        try:
+            section.write()
+        except OSError as e:
+            print(f"⚠️ Profil '{name}' non enregistré : {e}")
+        if sections and section.profiler is not None:
+            sections[-1].children.extend(section.children + [section.profiler])
+            sections[-1].profiler.enable()
+
+
+def section(name, artifact_path):
+    """
+    Profile le bloc (cProfile et piles échantillonnées) si le profilage est activé, sans effet sinon.
+    À partir de Python 3.12, piles échantillonnées seulement (voir CPROFILE_PER_THREAD).
+    Les fichiers sont écrits à côté de artifact_path (voir profile_paths).
+    """
+    if not enabled():
+        return nullcontext()
+    return _profiled_section(name, artifact_path)
+
+
+def call(name, func, artifact_path_for, item):
+    """Appelle func(item) dans une section profilée. Picklable avec functools.partial (processus de rendu)."""
+    with section(name, artifact_path_for(item)):
+        return func(item)
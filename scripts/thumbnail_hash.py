@@ -0,0 +1,181 @@
+# scripts/thumbnail_hash.py
+import io
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import candidate_table
+
+# --- PARAMÈTRES DU FILTRE DES MINIATURES ---
+# Deux clips dont les empreintes perceptuelles (pHash 64 bits) diffèrent d'au plus ce nombre de bits
+# montrent la même image (même moment clippé par plusieurs personnes, ré-upload). Le doublon d'un clip
+# déjà publié est écarté ; celui d'un candidat mieux classé est gardé en repli, en fin de classement.
+MAX_HAMMING_DISTANCE = 10
+# Miniatures téléchargées en parallèle, par lots de cette taille (quelques Ko chacune).
+THUMBNAIL_WORKERS = 8
+THUMBNAIL_TIMEOUT_SECONDS = 10
+# Seuls les premiers candidats uniques sont vérifiés : au-delà, ils ne seront pas atteints par le pipeline.
+THUMBNAIL_CHECK_LIMIT = 40
+# Empreintes conservées d'une exécution à l'autre (comparaison avec les clips déjà publiés).
+HASH_CACHE_MAX_AGE_DAYS = 30
+# --- FIN PARAMÈTRES ---
+
+# Taille de l'image réduite avant la DCT, et du bloc de basses fréquences gardé (8x8 = 64 bits).
+DCT_SIZE = 32
+HASH_SIZE = 8
+
+
+def _numpy():
+    import numpy # Chargé au premier filtrage, pas au démarrage de main.py
+    return numpy
+
+
+def perceptual_hash(image_bytes):
+    """
+    pHash d'une image : niveaux de gris 32x32, DCT 2D (NumPy), bloc 8x8 des basses fréquences
+    comparé à sa médiane. Retourne un entier de 64 bits.
+    """
+    np = _numpy()
+    from PIL import Image
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = np.asarray(image.convert("L").resize((DCT_SIZE, DCT_SIZE), Image.Resampling.LANCZOS), dtype=np.float64)
+    return dct_hash(pixels)
+
+
+def dct_hash(pixels):
+    """pHash d'une image déjà réduite en niveaux de gris (tableau DCT_SIZE x DCT_SIZE)."""
+    np = _numpy()
+    pixels = np.asarray(pixels, dtype=np.float64)
+    n = np.arange(DCT_SIZE)
+    basis = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * DCT_SIZE)) # Matrice de la DCT-II
+    low = (basis @ pixels @ basis.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    bits = low > np.median(low[1:]) # Composante continue exclue de la médiane
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distances(hashes, value):
+    """Nombre de bits différents entre value et chacune des empreintes (tableau NumPy uint64)."""
+    np = _numpy()
+    differences = np.bitwise_xor(hashes, np.uint64(value))
+    return np.unpackbits(differences.view(np.uint8)).reshape(len(hashes), 64).sum(axis=1)
+
+
+def superseded(clip, published_clip_ids):
+    """Indique si clip est gardé en repli d'un doublon visuel dont le clip doublé a été publié depuis."""
+    duplicate_of = clip.get("duplicate_of")
+    return duplicate_of is not None and duplicate_of in published_clip_ids
+
+
+class ThumbnailDeduplicator:
+    """
+    Écarte, avant tout téléchargement, les candidats dont la miniature est presque identique
+    à celle d'un clip déjà publié, et repousse en fin de classement ceux qui doublent un candidat
+    mieux classé : ils ne servent que si ce candidat n'est finalement pas publié.
+
+    Les miniatures sont téléchargées en parallèle et leurs empreintes gardées par ID de clip
+    dans un fichier JSON (data/thumbnail_hashes.json) : un clip n'est jamais haché deux fois,
+    et les clips publiés lors des exécutions précédentes restent comparables.
+    """
+
+    def __init__(self, path, max_distance=MAX_HAMMING_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self.hashes = {} # ID du clip -> {"hash": hex, "at": date ISO}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.hashes = json.load(f).get("hashes", {})
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"⚠️ Empreintes des miniatures illisibles ({e}). Elles seront recalculées.")
+
+    # --- Empreintes ---
+    def _fetch_hash(self, clip):
+        url = clip.get("thumbnail_url")
+        if not url:
+            return None
+        try:
+            response = requests.get(url, timeout=THUMBNAIL_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            return perceptual_hash(response.content)
+        except Exception as e: # Miniature absente ou illisible : le clip n'est simplement pas comparé
+            print(f"  ⚠️ Miniature du clip '{clip.get('id')}' inutilisable : {e}")
+            return None
+
+    def hash_clips(self, clips, executor):
+        """Empreintes des clips (ID -> entier, ou None), les miniatures manquantes étant téléchargées en parallèle."""
+        with self._lock:
+            known = {clip["id"]: int(self.hashes[clip["id"]]["hash"], 16) for clip in clips if clip["id"] in self.hashes}
+        missing = [clip for clip in clips if clip["id"] not in known]
+        computed = dict(zip((clip["id"] for clip in missing), executor.map(self._fetch_hash, missing)))
+        now = datetime.now().isoformat()
+        with self._lock:
+            for clip_id, value in computed.items():
+                if value is not None:
+                    self.hashes[clip_id] = {"hash": f"{value:016x}", "at": now}
+        known.update(computed)
+        return known
+
+    # --- Filtrage ---
+    def filter(self, ranked_clips, already_published_clip_ids=(), check_limit=THUMBNAIL_CHECK_LIMIT):
+        """
+        Retourne les candidats classés (même type de séquence que ranked_clips) : sans les doublons visuels
+        d'un clip déjà publié, et avec les doublons d'un candidat mieux classé repoussés en fin de classement,
+        marqués 'duplicate_of' (voir superseded). Les candidats sont vérifiés par lots jusqu'à check_limit
+        candidats gardés ; les suivants sont conservés sans vérification.
+        """
+        np = _numpy()
+        with self._lock:
+            published = [int(entry["hash"], 16) for clip_id, entry in self.hashes.items()
+                         if clip_id in already_published_clip_ids]
+        published = np.array(published, dtype=np.uint64)
+        kept_hashes, kept_ids = np.array([], dtype=np.uint64), [] # Candidats gardés, auxquels les suivants sont comparés
+        kept, fallbacks, dropped, position = [], {}, 0, 0
+        with ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnails") as executor:
+            while position < len(ranked_clips) and len(kept) < check_limit:
+                batch = list(range(position, min(len(ranked_clips), position + THUMBNAIL_WORKERS)))
+                clips = [ranked_clips[i] for i in batch]
+                hashes = self.hash_clips(clips, executor)
+                for i, clip in zip(batch, clips):
+                    value = hashes.get(clip["id"])
+                    if value is not None and len(published) and hamming_distances(published, value).min() <= self.max_distance:
+                        dropped += 1
+                        continue
+                    if value is not None and len(kept_hashes):
+                        distances = hamming_distances(kept_hashes, value)
+                        if distances.min() <= self.max_distance:
+                            # Le candidat doublé n'est pas encore publié : ce clip le remplacera s'il échoue
+                            fallbacks[i] = kept_ids[int(distances.argmin())]
+                            continue
+                    kept.append(i)
+                    if value is not None:
+                        kept_hashes = np.append(kept_hashes, np.uint64(value))
+                        kept_ids.append(clip["id"])
+                position = batch[-1] + 1
+        if dropped:
+            print(f"🖼️ {dropped} clip(s) écarté(s) : miniature quasi identique à un clip déjà publié.")
+        if fallbacks:
+            print(f"🖼️ {len(fallbacks)} clip(s) repoussé(s) en fin de classement : miniature quasi identique "
+                  f"à un clip mieux classé (gardés en repli s'il n'est pas publié).")
+        positions = kept + list(range(position, len(ranked_clips))) + list(fallbacks)
+        if isinstance(ranked_clips, candidate_table.CandidateList):
+            return ranked_clips.select(positions, duplicate_of=fallbacks)
+        return [dict(ranked_clips[i], duplicate_of=fallbacks[i]) if i in fallbacks else ranked_clips[i]
+                for i in positions]
+
+    # --- Persistance ---
+    def save(self):
+        """Enregistre les empreintes (écriture atomique), sans celles de plus de HASH_CACHE_MAX_AGE_DAYS jours."""
+        cutoff = (datetime.now() - timedelta(days=HASH_CACHE_MAX_AGE_DAYS)).isoformat()
+        with self._lock:
+            self.hashes = {clip_id: entry for clip_id, entry in self.hashes.items() if entry["at"] >= cutoff}
+            data = {"updated_at": datetime.now().isoformat(), "hashes": self.hashes}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
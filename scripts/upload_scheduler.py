@@ -0,0 +1,319 @@
+# scripts/upload_scheduler.py
+import os
+import json
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import run_metrics
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+# --- PARAMÈTRES DE QUOTA YOUTUBE DATA API ---
+# Quota journalier par défaut d'un projet Google Cloud (en unités).
+YOUTUBE_DAILY_QUOTA_UNITS = 10000
+# Coût d'un appel videos.insert (upload d'une vidéo).
+VIDEO_INSERT_QUOTA_COST = 1600
+# Le quota YouTube est remis à zéro à minuit, heure du Pacifique.
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# Nombre maximum d'uploads exécutés en parallèle en arrière-plan.
+MAX_CONCURRENT_UPLOADS = 2
+# --- FIN PARAMÈTRES ---
+
+
+class UploadOutcomeUnknown(Exception):
+    """
+    L'upload a commencé puis échoué sans réponse claire (ex : dernier morceau reçu, réponse perdue) :
+    la vidéo a peut-être été créée. Le clip ne doit pas être republié automatiquement.
+    """
+
+
+def _write_json_atomic(path, data):
+    """Écrit un fichier JSON de façon atomique (fichier temporaire puis renommage)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _lock_file(f):
+    """Verrou exclusif (bloquant) sur un fichier ouvert, entre processus et entre machines."""
+    if fcntl is not None:
+        fcntl.lockf(f, fcntl.LOCK_EX) # Verrou POSIX : respecté aussi sur un partage NFS
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.lockf(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class QuotaLedger:
+    """
+    Registre local de la consommation du quota YouTube Data API.
+    Le compteur est remis à zéro à chaque nouveau jour (heure du Pacifique).
+
+    Le fichier peut être partagé par plusieurs processus (workers de la file de travaux, sur une
+    ou plusieurs machines) : chaque opération le relit et le réécrit sous un verrou de fichier
+    (<registre>.lock), sans garder de compteur en mémoire qu'un autre processus aurait dépassé.
+    """
+
+    def __init__(self, ledger_path, daily_quota=YOUTUBE_DAILY_QUOTA_UNITS, timezone=QUOTA_TIMEZONE):
+        self.ledger_path = ledger_path
+        self.daily_quota = daily_quota
+        self.timezone = timezone
+        self._lock = threading.Lock() # Les verrous de fichier POSIX ne s'excluent pas entre threads d'un processus
+
+    def _quota_day(self):
+        return datetime.now(self.timezone).date().isoformat()
+
+    def _read(self):
+        if not os.path.exists(self.ledger_path):
+            return None
+        try:
+            with open(self.ledger_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Registre de quota illisible ({e}). Réinitialisation du compteur.")
+            return None
+
+    @contextmanager
+    def _locked_state(self):
+        """Relit l'état du jour sous verrou, le fournit au bloc, puis l'enregistre s'il a changé."""
+        with self._lock, open(f"{self.ledger_path}.lock", 'a+') as lock_file:
+            _lock_file(lock_file)
+            try:
+                stored = self._read()
+                today = self._quota_day()
+                state = {"day": today, "used_units": 0}
+                if stored and stored.get("day") == today:
+                    try:
+                        state["used_units"] = int(stored.get("used_units", 0))
+                    except (TypeError, ValueError) as e:
+                        print(f"⚠️ Registre de quota illisible ({e}). Réinitialisation du compteur.")
+                elif stored and stored.get("day"):
+                    print(f"🔄 Nouveau jour de quota YouTube ({today}, heure du Pacifique). Compteur remis à zéro.")
+                yield state
+                if state != stored:
+                    _write_json_atomic(self.ledger_path, state)
+            finally:
+                _unlock_file(lock_file)
+
+    def remaining(self):
+        """Retourne le nombre d'unités de quota encore disponibles aujourd'hui."""
+        with self._locked_state() as state:
+            return max(0, self.daily_quota - state["used_units"])
+
+    def try_reserve(self, units):
+        """Réserve des unités de quota. Retourne False si le quota serait dépassé."""
+        with self._locked_state() as state:
+            if state["used_units"] + units > self.daily_quota:
+                return False
+            state["used_units"] += units
+            return True
+
+    def release(self, units):
+        """Rend des unités réservées qui n'ont finalement pas été consommées par l'API."""
+        with self._locked_state() as state:
+            state["used_units"] = max(0, state["used_units"] - units)
+
+
+class UploadScheduler:
+    """
+    Exécute les uploads YouTube en arrière-plan avec un nombre borné d'uploads simultanés.
+    Les uploads qui dépasseraient le quota du jour sont différés (sauvegardés sur disque)
+    au lieu d'échouer, et peuvent être relancés lors d'une exécution suivante.
+    """
+
+    def __init__(self, service_factory, ledger, deferred_file, max_workers=MAX_CONCURRENT_UPLOADS,
+                 on_published=None, insert_cost=VIDEO_INSERT_QUOTA_COST, on_outcome_unknown=None):
+        self.service_factory = service_factory
+        self.ledger = ledger
+        self.deferred_file = deferred_file
+        self.on_published = on_published
+        # Appelé avec (clip_data) quand l'issue d'un upload commencé est inconnue (voir UploadOutcomeUnknown)
+        self.on_outcome_unknown = on_outcome_unknown
+        self.insert_cost = insert_cost
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+        self._futures = set()
+        self._lock = threading.Lock()
+        # Le service googleapiclient (httplib2) n'est pas thread-safe : un service par thread.
+        self._thread_local = threading.local()
+        # Le rafraîchissement du jeton réécrit token.json : on sérialise l'authentification.
+        self._auth_lock = threading.Lock()
+        self.deferred_in_this_run = []
+        # Mesures des uploads (temps, CPU, octets, requêtes API) par ID de clip, lues par l'étape d'upload
+        self.upload_samples = {}
+
+    # --- Uploads différés ---
+    def load_deferred(self):
+        """Charge la liste des uploads différés lors des exécutions précédentes."""
+        if not os.path.exists(self.deferred_file):
+            return []
+        try:
+            with open(self.deferred_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Fichier des uploads différés illisible ({e}). Ignoré.")
+            return []
+
+    def _save_deferred(self, entries):
+        _write_json_atomic(self.deferred_file, entries)
+
+    def _defer(self, clip_data, video_path, metadata):
+        with self._lock:
+            entries = [e for e in self.load_deferred() if e["clip"]["id"] != clip_data["id"]]
+            entries.append({
+                "clip": clip_data,
+                "video_path": video_path,
+                "metadata": metadata,
+                "deferred_at": datetime.now().isoformat()
+            })
+            self._save_deferred(entries)
+            self.deferred_in_this_run.append(clip_data["id"])
+        print(f"⏸️ Quota YouTube insuffisant ({self.ledger.remaining()} unités restantes). "
+              f"Upload du clip '{clip_data['id']}' différé.")
+
+    def _forget_deferred(self, clip_id):
+        with self._lock:
+            entries = self.load_deferred()
+            remaining = [e for e in entries if e["clip"]["id"] != clip_id]
+            if len(remaining) != len(entries):
+                self._save_deferred(remaining)
+
+    def resubmit_deferred(self, skip_clip_ids=()):
+        """
+        Relance les uploads différés dont la vidéo est toujours présente sur le disque.
+        Retourne la liste des IDs de clips relancés.
+        """
+        resubmitted = []
+        for entry in self.load_deferred():
+            clip_id = entry["clip"]["id"]
+            if clip_id in skip_clip_ids or not os.path.exists(entry["video_path"]):
+                print(f"🧹 Upload différé du clip '{clip_id}' abandonné (déjà publié ou vidéo introuvable).")
+                self._forget_deferred(clip_id)
+                continue
+            if not self.can_afford_upload():
+                break
+            print(f"▶️ Reprise de l'upload différé du clip '{clip_id}'.")
+            if self.submit(entry["clip"], entry["video_path"], entry["metadata"]):
+                resubmitted.append(clip_id)
+        return resubmitted
+
+    # --- Soumission et exécution ---
+    def can_afford_upload(self):
+        return self.ledger.remaining() >= self.insert_cost
+
+    def submit(self, clip_data, video_path, metadata, defer=True):
+        """
+        Planifie l'upload d'une vidéo. Retourne un Future (résultat : ID YouTube, ou None si aucune vidéo
+        n'a été créée ; lève UploadOutcomeUnknown si l'upload a commencé puis échoué),
+        ou None si le quota est insuffisant : l'upload est alors différé (fichier des uploads différés),
+        sauf avec defer=False où l'appelant le reprogramme lui-même (file de travaux partagée).
+        """
+        if not self.ledger.try_reserve(self.insert_cost):
+            if defer:
+                self._defer(clip_data, video_path, metadata)
+            return None
+        future = self._executor.submit(self._run_upload, clip_data, video_path, metadata)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard_future)
+        return future
+
+    def _discard_future(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _get_service(self):
+        service = getattr(self._thread_local, "service", None)
+        if service is None:
+            with self._auth_lock:
+                service = self.service_factory()
+            self._thread_local.service = service
+        return service
+
+    def _run_upload(self, clip_data, video_path, metadata):
+        import upload_youtube
+
+        clip_id = clip_data["id"]
+        try:
+            youtube_service = self._get_service()
+        except Exception as e:
+            print(f"❌ Erreur lors de l'authentification YouTube : {e}")
+            print(f"ℹ️ Upload du clip '{clip_id}' ignoré. Le quota réservé est libéré.")
+            self.ledger.release(self.insert_cost)
+            return None
+
+        sample = None
+        try:
+            with run_metrics.measure() as sample:
+                youtube_video_id = upload_youtube.upload_youtube_short(youtube_service, video_path, metadata)
+        except Exception as e:
+            # upload_youtube_short ne lève qu'après l'ouverture de la session résumable : la vidéo a peut-être
+            # été créée. Le quota reste compté et le clip n'est pas retenté (au plus une publication).
+            print(f"❌ Issue inconnue de l'upload YouTube du clip '{clip_id}' : {e}. "
+                  f"Vérifiez la chaîne ; le clip ne sera pas republié automatiquement.")
+            if self.on_outcome_unknown:
+                with self._lock:
+                    try:
+                        self.on_outcome_unknown(clip_data)
+                    except Exception as callback_error:
+                        print(f"❌ Erreur lors de l'enregistrement de l'issue inconnue du clip '{clip_id}' : {callback_error}")
+            raise UploadOutcomeUnknown(str(e)) from e
+        finally:
+            if sample is not None:
+                with self._lock:
+                    self.upload_samples[clip_id] = sample
+
+        if not youtube_video_id:
+            # Retour sans exception : aucune session résumable n'a été ouverte, aucune vidéo n'a été créée
+            print(f"❌ L'upload YouTube du clip '{clip_id}' a échoué avant tout envoi. Le quota réservé est libéré.")
+            self.ledger.release(self.insert_cost)
+            return None
+
+        print(f"🎉 Short YouTube publié avec succès ! Clip '{clip_id}' -> ID: {youtube_video_id}")
+        self._forget_deferred(clip_id)
+        if self.on_published:
+            with self._lock:
+                try:
+                    self.on_published(clip_data, youtube_video_id)
+                except Exception as e:
+                    print(f"❌ Erreur lors de l'enregistrement de la publication du clip '{clip_id}' : {e}")
+        return youtube_video_id
+
+    # --- Suivi ---
+    def pop_upload_sample(self, clip_id):
+        """Retourne (et oublie) les mesures de l'upload d'un clip, ou un dict vide."""
+        with self._lock:
+            return self.upload_samples.pop(clip_id, {})
+
+    def in_flight(self):
+        """Nombre d'uploads en attente ou en cours."""
+        with self._lock:
+            return len(self._futures)
+
+    def drain(self):
+        """Attend la fin de tous les uploads en cours."""
+        while True:
+            with self._lock:
+                pending = set(self._futures)
+            if not pending:
+                return
+            wait(pending)
+
+    def shutdown(self):
+        self.drain()
+        self._executor.shutdown(wait=True)
@@ -1,5 +1,9 @@
 # scripts/upload_youtube.py
 import os
+import time
+import random
+import http.client
+import httplib2
 import google_auth_oauthlib.flow
 import google.auth.transport.requests
 from googleapiclient.discovery import build
@@ -7,6 +11,8 @@ from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 import json
 
+import run_metrics
+
 # L'API scope nécessaire pour uploader des vidéos
 SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
 API_SERVICE_NAME = 'youtube'
@@ -19,16 +25,27 @@ CLIENT_SECRETS_FILE = 'client_secret.json' # Doit être au même niveau que le s
 # Le fichier token.json sera créé après la première authentification réussie
 TOKEN_FILE = 'token.json'
 
-def get_authenticated_service():
+# --- PARAMÈTRES DE L'UPLOAD RÉSUMABLE ---
+# Taille des morceaux envoyés (multiple de 256 Ko). Un morceau perdu est renvoyé seul.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Nombre de nouvelles tentatives (erreurs 5xx et coupures de connexion) avant d'abandonner.
+UPLOAD_MAX_RETRIES = 5
+# Délai de base du backoff exponentiel entre deux tentatives après une coupure de connexion.
+UPLOAD_RETRY_BASE_DELAY_SECONDS = 1.0
+# Erreurs de transport après lesquelles l'upload est repris là où il s'est arrêté.
+RETRIABLE_TRANSPORT_EXCEPTIONS = (httplib2.HttpLib2Error, http.client.HTTPException, OSError)
+
+def get_authenticated_service(token_file=TOKEN_FILE, client_secrets_file=CLIENT_SECRETS_FILE):
     """
     Authentifie l'utilisateur et retourne un objet de service YouTube.
     Gère le flux OAuth 2.0 et stocke les jetons d'accès.
+    token_file et client_secrets_file permettent d'utiliser les identifiants d'une autre chaîne (profils).
     """
     credentials = None
     # Charger les jetons d'accès existants s'ils sont disponibles
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'r') as token:
-            credentials = google.oauth2.credentials.Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+    if os.path.exists(token_file):
+        with open(token_file, 'r') as token:
+            credentials = google.oauth2.credentials.Credentials.from_authorized_user_file(token_file, SCOPES)
 
     # Si les jetons ne sont pas valides ou n'existent pas, lancer le flux d'authentification
     if not credentials or not credentials.valid:
@@ -38,7 +55,7 @@ def get_authenticated_service():
         else:
             print("🔑 Lancement du flux d'authentification YouTube...")
             flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
-                CLIENT_SECRETS_FILE, SCOPES)
+                client_secrets_file, SCOPES)
             flow.redirect_uri = "urn:ietf:wg:oauth:2.0:oob" # Pour les applications de bureau
 
             # Utilise un mode sans navigateur pour GitHub Actions si possible,
@@ -55,13 +72,13 @@ def get_authenticated_service():
             credentials = flow.credentials
 
         # Sauvegarder les jetons pour les exécutions futures
-        with open(TOKEN_FILE, 'w') as token:
+        with open(token_file, 'w') as token:
             token.write(credentials.to_json())
         print("✅ Jeton d'accès YouTube sauvegardé.")
 
     return build(API_SERVICE_NAME, API_VERSION, credentials=credentials)
 
-def upload_youtube_short(youtube_service, video_path, metadata):
+def upload_youtube_short(youtube_service, video_path, metadata, chunksize=UPLOAD_CHUNK_SIZE, num_retries=UPLOAD_MAX_RETRIES):
     """
     Uploade un fichier vidéo sur YouTube en tant que Short.
 
@@ -69,9 +86,15 @@ def upload_youtube_short(youtube_service, video_path, metadata):
         youtube_service: L'objet de service YouTube authentifié.
         video_path (str): Chemin vers le fichier vidéo à uploader.
         metadata (dict): Dictionnaire contenant le titre, la description, les tags, etc.
+        chunksize (int): Taille des morceaux de l'upload résumable (-1 pour un seul envoi).
+        num_retries (int): Nombre de nouvelles tentatives sur erreur 5xx ou coupure de connexion.
 
     Returns:
-        str: L'ID de la vidéo YouTube uploadée si succès, sinon None.
+        str: L'ID de la vidéo YouTube uploadée si succès, sinon None (aucune vidéo créée).
+
+    Raises:
+        Exception: Échec après l'ouverture de la session résumable. La vidéo a peut-être été créée
+            (ex : dernier morceau reçu mais réponse perdue) : l'appelant ne doit pas retenter l'upload.
     """
     print(f"📤 Démarrage de l'upload YouTube pour : {video_path}")
     if not os.path.exists(video_path):
@@ -110,8 +133,9 @@ def upload_youtube_short(youtube_service, video_path, metadata):
     # Le code ne vérifie pas le rapport ici, il faut s'assurer que le clip source est bien vertical
     # ou que le traitement vidéo le convertit. YouTube le détecte automatiquement comme Short.
 
-    media = MediaFileUpload(video_path, resumable=True)
+    media = MediaFileUpload(video_path, chunksize=chunksize, resumable=True)
 
+    request = None
     try:
         request = youtube_service.videos().insert(
             part="snippet,status",
@@ -119,17 +143,38 @@ def upload_youtube_short(youtube_service, video_path, metadata):
             media_body=media
         )
         response = None
+        transport_retries = 0
         while response is None:
-            status, response = request.next_chunk()
+            try:
+                # Une requête par morceau, plus l'ouverture de la session résumable au premier appel
+                # (les renvois internes de googleapiclient sur erreur 5xx ne sont pas comptés).
+                run_metrics.note(youtube_api_requests=2 if request.resumable_uri is None else 1)
+                # Les erreurs 5xx sont retentées par googleapiclient lui-même.
+                status, response = request.next_chunk(num_retries=num_retries)
+            except RETRIABLE_TRANSPORT_EXCEPTIONS as e:
+                # Coupure de connexion : le prochain next_chunk() interroge le serveur
+                # sur les octets déjà reçus et reprend l'upload à partir de là.
+                transport_retries += 1
+                if transport_retries > num_retries:
+                    raise
+                delay = UPLOAD_RETRY_BASE_DELAY_SECONDS * random.random() * 2 ** transport_retries
+                print(f"⚠️ Connexion interrompue pendant l'upload ({e}). Nouvelle tentative {transport_retries}/{num_retries} dans {delay:.1f}s...")
+                time.sleep(delay)
+                continue
             if status:
-                print(f"Progression de l'upload : {int(status.resumable_progress * 100)}%")
+                print(f"Progression de l'upload : {int(status.progress() * 100)}%")
         
         video_id = response.get('id')
+        if not video_id:
+            raise RuntimeError(f"réponse de l'upload sans ID de vidéo : {response}")
+        run_metrics.note(bytes=os.path.getsize(video_path))
         print(f"✅ Vidéo uploadée avec succès ! ID de la vidéo : {video_id}")
         print(f"Lien : https://youtu.be/{video_id}")
         return video_id
 
     except HttpError as e:
+        if request is not None and request.resumable_uri is not None:
+            raise # Session ouverte : des octets ont été envoyés, l'issue est inconnue
         error_details = json.loads(e.content.decode('utf-8'))
         print(f"❌ Erreur lors de l'upload YouTube (HttpError) : {e}")
         print(f"Détails de l'erreur API : {error_details}")
@@ -139,6 +184,8 @@ def upload_youtube_short(youtube_service, video_path, metadata):
                 print(f"  Message: {err.get('message')}")
         return None
     except Exception as e:
+        if request is not None and request.resumable_uri is not None:
+            raise
         print(f"❌ Une erreur inattendue est survenue lors de l'upload : {e}")
         return None
 
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Les modules du bot sont importés comme dans main.py (répertoire 'scripts' dans le PYTHONPATH)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
@@ -0,0 +1,37 @@
+# tests/test_candidate_table.py
+import candidate_table
+
+
+def make_table(*clips):
+    table = candidate_table.CandidateTable()
+    rows = [table.append_helix(dict({"language": "fr", "duration": 30.0}, **clip)) for clip in clips]
+    return table, rows
+
+
+def test_rank_orders_by_views_with_arrival_breaking_ties():
+    table, rows = make_table({"id": "a", "view_count": 10}, {"id": "b", "view_count": 30},
+                             {"id": "c", "view_count": 10}, {"id": "d", "view_count": 20})
+    assert [table.ids[row] for row in table.rank(rows)] == ["b", "d", "a", "c"]
+
+
+def test_select_follows_the_given_positions_without_resorting():
+    table, rows = make_table({"id": "a", "view_count": 30}, {"id": "b", "view_count": 20}, {"id": "c", "view_count": 10})
+    ranked = table.view(table.rank(rows))
+    selected = ranked.select([2, 0])
+    assert [clip["id"] for clip in selected] == ["c", "a"]
+    # Les marques de repli suivent la ligne, y compris après une nouvelle sélection
+    marked = ranked.select([0, 2, 1], duplicate_of={1: "a"})
+    assert [clip.get("duplicate_of") for clip in marked.select([2, 0])] == ["a", None]
+
+
+def test_eligible_rows_and_row_round_trip():
+    table, rows = make_table({"id": "fr-ok", "view_count": 5, "video_id": "v1", "vod_offset": 12,
+                              "url": "https://clips.twitch.tv/fr-ok"},
+                             {"id": "en", "view_count": 5, "language": "en"},
+                             {"id": "trop-court", "view_count": 5, "duration": 3.0})
+    assert table.eligible_rows(rows, "fr", 15, 180) == [0]
+    clip = table.row(0)
+    assert clip["url"] == "https://clips.twitch.tv/fr-ok" and 0 not in table._urls # Lien canonique non stocké
+    assert (clip["video_id"], clip["vod_offset"]) == ("v1", 12)
+    assert table.interval(0) == (12.0, 42.0)
+    assert table.interval(1) is None
@@ -0,0 +1,49 @@
+# tests/test_clip_checkpoint.py
+import json
+from datetime import datetime, timedelta
+
+import clip_checkpoint
+
+
+def write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_resume_stage_falls_back_when_artifacts_change(tmp_path):
+    checkpoints = clip_checkpoint.ClipCheckpoints(str(tmp_path))
+    raw = write(tmp_path / "raw.mp4", 100)
+    video = write(tmp_path / "video.mp4", 50)
+    checkpoints.save("c1", "downloaded", raw_path=raw)
+    record = checkpoints.save("c1", "metadata", video_path=video, metadata={"title": "t"})
+    assert (record["raw_size"], record["video_size"]) == (100, 50)
+    assert checkpoints.resume_stage(checkpoints.load("c1")) == "metadata"
+
+    write(tmp_path / "video.mp4", 49) # Rendu tronqué : la taille ne correspond plus
+    assert checkpoints.resume_stage(checkpoints.load("c1")) == "downloaded"
+    assert checkpoints.artifact_paths(checkpoints.load("c1")) == [raw]
+
+    (tmp_path / "raw.mp4").unlink()
+    assert checkpoints.resume_stage(checkpoints.load("c1")) == "selected"
+    assert checkpoints.artifact_paths(checkpoints.load("c1")) == []
+
+
+def test_uploaded_clip_resumes_as_uploaded_without_files(tmp_path):
+    checkpoints = clip_checkpoint.ClipCheckpoints(str(tmp_path))
+    record = checkpoints.save("c1", "uploaded", youtube_video_id="yt")
+    assert checkpoints.reached(record, "rendered")
+    assert checkpoints.resume_stage(record) == "uploaded"
+
+
+def test_load_all_drops_expired_and_unreadable_records(tmp_path):
+    checkpoints = clip_checkpoint.ClipCheckpoints(str(tmp_path), max_age_hours=48)
+    checkpoints.save("recent", "selected")
+    old = checkpoints.save("ancien", "selected")
+    old["created_at"] = (datetime.now() - timedelta(hours=49)).isoformat()
+    with open(checkpoints.path_for("ancien"), 'w', encoding='utf-8') as f:
+        json.dump(old, f)
+    with open(checkpoints.path_for("casse"), 'w', encoding='utf-8') as f:
+        f.write("{")
+    assert [record["clip_id"] for record in checkpoints.load_all()] == ["recent"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clip_state_recent.json"]
@@ -0,0 +1,38 @@
+# tests/test_daemon.py
+import threading
+
+import daemon
+
+
+class FakePipeline:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def make_daemon(tmp_path):
+    return daemon.ShortsDaemon(collect=lambda started_after: [], make_prepare_pipeline=lambda target: None,
+                               publish=lambda job: None, is_published=lambda clip_id: False,
+                               control_dir=str(tmp_path))
+
+
+def test_stop_never_waits_for_the_daemon_lock(tmp_path):
+    shorts_daemon = make_daemon(tmp_path)
+    # Signal reçu pendant que le thread principal tient le verrou (status(), _slot_reached...)
+    with shorts_daemon._lock:
+        stopper = threading.Thread(target=shorts_daemon.stop)
+        stopper.start()
+        stopper.join(timeout=2)
+        assert not stopper.is_alive()
+    assert shorts_daemon._stop.is_set() and shorts_daemon._wake.is_set()
+
+
+def test_run_cancels_the_current_preparation_once_stopped(tmp_path):
+    shorts_daemon = make_daemon(tmp_path)
+    preparation = FakePipeline()
+    shorts_daemon._current_pipeline = preparation
+    shorts_daemon.stop()
+    assert not preparation.cancelled # Le gestionnaire de signal n'annule rien lui-même
+    shorts_daemon._cancel_preparation()
+    assert preparation.cancelled
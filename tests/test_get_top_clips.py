@@ -0,0 +1,90 @@
+# tests/test_get_top_clips.py
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import get_top_clips
+import profiles
+
+ONE_DAY = (datetime(2026, 1, 14, tzinfo=timezone.utc), datetime(2026, 1, 15, tzinfo=timezone.utc))
+
+
+class ConcurrencyProbe:
+    """Faux request_clips qui compte les requêtes Helix en vol au même moment."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, access_token, params, source_type, source_id):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append(source_id)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return [{"id": f"{source_id}-clip", "view_count": 10, "broadcaster_id": source_id, "game_id": "g",
+                 "language": "fr", "duration": 30.0, "created_at": "2026-01-15T12:00:00Z"}]
+
+
+def test_default_window_queries_several_sources_at_once(monkeypatch):
+    probe = ConcurrencyProbe()
+    monkeypatch.setattr(get_top_clips, "request_clips", probe)
+    monkeypatch.setattr(get_top_clips, "BROADCASTER_IDS", [f"b{i}" for i in range(6)])
+    monkeypatch.setattr(get_top_clips, "GAME_IDS", [])
+    assert len(get_top_clips.time_slices(*ONE_DAY)) == 1 # Fenêtre par défaut : une seule tranche par source
+    clips = get_top_clips.get_eligible_short_clips("token", days_ago=1)
+    assert len(clips) == 6 and len(probe.calls) == 6
+    assert probe.max_active > 1
+
+
+def test_profiles_collection_queries_several_sources_at_once(tmp_path, monkeypatch):
+    probe = ConcurrencyProbe()
+    monkeypatch.setattr(get_top_clips, "request_clips", probe)
+    profile = profiles.ChannelProfile("fr", str(tmp_path), broadcaster_ids=[f"b{i}" for i in range(6)], game_ids=[])
+    ranked = profiles.collect_for_profiles("token", [profile], histories={"fr": set()}, days_ago=1)
+    assert len(ranked["fr"]) == 6
+    assert probe.max_active > 1
+
+
+def test_prefetch_keeps_plan_order_and_cancels_unconsumed_requests(monkeypatch):
+    release = threading.Event()
+    started = []
+
+    def slow_request(access_token, params, source_type, source_id):
+        started.append(source_id)
+        release.wait(5)
+        return []
+
+    planned = [("broadcaster_id", f"b{i}", {}, False) for i in range(5)]
+    monkeypatch.setattr(get_top_clips, "request_clips", slow_request)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        sources = get_top_clips.prefetch_sources(executor, "token", planned, [ONE_DAY], lookahead=3)
+        assert next(sources)[1] == "b0"
+        sources.close() # b1 et b2, soumises à l'avance, ne sont jamais lancées
+        release.set()
+    assert started == ["b0"]
+
+
+
+def test_collection_stops_once_remaining_sources_cannot_beat_the_candidates(tmp_path, monkeypatch):
+    import source_stats
+    probe = ConcurrencyProbe(delay=0)
+    monkeypatch.setattr(get_top_clips, "request_clips", probe)
+    monkeypatch.setattr(get_top_clips, "BROADCASTER_IDS", ["b0", "b1", "b2"])
+    monkeypatch.setattr(get_top_clips, "GAME_IDS", [])
+    monkeypatch.setattr(source_stats, "ENOUGH_CANDIDATES", 1)
+    stats = source_stats.SourceStats(str(tmp_path / "stats.json"))
+    known = {"runs": 5, "fetched": 10, "eligible": 10, "top": 1, "published": 0}
+    stats.sources = {"broadcaster_id:b0": dict(known, best_views=1000),
+                     "broadcaster_id:b1": dict(known, best_views=5), # Ne battrait pas les 10 vues de b0
+                     "broadcaster_id:b2": dict(known, best_views=2)}
+    clips = get_top_clips.get_eligible_short_clips("token", source_stats=stats)
+    assert [clip["id"] for clip in clips] == ["b0-clip"]
+    assert stats.should_stop(("broadcaster_id", "b1"), iter([10, 3]))
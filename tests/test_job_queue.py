@@ -0,0 +1,120 @@
+# tests/test_job_queue.py
+import types
+
+import pytest
+
+import job_queue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge de la file contrôlée par le test (baux et délais)."""
+    now = types.SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(job_queue, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def queue_db(tmp_path, clock):
+    return job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=60, max_attempts=2)
+
+
+def test_enqueue_is_idempotent_and_lease_follows_priority(queue_db):
+    assert queue_db.enqueue("a", {"id": "a"}, priority=1)
+    assert queue_db.enqueue("b", {"id": "b"}, priority=5)
+    assert not queue_db.enqueue("a", {"id": "a"}, priority=9)
+    assert queue_db.lease("w1") == ("b", {"id": "b"})
+    assert queue_db.lease("w2") == ("a", {"id": "a"})
+    assert queue_db.lease("w3") is None
+
+
+def test_expired_lease_is_reclaimed_and_old_holder_cannot_publish(queue_db, clock):
+    queue_db.enqueue("a", {"id": "a"})
+    queue_db.lease("w1")
+    clock.value += 30
+    assert queue_db.heartbeat("a", "w1") # Renouvelé jusqu'à +90 s
+    clock.value += 50
+    assert queue_db.lease("w2") is None # Bail toujours valide
+    clock.value += 20
+    assert queue_db.lease("w2") == ("a", {"id": "a"})
+    assert not queue_db.heartbeat("a", "w1")
+    assert not queue_db.begin_publish("a", "w1")
+    assert queue_db.begin_publish("a", "w2")
+
+
+def test_publishing_clip_is_never_reclaimed(queue_db, clock):
+    queue_db.enqueue("a", {"id": "a"})
+    queue_db.lease("w1")
+    assert queue_db.begin_publish("a", "w1")
+    clock.value += 3600 # Le worker est mort pendant l'upload
+    assert queue_db.lease("w2") is None
+    assert [job["clip_id"] for job in queue_db.stale_publishing()] == ["a"]
+    assert not queue_db.has_pending()
+
+
+def test_failures_requeue_until_max_attempts(queue_db):
+    queue_db.enqueue("a", {"id": "a"})
+    queue_db.lease("w1")
+    queue_db.fail("a", "w1", "rendu raté")
+    assert queue_db.counts() == {"queued": 1}
+    queue_db.lease("w1")
+    queue_db.fail("a", "w1", "rendu raté")
+    assert queue_db.counts() == {"failed": 1}
+
+
+def test_release_from_publishing_waits_for_the_delay(queue_db, clock):
+    queue_db.enqueue("a", {"id": "a"})
+    queue_db.lease("w1")
+    queue_db.begin_publish("a", "w1")
+    assert queue_db.release("a", "w1", delay_seconds=600) # Upload refusé faute de quota, rien d'envoyé
+    assert queue_db.lease("w2") is None
+    clock.value += 601
+    assert queue_db.lease("w2") == ("a", {"id": "a"})
+    assert queue_db.jobs()[0]["attempts"] == 1 # Le report ne compte pas comme une tentative
+
+
+def test_worker_outcomes(queue_db, monkeypatch):
+    monkeypatch.setattr(job_queue, "POLL_SECONDS", 0)
+    for priority, clip_id in enumerate(("refusé", "inconnu", "quota", "ok")):
+        queue_db.enqueue(clip_id, {"id": clip_id}, priority=priority)
+
+    def publish(clip, prepared):
+        if clip["id"] == "inconnu":
+            raise RuntimeError("réponse perdue après le dernier morceau")
+        return {"ok": "yt-ok", "refusé": None, "quota": job_queue.DEFERRED}[clip["id"]]
+
+    published = job_queue.run_worker(queue_db, prepare=lambda clip: {"video": clip["id"]}, publish=publish,
+                                     worker_id="w1", max_jobs=4)
+    assert published == 1
+    states = {job["clip_id"]: job["state"] for job in queue_db.jobs()}
+    assert states == {"ok": "done", "refusé": "queued", "quota": "queued", "inconnu": "publishing"}
+    assert queue_db.lease("w2") == ("refusé", {"id": "refusé"}) # Le clip différé attend QUOTA_RETRY_SECONDS
+
+
+def test_fail_from_a_lost_lease_leaves_the_new_holder_alone(queue_db, clock):
+    queue_db.enqueue("a", {"id": "a"})
+    queue_db.lease("w1")
+    clock.value += 61
+    assert queue_db.lease("w2") == ("a", {"id": "a"}) # Bail de w1 expiré et repris
+    assert not queue_db.fail("a", "w1", "rendu raté")
+    assert queue_db.jobs()[0]["state"] == "leased" and queue_db.jobs()[0]["worker_id"] == "w2"
+
+
+def test_worker_exits_when_only_delayed_clips_remain(queue_db, clock):
+    queue_db.enqueue("a", {"id": "a"})
+    queue_db.lease("w1")
+    queue_db.release("a", "w1", delay_seconds=600)
+    assert not queue_db.has_pending() and queue_db.delayed_count() == 1
+    prepared = []
+    published = job_queue.run_worker(queue_db, prepare=prepared.append, publish=lambda clip, job: None, worker_id="w2")
+    assert published == 0 and prepared == []
+    clock.value += 601
+    assert queue_db.has_pending()
+
+
+def test_worker_does_not_lease_without_quota(queue_db):
+    queue_db.enqueue("a", {"id": "a"})
+    published = job_queue.run_worker(queue_db, prepare=lambda clip: clip, publish=lambda clip, job: "yt",
+                                     worker_id="w1", can_publish=lambda: False)
+    assert published == 0
+    assert queue_db.jobs()[0]["state"] == "queued" and queue_db.jobs()[0]["attempts"] == 0
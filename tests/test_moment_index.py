@@ -0,0 +1,31 @@
+# tests/test_moment_index.py
+import moment_index
+
+
+def clip(clip_id, views, video_id="v1", vod_offset=0, duration=30.0):
+    return {"id": clip_id, "viewer_count": views, "video_id": video_id, "vod_offset": vod_offset, "duration": duration}
+
+
+def test_overlapping_clips_of_one_vod_keep_the_most_viewed():
+    clips = [clip("a", 100, vod_offset=100), clip("b", 300, vod_offset=110), clip("c", 200, vod_offset=95)]
+    assert [c["id"] for c in moment_index.collapse_same_moments(clips)] == ["b"]
+
+
+def test_small_overlap_other_vod_and_missing_vod_are_kept():
+    clips = [clip("a", 100, vod_offset=100),
+             clip("chevauche-peu", 50, vod_offset=120), # 10 s communes sur 30 : moins de MIN_OVERLAP_RATIO
+             clip("autre-vod", 50, video_id="v2", vod_offset=100),
+             clip("sans-vod", 50, video_id="", vod_offset=None),
+             clip("sans-offset", 50, vod_offset=None)]
+    assert [c["id"] for c in moment_index.collapse_same_moments(clips)] == [c["id"] for c in clips]
+
+
+def test_short_clip_inside_a_long_one_is_the_same_moment():
+    index = moment_index.MomentIndex()
+    assert index.offer(clip("long", 500, vod_offset=0, duration=120.0))
+    assert not index.offer(clip("extrait", 100, vod_offset=60, duration=10.0))
+    assert index.collapsed == 1
+    # Un clip plus vu remplace tous les clips gardés qu'il double, en gardant l'ordre d'offre
+    assert index.offer(clip("tardif", 50, vod_offset=500))
+    assert index.offer(clip("meilleur", 900, vod_offset=30, duration=20.0))
+    assert [c["id"] for c in index.clips()] == ["tardif", "meilleur"]
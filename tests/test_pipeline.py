@@ -0,0 +1,57 @@
+# tests/test_pipeline.py
+import multiprocessing
+import threading
+import time
+
+import pipeline
+
+
+def test_stops_once_target_is_reached():
+    produced = []
+
+    def source():
+        for n in range(100):
+            produced.append(n)
+            yield n
+
+    clip_pipeline = pipeline.Pipeline(
+        stages=[pipeline.Stage("double", lambda n: n * 2, workers=2), pipeline.Stage("publish", lambda n: n)],
+        target_successes=3, queue_size=1, lookahead=1)
+    results = clip_pipeline.run(source())
+    assert len(results) == 3
+    # Admission bornée : au plus l'objectif plus le travail spéculatif est tiré de la source
+    assert len(produced) <= 3 + 1 + 1
+
+
+def test_failed_items_are_dropped_and_replaced():
+    dropped = []
+    clip_pipeline = pipeline.Pipeline(
+        stages=[pipeline.Stage("render", lambda n: None if n % 2 else n)],
+        target_successes=2, lookahead=0, on_drop=lambda stage, item: dropped.append(item))
+    assert sorted(clip_pipeline.run(iter(range(10)))) == [0, 2]
+    assert dropped == [1]
+
+
+def test_cancel_terminates_only_its_own_processes():
+    # Processus étranger au pipeline (ex : autre pipeline, démon) : il doit survivre à l'annulation
+    bystander = multiprocessing.get_context("spawn").Process(target=time.sleep, args=(60,))
+    bystander.start()
+    clip_pipeline = pipeline.Pipeline(
+        stages=[pipeline.Stage("render", time.sleep, use_processes=True)], target_successes=1, lookahead=0)
+    runner = threading.Thread(target=clip_pipeline.run, args=([60],))
+    try:
+        runner.start()
+        deadline = time.monotonic() + 30
+        stage = clip_pipeline.stages[0]
+        while time.monotonic() < deadline and not (stage.executor and stage.executor._processes):
+            time.sleep(0.05)
+        time.sleep(0.5) # Le rendu de 60 s est en cours dans le pool
+        started = time.monotonic()
+        clip_pipeline.cancel()
+        runner.join(timeout=30)
+        assert not runner.is_alive()
+        assert time.monotonic() - started < 30 # Le rendu a été interrompu, pas attendu
+        assert bystander.is_alive()
+    finally:
+        bystander.terminate()
+        bystander.join()
@@ -0,0 +1,69 @@
+# tests/test_profiles.py
+import candidate_table
+import get_top_clips
+import profiles
+
+
+def helix_clip(clip_id, views, broadcaster_id="b1", game_id="g1", language="fr", duration=30.0,
+               video_id="", vod_offset=None):
+    return {"id": clip_id, "url": f"https://clips.twitch.tv/{clip_id}", "embed_url": f"https://clips.twitch.tv/embed?clip={clip_id}",
+            "thumbnail_url": None, "title": clip_id, "view_count": views, "broadcaster_id": broadcaster_id,
+            "broadcaster_name": broadcaster_id, "game_id": game_id, "game_name": game_id, "language": language,
+            "created_at": "2026-01-15T12:00:00Z", "duration": duration, "video_id": video_id, "vod_offset": vod_offset}
+
+
+def test_collect_for_profiles_shares_sources_and_filters_per_profile(tmp_path, monkeypatch):
+    responses = {
+        ("broadcaster_id", "b1"): [helix_clip("fr-top", 900), helix_clip("en-top", 800, language="en"),
+                                   helix_clip("trop-long", 700, duration=400.0), helix_clip("deja-publie", 600)],
+        ("game_id", "g1"): [helix_clip("moment-a", 500, broadcaster_id="b2", video_id="v1", vod_offset=100),
+                            helix_clip("moment-b", 400, broadcaster_id="b2", video_id="v1", vod_offset=105),
+                            helix_clip("fr-top", 900)],
+    }
+    calls = []
+
+    def fake_request(access_token, params, source_type, source_id):
+        calls.append((source_type, source_id, params.get("language")))
+        return responses[(source_type, source_id)]
+
+    monkeypatch.setattr(get_top_clips, "request_clips", fake_request)
+    french = profiles.ChannelProfile("fr", str(tmp_path), language="fr", broadcaster_ids=["b1"], game_ids=["g1"])
+    english = profiles.ChannelProfile("en", str(tmp_path), language="en", broadcaster_ids=["b1"], game_ids=[])
+    ranked = profiles.collect_for_profiles("token", [french, english],
+                                           histories={"fr": {"deja-publie"}, "en": set()})
+
+    # La source commune à deux profils de langues différentes n'est interrogée qu'une fois, sans filtre de langue
+    assert sorted(calls) == [("broadcaster_id", "b1", None), ("game_id", "g1", "fr")]
+    assert isinstance(ranked["fr"], candidate_table.CandidateList)
+    # Même moment d'une VOD : seul le clip le plus vu est gardé ; clip vu deux fois gardé une fois
+    assert [clip["id"] for clip in ranked["fr"]] == ["fr-top", "moment-a"]
+    assert [clip["id"] for clip in ranked["en"]] == ["en-top"]
+
+
+def test_collect_for_profiles_records_source_stats(tmp_path, monkeypatch):
+    import source_stats
+    monkeypatch.setattr(get_top_clips, "request_clips",
+                        lambda access_token, params, source_type, source_id: [helix_clip(f"{source_id}-1", 50)])
+    stats = source_stats.SourceStats(str(tmp_path / "stats.json"))
+    profile = profiles.ChannelProfile("fr", str(tmp_path), broadcaster_ids=["b1"], game_ids=[])
+    ranked = profiles.collect_for_profiles("token", [profile], histories={"fr": set()}, source_stats=stats)
+    assert [clip["id"] for clip in ranked["fr"]] == ["b1-1"]
+    assert stats.sources["broadcaster_id:b1"]["runs"] == 1
+    assert stats.sources["broadcaster_id:b1"]["top"] == 1
+
+
+def test_fan_out_uses_visual_duplicate_only_when_original_is_not_published(tmp_path):
+    profile = profiles.ChannelProfile("fr", str(tmp_path), broadcaster_ids=["b1"], clips_to_publish=2)
+    ranked = {"fr": [{"id": "a"}, {"id": "a-copie", "duplicate_of": "a"}]}
+
+    failed = profiles.FanOutAssigner([profile], ranked)
+    items = failed.items()
+    assert next(items)["clip"]["id"] == "a"
+    failed.finish("a", [])
+    assert next(items)["clip"]["id"] == "a-copie" # L'original a échoué : son doublon le remplace
+
+    published = profiles.FanOutAssigner([profile], ranked)
+    items = published.items()
+    assert next(items)["clip"]["id"] == "a"
+    published.finish("a", ["fr"])
+    assert list(items) == [] # L'original est publié : son doublon n'est jamais produit
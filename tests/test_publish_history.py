@@ -0,0 +1,49 @@
+# tests/test_publish_history.py
+import json
+from datetime import date, timedelta
+
+import publish_history
+
+
+def test_add_lookup_and_persistence(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    history = publish_history.PublishHistory(path)
+    history.add("a", "yt-a")
+    history.add("a", "yt-autre") # Sans effet : déjà publié
+    assert "a" in history and "b" not in history
+    assert history.published_on() == ["a"]
+    history.close()
+    reopened = publish_history.PublishHistory(path)
+    assert "a" in reopened and len(reopened) == 1
+    reopened.close()
+
+
+def test_compact_removes_entries_past_retention(tmp_path):
+    history = publish_history.PublishHistory(str(tmp_path / "history.sqlite3"), retention_days=30)
+    history.add("recent", "yt-1")
+    old_day = (date.today() - timedelta(days=31)).isoformat()
+    with history._conn:
+        history._conn.execute("INSERT INTO published VALUES ('ancien', 'yt-2', ?, ?)", (old_day, f"{old_day}T12:00:00"))
+    history._ids.add("ancien")
+    assert history.compact() == 1
+    assert "ancien" not in history and "recent" in history
+    history.close()
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps({"2026-01-01": [{"twitch_clip_id": "a", "youtube_short_id": "yt-a"}]}))
+    history = publish_history.PublishHistory(str(tmp_path / "history.sqlite3"), legacy_json_path=str(legacy))
+    assert "a" in history
+    assert not legacy.exists() and (tmp_path / "history.json.migrated").exists()
+    history.close()
+
+
+def test_shared_history_does_not_use_wal(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    local = publish_history.PublishHistory(path)
+    assert local._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    local.close()
+    shared = publish_history.PublishHistory(path, shared=True)
+    assert shared._conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    shared.close()
@@ -0,0 +1,79 @@
+# tests/test_stage_profiler.py
+import pstats
+import threading
+import time
+
+import pytest
+
+import stage_profiler
+
+requires_cprofile = pytest.mark.skipif(not stage_profiler.CPROFILE_PER_THREAD,
+                                       reason="un seul profileur actif par processus à partir de Python 3.12")
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_disabled_profiling_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.delenv(stage_profiler.PROFILE_ENV_VAR, raising=False)
+    artifact = str(tmp_path / "clip.mp4")
+    with stage_profiler.section("render", artifact):
+        pass
+    assert list(tmp_path.iterdir()) == []
+
+
+@requires_cprofile
+def test_nested_sections_write_profiles_and_collapsed_stacks(tmp_path, monkeypatch):
+    monkeypatch.setenv(stage_profiler.PROFILE_ENV_VAR, "1")
+    artifact = str(tmp_path / "clip.mp4")
+    with stage_profiler.section("render", artifact):
+        with stage_profiler.section("encode", artifact):
+            busy(0.05)
+    render_prof, render_collapsed = stage_profiler.profile_paths(artifact, "render")
+    encode_prof, _ = stage_profiler.profile_paths(artifact, "encode")
+    # Le profil de la section englobante inclut celui de la section imbriquée
+    functions = {name for _, _, name in pstats.Stats(render_prof).stats}
+    assert "busy" in functions and "busy" in {name for _, _, name in pstats.Stats(encode_prof).stats}
+    with open(render_collapsed, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy (test_stage_profiler.py" in line for line in lines)
+
+
+@requires_cprofile
+def test_call_profiles_next_to_the_item_artifact(tmp_path, monkeypatch):
+    monkeypatch.setenv(stage_profiler.PROFILE_ENV_VAR, "1")
+    result = stage_profiler.call("download", lambda item: item["n"] * 2, lambda item: str(tmp_path / "a.mp4"), {"n": 21})
+    assert result == 42
+    assert (tmp_path / "a.download.prof").exists()
+
+
+def test_concurrent_sections_sample_only_without_cprofile_per_thread(tmp_path, monkeypatch):
+    monkeypatch.setenv(stage_profiler.PROFILE_ENV_VAR, "1")
+    monkeypatch.setattr(stage_profiler, "CPROFILE_PER_THREAD", False)
+    artifacts = [str(tmp_path / f"clip{i}.mp4") for i in range(2)]
+    errors = []
+
+    def work(artifact):
+        try:
+            with stage_profiler.section("render", artifact):
+                with stage_profiler.section("encode", artifact):
+                    busy(0.05)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(artifact,)) for artifact in artifacts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    for artifact in artifacts:
+        for name in ("render", "encode"):
+            prof_path, collapsed_path = stage_profiler.profile_paths(artifact, name)
+            assert not (tmp_path / prof_path).exists()
+            with open(collapsed_path, encoding='utf-8') as f:
+                assert "busy (test_stage_profiler.py" in f.read()
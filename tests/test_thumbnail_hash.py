@@ -0,0 +1,55 @@
+# tests/test_thumbnail_hash.py
+import numpy as np
+import pytest
+
+import candidate_table
+import thumbnail_hash
+
+
+def gradient(seed):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 255, (thumbnail_hash.DCT_SIZE, thumbnail_hash.DCT_SIZE))
+
+
+def test_hamming_threshold_separates_near_copies_from_other_images():
+    image = gradient(1)
+    noisy = np.clip(image + np.random.default_rng(2).normal(0, 2, image.shape), 0, 255)
+    reference = np.array([thumbnail_hash.dct_hash(image)], dtype=np.uint64)
+    assert thumbnail_hash.hamming_distances(reference, thumbnail_hash.dct_hash(image))[0] == 0
+    assert thumbnail_hash.hamming_distances(reference, thumbnail_hash.dct_hash(noisy))[0] <= thumbnail_hash.MAX_HAMMING_DISTANCE
+    assert thumbnail_hash.hamming_distances(reference, thumbnail_hash.dct_hash(gradient(3)))[0] > thumbnail_hash.MAX_HAMMING_DISTANCE
+
+
+def test_hamming_distances_counts_differing_bits():
+    hashes = np.array([0, 0b1011, 2**64 - 1], dtype=np.uint64)
+    assert thumbnail_hash.hamming_distances(hashes, 0).tolist() == [0, 3, 64]
+
+
+@pytest.fixture
+def deduplicator(tmp_path, monkeypatch):
+    hashes = {"a": 0, "a-copie": 0b11, "b": 2**40 - 1, "deja-vu": 2**64 - 1, "c": 2**20 - 1}
+    monkeypatch.setattr(thumbnail_hash.ThumbnailDeduplicator, "_fetch_hash",
+                        lambda self, clip: hashes.get(clip["id"]))
+    dedup = thumbnail_hash.ThumbnailDeduplicator(str(tmp_path / "hashes.json"))
+    dedup.hashes["publie"] = {"hash": f"{2**64 - 2:016x}", "at": "2026-01-15T00:00:00"}
+    return dedup
+
+
+def test_filter_drops_published_duplicates_and_keeps_candidate_duplicates_as_fallbacks(deduplicator):
+    ranked = [{"id": clip_id} for clip_id in ("a", "a-copie", "deja-vu", "b", "c")]
+    filtered = deduplicator.filter(ranked, already_published_clip_ids={"publie"})
+    # 'deja-vu' double un clip publié : écarté ; 'a-copie' double 'a', pas encore publié : repoussé en fin
+    assert [clip["id"] for clip in filtered] == ["a", "b", "c", "a-copie"]
+    assert filtered[-1]["duplicate_of"] == "a"
+    assert not thumbnail_hash.superseded(filtered[-1], set())
+    assert thumbnail_hash.superseded(filtered[-1], {"a"})
+
+
+def test_filter_keeps_candidate_list_rows_and_marks_fallbacks(deduplicator):
+    table = candidate_table.CandidateTable()
+    rows = [table.append_helix({"id": clip_id, "view_count": views, "language": "fr", "duration": 30.0})
+            for clip_id, views in (("a", 90), ("a-copie", 80), ("b", 70))]
+    filtered = deduplicator.filter(table.view(rows))
+    assert isinstance(filtered, candidate_table.CandidateList)
+    assert filtered.rows == [0, 2, 1]
+    assert [clip.get("duplicate_of") for clip in filtered] == [None, None, "a"]
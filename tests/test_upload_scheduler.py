@@ -0,0 +1,104 @@
+# tests/test_upload_scheduler.py
+import sys
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+import upload_scheduler
+
+
+class _Clock:
+    """Remplace datetime dans upload_scheduler : now(tz) retourne l'instant UTC choisi, converti dans tz."""
+
+    def __init__(self, utc):
+        self.utc = utc
+
+    def now(self, tz=None):
+        return self.utc.astimezone(tz) if tz else self.utc
+
+    def isoformat(self):
+        return self.utc.isoformat()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock(datetime(2026, 1, 15, 7, 59, tzinfo=timezone.utc)) # 23:59 le 14 janvier, heure du Pacifique
+    monkeypatch.setattr(upload_scheduler, "datetime", fake)
+    return fake
+
+
+def test_ledger_rolls_over_at_pacific_midnight(tmp_path, clock):
+    ledger = upload_scheduler.QuotaLedger(str(tmp_path / "ledger.json"), daily_quota=3200)
+    assert ledger.try_reserve(1600)
+    assert ledger.try_reserve(1600)
+    assert not ledger.try_reserve(1600)
+    assert ledger.remaining() == 0
+
+    clock.utc = datetime(2026, 1, 15, 8, 1, tzinfo=timezone.utc) # 00:01 le 15 janvier, heure du Pacifique
+    assert ledger.remaining() == 3200
+    assert ledger.try_reserve(1600)
+
+
+def test_ledger_keeps_usage_of_the_same_day_only(tmp_path, clock):
+    path = str(tmp_path / "ledger.json")
+    upload_scheduler.QuotaLedger(path).try_reserve(1600)
+    assert upload_scheduler.QuotaLedger(path).remaining() == upload_scheduler.YOUTUBE_DAILY_QUOTA_UNITS - 1600
+
+    clock.utc = datetime(2026, 1, 16, 12, 0, tzinfo=timezone.utc)
+    assert upload_scheduler.QuotaLedger(path).remaining() == upload_scheduler.YOUTUBE_DAILY_QUOTA_UNITS
+
+
+def test_ledger_shared_by_several_processes_is_never_undercounted(tmp_path, clock):
+    # Deux workers ouverts en même temps sur le même data/ : chacun relit le registre à chaque réservation
+    path = str(tmp_path / "ledger.json")
+    first = upload_scheduler.QuotaLedger(path, daily_quota=4800)
+    second = upload_scheduler.QuotaLedger(path, daily_quota=4800)
+    assert first.try_reserve(1600)
+    assert second.try_reserve(1600)
+    assert first.try_reserve(1600)
+    assert not second.try_reserve(1600)
+    assert second.remaining() == 0
+    first.release(1600)
+    assert second.remaining() == 1600
+
+
+@pytest.fixture
+def fake_uploader(monkeypatch):
+    """Faux module upload_youtube : le comportement de l'upload dépend du titre des métadonnées."""
+    def upload_youtube_short(service, video_path, metadata):
+        if metadata["title"] == "perdu":
+            raise OSError("dernier morceau envoyé, réponse perdue")
+        return None if metadata["title"] == "refusé" else f"yt-{metadata['title']}"
+    monkeypatch.setitem(sys.modules, "upload_youtube", types.SimpleNamespace(upload_youtube_short=upload_youtube_short))
+
+
+def make_scheduler(tmp_path, **kwargs):
+    ledger = upload_scheduler.QuotaLedger(str(tmp_path / "ledger.json"))
+    return upload_scheduler.UploadScheduler(lambda: object(), ledger, str(tmp_path / "deferred.json"), **kwargs)
+
+
+def test_failure_after_upload_started_is_reported_as_unknown(tmp_path, fake_uploader):
+    published, unknown = [], []
+    scheduler = make_scheduler(tmp_path, on_published=lambda clip, video_id: published.append(clip["id"]),
+                               on_outcome_unknown=lambda clip: unknown.append(clip["id"]))
+    try:
+        with pytest.raises(upload_scheduler.UploadOutcomeUnknown):
+            scheduler.submit({"id": "a"}, "a.mp4", {"title": "perdu"}).result()
+        assert scheduler.submit({"id": "b"}, "b.mp4", {"title": "refusé"}).result() is None
+        assert scheduler.submit({"id": "c"}, "c.mp4", {"title": "ok"}).result() == "yt-ok"
+    finally:
+        scheduler.shutdown()
+    assert unknown == ["a"]
+    assert published == ["c"]
+    # Le quota d'un upload à l'issue inconnue reste compté ; celui d'un upload refusé avant tout envoi est libéré
+    assert scheduler.ledger.remaining() == upload_scheduler.YOUTUBE_DAILY_QUOTA_UNITS - 2 * upload_scheduler.VIDEO_INSERT_QUOTA_COST
+
+
+def test_upload_is_deferred_when_quota_is_spent(tmp_path, fake_uploader):
+    scheduler = make_scheduler(tmp_path, insert_cost=upload_scheduler.YOUTUBE_DAILY_QUOTA_UNITS + 1)
+    try:
+        assert scheduler.submit({"id": "a"}, "a.mp4", {"title": "ok"}) is None
+    finally:
+        scheduler.shutdown()
+    assert [entry["clip"]["id"] for entry in scheduler.load_deferred()] == ["a"]